@@ -1,22 +1,23 @@
 from __future__ import annotations
 
-import atexit
 import logging
 import os
 import secrets
-import time
 from datetime import datetime
 from decimal import Decimal
 from typing import Any
 
+import click
 from flask import Flask, Response, g
 from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.orm import configure_mappers
 
 from flask import request, redirect, url_for, flash, jsonify
 from flask_babel import gettext as _, format_date as babel_format_date
-from extensions import db, csrf, migrate, limiter, scheduler, babel
-from helpers import get_setting, get_tpl, hex_to_rgb, to_local
+from extensions import db, csrf, limiter, babel, init_migrate
+from helpers import get_setting, get_tpl, hex_to_rgb, to_local, mark_immutable
 from config import TEMPLATE_DEFAULTS
+from db_pool import engine_options
 
 
 def setup_logging() -> None:
@@ -70,6 +71,7 @@ if not _db_uri:
     _db_name = os.environ.get('DB_NAME', 'bank_of_tina')
     _db_uri = f'mysql+pymysql://{_db_user}:{_db_pass}@{_db_host}:{_db_port}/{_db_name}'
 app.config['SQLALCHEMY_DATABASE_URI'] = _db_uri
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(_db_uri)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = '/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024
@@ -80,6 +82,13 @@ app.json = DecimalJSONProvider(app)
 app.config['BABEL_DEFAULT_LOCALE'] = 'de'
 app.config['BABEL_TRANSLATION_DIRECTORIES'] = 'translations'
 
+# Counters shared by all workers via the database (ratelimit_storage.py);
+# "memory://" restores per-process counting.
+app.config['RATELIMIT_STORAGE_URI'] = os.environ.get('RATELIMIT_STORAGE_URI', 'botdb://')
+app.config['RATELIMIT_STRATEGY'] = os.environ.get('RATELIMIT_STRATEGY', 'fixed-window')
+# Load tests from a single address turn the limits off (scripts/load_test.py).
+app.config['RATELIMIT_ENABLED'] = os.environ.get('RATELIMIT_ENABLED', '1') != '0'
+
 
 def get_locale() -> str:
     try:
@@ -89,17 +98,34 @@ def get_locale() -> str:
 
 
 db.init_app(app)
-migrate.init_app(app, db)
 csrf.init_app(app)
+import ratelimit_storage  # noqa: F401  registers the botdb:// scheme
 limiter.init_app(app)
 babel.init_app(app, locale_selector=get_locale)
 
+from request_timing import init_request_timing
+init_request_timing(app)
+from profiler import init_profiler
+init_profiler(app)
+from slow_queries import init_slow_queries
+init_slow_queries(app)
+
 # Import models so they are registered with SQLAlchemy
 import models  # noqa: F401
+# Backrefs such as Transaction.items only exist once the mappers are
+# configured; do it now so a worker's first request can use them in queries.
+configure_mappers()
 
 from routes import register_blueprints
 register_blueprints(app)
 
+from cli import register_commands
+register_commands(app)
+
+from static_assets import send_static, static_url
+app.view_functions['static'] = send_static
+app.add_template_global(static_url)
+
 
 @app.errorhandler(429)
 def ratelimit_handler(e: Exception) -> tuple[Response, int] | Response:
@@ -182,109 +208,45 @@ def set_csp_header(response: Response) -> Response:
     return response
 
 
-if os.environ.get('FLASK_TESTING') != '1':
-    from sqlalchemy.exc import OperationalError
-
-    max_retries = 5
-    for attempt in range(1, max_retries + 1):
-        try:
-            with app.app_context():
-                db.session.execute(db.text('SELECT 1'))
-
-                from flask_migrate import upgrade, stamp
-                inspector = db.inspect(db.engine)
-                tables = inspector.get_table_names()
-                has_alembic = 'alembic_version' in tables
-                has_tables = 'user' in tables
-
-                if has_tables and not has_alembic:
-                    stamp(revision='head')
-                    logger.info('Existing database stamped at current migration head')
-                elif not has_tables:
-                    upgrade()
-                    logger.info('Database created via migrations')
-                else:
-                    upgrade()
-                    logger.info('Database migrations up to date')
-
-                # Migrate unsuffixed tpl_* keys to per-language keys.
-                # Only keep genuinely customized values; delete defaults so
-                # get_tpl() falls through to the language-appropriate defaults.
-                from helpers import set_setting as _set
-                from models import Setting
-                from config import TEMPLATE_DEFAULTS as _EN_DEFAULTS, TEMPLATE_DEFAULTS_DE as _DE_DEFAULTS
-                _tpl_keys = ['tpl_email_subject', 'tpl_email_greeting', 'tpl_email_intro',
-                             'tpl_email_footer1', 'tpl_email_footer2',
-                             'tpl_admin_subject', 'tpl_admin_intro', 'tpl_admin_footer',
-                             'tpl_backup_subject', 'tpl_backup_footer']
-                _has_old = any(db.session.get(Setting, k) for k in _tpl_keys)
-                _has_new = any(db.session.get(Setting, f'{k}_{l}')
-                               for k in _tpl_keys[:1] for l in ('de', 'en'))
-                if _has_old and not _has_new:
-                    _lang = get_setting('language', 'de')
-                    for _k in _tpl_keys:
-                        _old = db.session.get(Setting, _k)
-                        if _old:
-                            _is_default = (_old.value == _EN_DEFAULTS.get(_k, '')
-                                           or _old.value == _DE_DEFAULTS.get(_k, ''))
-                            if not _is_default:
-                                _set(f'{_k}_{_lang}', _old.value, commit=False)
-                            db.session.delete(_old)
-                    db.session.commit()
-                    logger.info('Migrated email templates to per-language keys (%s)', _lang)
-                # Clean up bad migration and redundant entries: remove suffixed
-                # keys whose value matches any default (wrong-language or own)
-                # so get_tpl() falls through to the correct defaults.
-                for _k in _tpl_keys:
-                    for _l in ('de', 'en'):
-                        _s = db.session.get(Setting, f'{_k}_{_l}')
-                        if _s and _s.value in (_EN_DEFAULTS.get(_k, ''),
-                                               _DE_DEFAULTS.get(_k, '')):
-                            db.session.delete(_s)
-                db.session.commit()
-
-                # Clean up color settings that match previous defaults so the
-                # current TEMPLATE_DEFAULTS values take effect.
-                _OLD_COLORS = {
-                    'color_navbar': ('#0d6efd',),
-                    'color_email_grad_start': ('#667eea', '#4e5d88'),
-                    'color_email_grad_end': ('#764ba2', '#e7b44e', '#a8b4d4'),
-                    'color_balance_positive': ('#28a745',),
-                    'color_balance_negative': ('#dc3545',),
-                }
-                _changed = False
-                for _ck, _old_vals in _OLD_COLORS.items():
-                    _s = db.session.get(Setting, _ck)
-                    if _s and _s.value in _old_vals:
-                        db.session.delete(_s)
-                        _changed = True
-                if _changed:
-                    db.session.commit()
-                    logger.info('Removed old default color settings')
-
-                icons_dir = os.path.join(app.root_path, 'static', 'icons')
-                if not os.path.exists(os.path.join(icons_dir, 'icon-192.png')) or not os.path.exists(os.path.join(icons_dir, 'icon-32.png')):
-                    from config import DEFAULT_ICON_BG
-                    from helpers import generate_and_save_icons
-                    os.makedirs(icons_dir, exist_ok=True)
-                    generate_and_save_icons(DEFAULT_ICON_BG)
-                    logger.info('Generated default PWA icons')
-
-                from scheduler_jobs import _restore_schedule
-                _restore_schedule(app)
-            break
-        except OperationalError:
-            if attempt == max_retries:
-                logger.error('Could not connect to database after %d attempts', max_retries)
-                raise
-            delay = 2 ** (attempt - 1)
-            logger.warning('DB not ready, retrying in %ds... (%d/%d)', delay, attempt, max_retries)
-            time.sleep(delay)
-
-    scheduler.start()
-    logger.info('APScheduler started')
-    atexit.register(lambda: scheduler.shutdown(wait=False))
+@app.after_request
+def cache_versioned_icons(response: Response) -> Response:
+    """Icons linked with the current ?v=icon_version never change under that URL."""
+    if (request.endpoint == 'static' and request.path.startswith('/static/icons/')
+            and response.status_code in (200, 304)
+            and request.args.get('v') == get_setting('icon_version', '0')):
+        mark_immutable(response)
+    return response
+
+
+def start_scheduler() -> None:
+    """Start APScheduler on standby; whichever worker wins the lease runs the jobs."""
+    from job_runs import init_job_runs
+    from scheduler_leader import start_leader_election
+    init_job_runs()
+    start_leader_election(app)
+
+
+def start_background() -> None:
+    """Start this worker's background threads: scheduler election and health refresh."""
+    from health import start_health_refresher
+    start_scheduler()
+    start_health_refresher(app)
+
+
+# Schema upgrades and data fix-ups run once per deploy via `flask bot-init`
+# (see startup.py); CLI invocations must not start the scheduler either.
+if (os.environ.get('FLASK_TESTING') != '1' and __name__ != '__main__'
+        and click.get_current_context(silent=True) is None):
+    start_background()
+
+# Only CLI invocations (`flask db ...`, `flask bot-init`) get the migration commands.
+if click.get_current_context(silent=True) is not None:
+    init_migrate(app)
 
 
 if __name__ == '__main__':
+    from startup import run_init
+    with app.app_context():
+        run_init(app)
+    start_background()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -1,14 +1,20 @@
 from __future__ import annotations
 
 import html as html_mod
+import io
 import logging
 import os
+import queue
 import re
 import shutil
 import subprocess
 import tarfile
 import tempfile
+import threading
+import time
+from collections.abc import Callable, Iterator
 from datetime import UTC, datetime
+from typing import IO
 
 from flask import current_app
 
@@ -17,7 +23,8 @@ from flask_babel import gettext as _
 from extensions import db
 from models import BackupLog
 from helpers import get_setting, get_tpl, apply_template, now_local, fmt_amount
-from config import BACKUP_DIR
+from metrics import BACKUP_DURATION, BACKUP_RUNS, BACKUP_SIZE
+from config import BACKUP_DIR, THUMBNAIL_DIR, QUARANTINE_DIR
 
 logger = logging.getLogger(__name__)
 
@@ -33,8 +40,105 @@ def _backup_log(level: str, message: str) -> None:
     db.session.commit()
 
 
-def run_backup() -> tuple[bool, str]:
-    """Create a full backup tar.gz in BACKUP_DIR. Returns (True, filename) or (False, error_msg)."""
+_ENV_KEYS: list[str] = ['DB_ROOT_PASSWORD', 'DB_NAME', 'DB_USER', 'DB_PASSWORD',
+                        'SECRET_KEY', 'SMTP_SERVER', 'SMTP_PORT', 'SMTP_USERNAME',
+                        'SMTP_PASSWORD', 'FROM_EMAIL', 'FROM_NAME']
+
+STREAM_CHUNK_SIZE: int = 64 * 1024
+_STREAM_QUEUE_SIZE: int = 16
+
+
+def _env_file_bytes() -> bytes:
+    """Reconstruct the .env file that is bundled with every backup."""
+    env_lines = [f'{k}={os.environ.get(k, "")}' for k in _ENV_KEYS if os.environ.get(k)]
+    return ('\n'.join(env_lines) + '\n').encode()
+
+
+def _low_priority(cmd: list[str]) -> list[str]:
+    """Prefix `cmd` with ionice/nice so it yields disk and CPU to interactive requests."""
+    prefix: list[str] = []
+    if shutil.which('ionice'):
+        prefix += ['ionice', '-c', '2', '-n', '7', '-t']
+    if shutil.which('nice'):
+        prefix += ['nice', '-n', '19']
+    return prefix + cmd
+
+
+class _RateLimiter:
+    """Blocking byte-rate limiter: sleeps whenever throughput runs ahead of the budget."""
+
+    def __init__(self, bytes_per_sec: int) -> None:
+        self.bytes_per_sec = bytes_per_sec
+        self._start = time.monotonic()
+        self._total = 0
+
+    def consume(self, n: int) -> None:
+        if self.bytes_per_sec <= 0:
+            return
+        self._total += n
+        ahead = self._total / self.bytes_per_sec - (time.monotonic() - self._start)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+def _throttled_copy(limiter: _RateLimiter) -> Callable[..., str]:
+    """Return a shutil.copytree copy_function that reads through `limiter`."""
+    def copy(src: str, dst: str, *, follow_symlinks: bool = True) -> str:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            while chunk := fsrc.read(STREAM_CHUNK_SIZE):
+                fdst.write(chunk)
+                limiter.consume(len(chunk))
+        shutil.copystat(src, dst, follow_symlinks=follow_symlinks)
+        return dst
+    return copy
+
+
+def _dump_database(dump_file: IO[bytes], low_priority: bool = False) -> tuple[bool, str]:
+    """Write a mysqldump of the app database into `dump_file`. Returns (ok, error_msg)."""
+    cmd = ['mysqldump', '-h', _db_host, '-P', _db_port,
+           f'-u{_db_user}', f'-p{_db_pass}',
+           '--add-drop-table', _db_name]
+    result = subprocess.run(
+        _low_priority(cmd) if low_priority else cmd,
+        stdout=dump_file, stderr=subprocess.PIPE, timeout=300
+    )
+    if result.returncode != 0:
+        return False, f'mysqldump failed: {result.stderr.decode(errors="replace")[:300]}'
+    return True, ''
+
+
+def _write_tar_gz(dest: str, members: list[tuple[str, str]], low_priority: bool = False) -> None:
+    """Write `members` ((path, arcname) pairs) to a tar.gz at `dest`.
+
+    In low-priority mode the tar stream is piped through an external gzip
+    running under ionice/nice instead of compressing in-process.
+    """
+    if not low_priority:
+        with tarfile.open(dest, 'w:gz') as tar:
+            for path, arcname in members:
+                tar.add(path, arcname=arcname)
+        return
+
+    with open(dest, 'wb') as out:
+        gz = subprocess.Popen(_low_priority(['gzip', '-c']), stdin=subprocess.PIPE,
+                              stdout=out, stderr=subprocess.PIPE)
+        try:
+            with tarfile.open(fileobj=gz.stdin, mode='w|') as tar:
+                for path, arcname in members:
+                    tar.add(path, arcname=arcname)
+        finally:
+            gz.stdin.close()
+            gz.wait(timeout=300)
+    if gz.returncode != 0:
+        raise RuntimeError(f'gzip failed: {gz.stderr.read().decode(errors="replace")[:300]}')
+
+
+def run_backup(throttled: bool = False) -> tuple[bool, str]:
+    """Create a full backup tar.gz in BACKUP_DIR. Returns (True, filename) or (False, error_msg).
+
+    With `throttled`, receipts are copied at most at the ``backup_throttle_kbps``
+    rate and mysqldump/gzip run at lowered CPU and I/O priority.
+    """
     debug = get_setting('backup_debug', '0') == '1'
 
     def log(level: str, msg: str) -> None:
@@ -45,57 +149,207 @@ def run_backup() -> tuple[bool, str]:
     filename = f'bot_backup_{ts}.tar.gz'
     dest = os.path.join(BACKUP_DIR, filename)
     os.makedirs(BACKUP_DIR, exist_ok=True)
+    started = time.monotonic()
 
     try:
+        copy_function: Callable[..., str] = shutil.copy2
+        if throttled:
+            try:
+                kbps = max(0, int(get_setting('backup_throttle_kbps', '0')))
+            except ValueError:
+                kbps = 0
+            if kbps:
+                copy_function = _throttled_copy(_RateLimiter(kbps * 1024))
+            log('INFO', f'Throttled mode (receipt read limit: {kbps or "unlimited"} KB/s)')
+
         with tempfile.TemporaryDirectory() as tmp:
+            phase = time.monotonic()
             dump_path = os.path.join(tmp, 'dump.sql')
             with open(dump_path, 'wb') as dump_file:
-                result = subprocess.run(
-                    ['mysqldump', '-h', _db_host, '-P', _db_port,
-                     f'-u{_db_user}', f'-p{_db_pass}',
-                     '--add-drop-table', _db_name],
-                    stdout=dump_file, stderr=subprocess.PIPE, timeout=300
-                )
-            if result.returncode != 0:
-                err = result.stderr.decode(errors='replace')[:300]
-                log('ERROR', f'mysqldump failed: {err}')
-                return False, f'mysqldump failed: {err}'
-            log('INFO', 'SQL dump created')
+                ok, err = _dump_database(dump_file, low_priority=throttled)
+            if not ok:
+                log('ERROR', err)
+                BACKUP_RUNS.labels('failed').inc()
+                return False, err
+            log('INFO', f'SQL dump created ({time.monotonic() - phase:.1f}s)')
 
+            phase = time.monotonic()
             receipts_dest = os.path.join(tmp, 'receipts')
             upload_folder = current_app.config['UPLOAD_FOLDER']
             if os.path.exists(upload_folder):
-                shutil.copytree(upload_folder, receipts_dest)
+                shutil.copytree(upload_folder, receipts_dest, copy_function=copy_function,
+                                ignore=shutil.ignore_patterns(THUMBNAIL_DIR, QUARANTINE_DIR))
             else:
                 os.makedirs(receipts_dest)
-            log('INFO', 'Receipts copied')
+            log('INFO', f'Receipts copied ({time.monotonic() - phase:.1f}s)')
 
-            env_keys = ['DB_ROOT_PASSWORD', 'DB_NAME', 'DB_USER', 'DB_PASSWORD',
-                        'SECRET_KEY', 'SMTP_SERVER', 'SMTP_PORT', 'SMTP_USERNAME',
-                        'SMTP_PASSWORD', 'FROM_EMAIL', 'FROM_NAME']
-            env_lines = [f'{k}={os.environ.get(k, "")}' for k in env_keys if os.environ.get(k)]
-            with open(os.path.join(tmp, '.env'), 'w') as f:
-                f.write('\n'.join(env_lines) + '\n')
+            with open(os.path.join(tmp, '.env'), 'wb') as f:
+                f.write(_env_file_bytes())
             log('INFO', '.env reconstructed')
 
-            with tarfile.open(dest, 'w:gz') as tar:
-                tar.add(dump_path, arcname='dump.sql')
-                tar.add(receipts_dest, arcname='receipts')
-                tar.add(os.path.join(tmp, '.env'), arcname='.env')
+            phase = time.monotonic()
+            _write_tar_gz(dest, [(dump_path, 'dump.sql'),
+                                 (receipts_dest, 'receipts'),
+                                 (os.path.join(tmp, '.env'), '.env')],
+                          low_priority=throttled)
+            log('INFO', f'Archive compressed ({time.monotonic() - phase:.1f}s)')
 
-        log('SUCCESS', f'Backup created: {filename}')
+        log('SUCCESS', f'Backup created: {filename} ({time.monotonic() - started:.1f}s total)')
         logger.info('Backup created: %s', filename)
+        BACKUP_RUNS.labels('success').inc()
+        BACKUP_SIZE.set(os.path.getsize(dest))
+        BACKUP_DURATION.set(time.monotonic() - started)
         return True, filename
 
     except Exception as e:
         err = str(e)[:300]
         log('ERROR', err)
         logger.error('Backup failed: %s', err)
+        BACKUP_RUNS.labels('failed').inc()
         if os.path.exists(dest):
             os.remove(dest)
         return False, err
 
 
+class _StreamAborted(Exception):
+    """Raised inside the archive writer thread when the client went away."""
+
+
+class _QueueWriter:
+    """Write-only file object that hands fixed-size chunks to a bounded queue.
+
+    The queue bound is what keeps memory constant: the tar writer blocks
+    until the HTTP response has consumed earlier chunks.
+    """
+
+    def __init__(self, q: queue.Queue[bytes | BaseException | None], stop: threading.Event) -> None:
+        self._q = q
+        self._stop = stop
+        self._buf = bytearray()
+
+    def send(self, item: bytes | BaseException | None) -> None:
+        while True:
+            if self._stop.is_set():
+                raise _StreamAborted()
+            try:
+                self._q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def write(self, data: bytes) -> int:
+        self._buf += data
+        while len(self._buf) >= STREAM_CHUNK_SIZE:
+            self.send(bytes(self._buf[:STREAM_CHUNK_SIZE]))
+            del self._buf[:STREAM_CHUNK_SIZE]
+        return len(data)
+
+    def flush(self) -> None:
+        if self._buf:
+            self.send(bytes(self._buf))
+            self._buf.clear()
+
+
+def _skip_derived_files(info: tarfile.TarInfo) -> tarfile.TarInfo | None:
+    """tarfile filter that drops the thumbnail cache and quarantined orphans from archives."""
+    parts = info.name.split('/')
+    return None if THUMBNAIL_DIR in parts or QUARANTINE_DIR in parts else info
+
+
+def _write_archive(out: IO[bytes], dump_file: IO[bytes], upload_folder: str) -> None:
+    """Write a backup archive with the same layout as run_backup() to `out`."""
+    with tarfile.open(fileobj=out, mode='w|gz') as tar:
+        info = tarfile.TarInfo('dump.sql')
+        info.size = dump_file.seek(0, os.SEEK_END)
+        info.mtime = int(time.time())
+        dump_file.seek(0)
+        tar.addfile(info, dump_file)
+
+        if os.path.exists(upload_folder):
+            tar.add(upload_folder, arcname='receipts', filter=_skip_derived_files)
+        else:
+            info = tarfile.TarInfo('receipts')
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            info.mtime = int(time.time())
+            tar.addfile(info)
+
+        env = _env_file_bytes()
+        info = tarfile.TarInfo('.env')
+        info.size = len(env)
+        info.mtime = int(time.time())
+        tar.addfile(info, io.BytesIO(env))
+
+
+def stream_backup() -> tuple[bool, str, Iterator[bytes] | None]:
+    """Prepare an on-the-fly backup that is never written to BACKUP_DIR.
+
+    The SQL dump is taken up front into an anonymous temp file (tar needs its
+    size before the member header); receipts are read straight from
+    UPLOAD_FOLDER while the archive is being sent. Returns
+    (True, filename, chunk iterator) or (False, error_msg, None).
+    """
+    debug = get_setting('backup_debug', '0') == '1'
+
+    def log(level: str, msg: str) -> None:
+        if debug:
+            _backup_log(level, msg)
+
+    ts = now_local().strftime('%Y_%m_%d_%H-%M-%S')
+    filename = f'bot_backup_{ts}.tar.gz'
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+
+    dump_file = tempfile.TemporaryFile()
+    try:
+        ok, err = _dump_database(dump_file)
+    except Exception as e:
+        ok, err = False, str(e)[:300]
+    if not ok:
+        dump_file.close()
+        log('ERROR', err)
+        logger.error('Streaming backup failed: %s', err)
+        return False, err, None
+    log('INFO', f'SQL dump created, streaming {filename}')
+
+    def chunks() -> Iterator[bytes]:
+        q: queue.Queue[bytes | BaseException | None] = queue.Queue(maxsize=_STREAM_QUEUE_SIZE)
+        stop = threading.Event()
+
+        def produce() -> None:
+            writer = _QueueWriter(q, stop)
+            try:
+                _write_archive(writer, dump_file, upload_folder)
+                writer.flush()
+                writer.send(None)
+            except _StreamAborted:
+                pass
+            except Exception as e:
+                try:
+                    writer.send(e)
+                except _StreamAborted:
+                    pass
+            finally:
+                dump_file.close()
+
+        thread = threading.Thread(target=produce, name='backup-stream', daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = q.get()
+                if item is None:
+                    break
+                if isinstance(item, BaseException):
+                    logger.error('Streaming backup failed: %s', str(item)[:300])
+                    raise item
+                yield item
+            logger.info('Backup streamed: %s', filename)
+        finally:
+            stop.set()
+            thread.join(timeout=5)
+
+    return True, filename, chunks()
+
+
 def _prune_old_backups(keep: int) -> None:
     """Delete oldest backups keeping only the most recent `keep` files."""
     if keep <= 0:
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import click
+from flask import Flask
+
+
+def register_commands(app: Flask) -> None:
+    @app.cli.command('bot-init')
+    def bot_init_command() -> None:
+        """Wait for the DB, apply migrations and fix-ups, generate missing icons."""
+        from startup import run_init
+        applied = run_init(app)
+        click.echo(f"Init complete: {len(applied)} fix-up(s) applied{': ' + ', '.join(applied) if applied else ''}")
+
+    @app.cli.command('thumbnails')
+    def thumbnails_command() -> None:
+        """Pre-generate thumbnails for all existing receipts."""
+        from thumbnail_service import pregenerate_thumbnails
+        generated, cached, failed = pregenerate_thumbnails()
+        click.echo(f'Thumbnails: {generated} generated, {cached} already cached, {failed} failed')
+
+    @app.cli.command('recompress-receipts')
+    def recompress_receipts_command() -> None:
+        """Downscale and re-encode all not yet processed receipt images."""
+        from receipt_service import process_all_receipts
+        changed, saved = process_all_receipts()
+        click.echo(f'Receipts: {changed} recompressed, {saved / 1048576:.1f} MB saved')
+
+    @app.cli.command('gc-receipts')
+    def gc_receipts_command() -> None:
+        """Quarantine unreferenced receipt files and delete expired quarantined ones."""
+        from receipt_service import collect_orphan_receipts
+        quarantined, deleted, reclaimed = collect_orphan_receipts()
+        click.echo(f'Receipt GC: {quarantined} quarantined, {deleted} deleted, '
+                   f'{reclaimed / 1048576:.1f} MB reclaimed')
+
+    @app.cli.command('recount-common')
+    def recount_common_command() -> None:
+        """Rebuild the usage counters behind the common-list auto-collection."""
+        from extensions import db
+        from common_counts import rebuild_counts
+        items, transactions = rebuild_counts()
+        db.session.commit()
+        click.echo(f'Common counters rebuilt up to item id {items} and transaction id {transactions}')
@@ -0,0 +1,184 @@
+"""Usage counters behind the common-list auto-collection.
+
+``auto_collect_common`` used to count every item name, description and price
+over the whole ledger each night. Instead, ``auto_collect_count`` keeps one
+counter per normalized value (see ``normalize``). Each run only aggregates the
+rows added since the last run: everything above the high-water marks
+``common_auto_item_mark`` and ``common_auto_tx_mark`` (the highest expense item
+and transaction id counted so far). Editing or deleting a transaction takes its already counted
+description and items back out (``uncount_transaction``) and counts the new
+ones (``count_transaction``), so the counters match a full count.
+
+This relies on ids never being reused, which InnoDB's AUTO_INCREMENT
+guarantees (SQLite hands out the id of a deleted newest row again). A row
+committed with a lower id after a run has passed it is not counted either.
+``flask recount-common`` rebuilds the counters from scratch, as does the first
+run without marks.
+"""
+from __future__ import annotations
+
+import hashlib
+from collections import Counter
+from decimal import Decimal
+from typing import Any
+
+from sqlalchemy import bindparam, func
+
+from extensions import db
+from models import AutoCollectCount, ExpenseItem, Transaction
+from helpers import get_setting, set_setting
+
+ITEM_MARK: str = 'common_auto_item_mark'
+TX_MARK: str = 'common_auto_tx_mark'
+
+_CHUNK: int = 500
+
+
+def normalize(category: str, raw: Any) -> str:
+    """The form a value is counted under: prices with two decimals, text
+    stripped and lowercased.
+
+    Done here rather than in SQL so batch counts and per-transaction deltas
+    agree whatever collation the database groups by (MariaDB's default one
+    already folds case, SQLite's does not).
+    """
+    return f'{Decimal(raw):.2f}' if category == 'price' else raw.strip().lower()
+
+
+class _Deltas:
+    """Counter changes keyed by (category, key), with the first spelling seen for each key."""
+
+    def __init__(self) -> None:
+        self.uses: Counter[tuple[str, str]] = Counter()
+        self.values: dict[tuple[str, str], str] = {}
+
+    def add(self, category: str, raw: Any, n: int) -> None:
+        if raw is None:
+            return
+        ident = (category, hashlib.sha1(normalize(category, raw).encode()).hexdigest())
+        self.uses[ident] += n
+        self.values.setdefault(ident, f'{Decimal(raw):.2f}' if category == 'price' else raw)
+
+    def add_items(self, rows: Any) -> None:
+        for name, price, n in rows:
+            self.add('item', name, n)
+            self.add('price', price, n)
+
+    def add_descriptions(self, rows: Any) -> None:
+        for description, n in rows:
+            self.add('description', description, n)
+
+
+def _marks() -> tuple[int, int] | None:
+    item_mark, tx_mark = get_setting(ITEM_MARK), get_setting(TX_MARK)
+    if item_mark is None or tx_mark is None:
+        return None
+    return int(item_mark), int(tx_mark)
+
+
+def _apply(deltas: _Deltas) -> None:
+    """Add the deltas to existing counters and insert the new positive ones."""
+    changes = {ident: n for ident, n in deltas.uses.items() if n}
+    if not changes:
+        return
+    keys = sorted({key for _, key in changes})
+    existing: dict[tuple[str, str], int] = {}
+    for i in range(0, len(keys), _CHUNK):
+        existing.update(((category, key), id_) for category, key, id_ in db.session.execute(
+            db.select(AutoCollectCount.category, AutoCollectCount.key, AutoCollectCount.id)
+            .where(AutoCollectCount.key.in_(keys[i:i + _CHUNK]))))
+
+    table = AutoCollectCount.__table__
+    updates = [{'_id': existing[ident], '_n': n} for ident, n in changes.items() if ident in existing]
+    if updates:
+        db.session.execute(table.update().where(table.c.id == bindparam('_id'))
+                           .values(uses=table.c.uses + bindparam('_n')), updates)
+    inserts = [{'category': category, 'key': key, 'value': deltas.values[(category, key)], 'uses': n}
+               for (category, key), n in changes.items() if (category, key) not in existing and n > 0]
+    if inserts:
+        db.session.execute(db.insert(AutoCollectCount), inserts)
+    if any(n < 0 for n in changes.values()):
+        db.session.execute(db.delete(AutoCollectCount).where(AutoCollectCount.uses <= 0))
+
+
+def _count_range(item_mark: int, item_max: int, tx_mark: int, tx_max: int) -> _Deltas:
+    """Aggregate the expense items and transactions with ids in (mark, max]."""
+    deltas = _Deltas()
+    deltas.add_items(db.session.execute(
+        db.select(ExpenseItem.item_name, ExpenseItem.price, func.count())
+        .where(ExpenseItem.id > item_mark, ExpenseItem.id <= item_max)
+        .group_by(ExpenseItem.item_name, ExpenseItem.price)))
+    deltas.add_descriptions(db.session.execute(
+        db.select(Transaction.description, func.count())
+        .where(Transaction.id > tx_mark, Transaction.id <= tx_max)
+        .group_by(Transaction.description)))
+    return deltas
+
+
+def _max_ids() -> tuple[int, int]:
+    item_max, tx_max = db.session.execute(
+        db.select(db.select(func.max(ExpenseItem.id)).scalar_subquery(),
+                  db.select(func.max(Transaction.id)).scalar_subquery())).one()
+    return item_max or 0, tx_max or 0
+
+
+def _set_marks(item_mark: int, tx_mark: int) -> None:
+    set_setting(ITEM_MARK, str(item_mark), commit=False)
+    set_setting(TX_MARK, str(tx_mark), commit=False)
+
+
+def rebuild_counts() -> tuple[int, int]:
+    """Recount the whole ledger and reset the marks.
+
+    Returns the id ranges covered as (items, transactions); the caller commits.
+    """
+    item_max, tx_max = _max_ids()
+    db.session.execute(db.delete(AutoCollectCount))
+    _apply(_count_range(0, item_max, 0, tx_max))
+    _set_marks(item_max, tx_max)
+    return item_max, tx_max
+
+
+def count_new_rows() -> tuple[int, int]:
+    """Count the expense items and transactions added since the last run and advance the marks.
+
+    Rebuilds instead when there are no marks yet. Returns the id ranges
+    covered as (items, transactions); the caller commits.
+    """
+    marks = _marks()
+    if marks is None:
+        return rebuild_counts()
+    item_mark, tx_mark = marks
+    # Take the new marks first so rows inserted meanwhile are left for the next run.
+    item_max, tx_max = _max_ids()
+    item_max, tx_max = max(item_max, item_mark), max(tx_max, tx_mark)
+    _apply(_count_range(item_mark, item_max, tx_mark, tx_max))
+    _set_marks(item_max, tx_max)
+    return item_max - item_mark, tx_max - tx_mark
+
+
+def _transaction_deltas(trans: Transaction, sign: int) -> _Deltas:
+    deltas = _Deltas()
+    marks = _marks()
+    if marks is None:
+        return deltas
+    item_mark, tx_mark = marks
+    if trans.id <= tx_mark:
+        deltas.add('description', trans.description, sign)
+    deltas.add_items((name, price, sign) for name, price in db.session.execute(
+        db.select(ExpenseItem.item_name, ExpenseItem.price)
+        .where(ExpenseItem.transaction_id == trans.id, ExpenseItem.id <= item_mark)))
+    return deltas
+
+
+def uncount_transaction(trans: Transaction) -> None:
+    """Take a transaction's already counted description and items out of the counters.
+
+    Call before changing or deleting them; the caller commits.
+    """
+    _apply(_transaction_deltas(trans, -1))
+
+
+def count_transaction(trans: Transaction) -> None:
+    """Count an edited transaction again where it lies below the marks; the caller commits."""
+    _apply(_transaction_deltas(trans, 1))
@@ -1,9 +1,77 @@
 from __future__ import annotations
 
+import os
+
 ALLOWED_EXTENSIONS: set[str] = {'png', 'jpg', 'jpeg', 'pdf'}
 
 BACKUP_DIR: str = '/backups'
 
+THUMBNAIL_DIR: str = '.thumbs'
+QUARANTINE_DIR: str = '.quarantine'
+THUMBNAIL_SIZE: int = 320
+THUMBNAIL_QUALITY: int = 75
+THUMBNAIL_MAX_AGE: int = 30 * 86400
+THUMBNAIL_CACHE_MAX_BYTES: int = int(os.environ.get('THUMBNAIL_CACHE_MAX_MB', '256')) * 1024 * 1024
+# Seconds a worker trusts its running total of the thumbnail cache size before walking the tree again
+THUMBNAIL_CACHE_RESCAN: int = int(os.environ.get('THUMBNAIL_CACHE_RESCAN', '600'))
+
+# Content-addressed receipts and ?v=-versioned icons never change under the
+# same URL, so browsers and the service worker may keep them for a year.
+IMMUTABLE_MAX_AGE: int = 365 * 86400
+
+# Scheduler leader election between gunicorn workers: the leader renews its
+# lease every heartbeat; a standby takes over once the lease has expired.
+SCHEDULER_LEASE_TTL: int = int(os.environ.get('SCHEDULER_LEASE_TTL', '30'))
+SCHEDULER_HEARTBEAT: int = int(os.environ.get('SCHEDULER_HEARTBEAT', '10'))
+
+# Shared rate limit storage (ratelimit_storage.py): expired counters are
+# purged in one batch at most this often per worker.
+RATELIMIT_CLEANUP_INTERVAL: int = int(os.environ.get('RATELIMIT_CLEANUP_INTERVAL', '60'))
+
+# SQLAlchemy connection pool per worker (db_pool.py). Connections are recycled
+# well before MariaDB's wait_timeout closes them and pinged before reuse.
+DB_POOL_SIZE: int = int(os.environ.get('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW: int = int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT: int = int(os.environ.get('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE: int = int(os.environ.get('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING: bool = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+DB_CONNECT_TIMEOUT: int = int(os.environ.get('DB_CONNECT_TIMEOUT', '10'))
+
+# Per-request timing (request_timing.py): Server-Timing header on every
+# response, and a warning log line for requests slower than the threshold.
+SERVER_TIMING_ENABLED: bool = os.environ.get('SERVER_TIMING', '1') == '1'
+SLOW_REQUEST_MS: int = int(os.environ.get('SLOW_REQUEST_MS', '500'))
+
+# Slow-query log (slow_queries.py): statements taking SLOW_QUERY_MS or longer
+# are stored with their query plan; plans are captured at most once per
+# statement shape every SLOW_QUERY_EXPLAIN_INTERVAL seconds per worker.
+SLOW_QUERY_LOG: bool = os.environ.get('SLOW_QUERY_LOG', '1') == '1'
+SLOW_QUERY_MS: int = int(os.environ.get('SLOW_QUERY_MS', '100'))
+SLOW_QUERY_KEEP: int = int(os.environ.get('SLOW_QUERY_KEEP', '500'))
+SLOW_QUERY_EXPLAIN_INTERVAL: int = int(os.environ.get('SLOW_QUERY_EXPLAIN_INTERVAL', '600'))
+
+# Scheduled job history (job_runs.py): runs kept per job, and a run is flagged
+# as slow when it takes JOB_SLOW_FACTOR times the median of the previous
+# JOB_SLOW_WINDOW successful runs (and at least JOB_SLOW_MIN_SECONDS).
+JOB_RUN_KEEP: int = int(os.environ.get('JOB_RUN_KEEP', '200'))
+JOB_SLOW_FACTOR: float = float(os.environ.get('JOB_SLOW_FACTOR', '3'))
+JOB_SLOW_WINDOW: int = int(os.environ.get('JOB_SLOW_WINDOW', '10'))
+JOB_SLOW_MIN_SECONDS: float = float(os.environ.get('JOB_SLOW_MIN_SECONDS', '1'))
+
+# Health checks (health.py): readiness results are refreshed in the background
+# every HEALTH_CACHE_TTL seconds; an older snapshot than HEALTH_STALE_AFTER
+# marks the worker not ready. Directories with less free space report "low".
+HEALTH_CACHE_TTL: int = int(os.environ.get('HEALTH_CACHE_TTL', '10'))
+HEALTH_STALE_AFTER: int = int(os.environ.get('HEALTH_STALE_AFTER', '60'))
+HEALTH_MIN_FREE_MB: int = int(os.environ.get('HEALTH_MIN_FREE_MB', '500'))
+
+# Opt-in request profiler (profiler.py): requests carrying PROFILER_TOKEN in the
+# X-Profile header or _profile query parameter run under cProfile; the newest
+# PROFILE_KEEP results are kept in PROFILE_DIR. No token, no profiling.
+PROFILER_TOKEN: str = os.environ.get('PROFILER_TOKEN', '')
+PROFILE_DIR: str = os.environ.get('PROFILE_DIR', '/tmp/bot-profiles')
+PROFILE_KEEP: int = int(os.environ.get('PROFILE_KEEP', '20'))
+
 THEMES: dict[str, dict[str, str]] = {
     'default': {
         'label': 'Default',
@@ -0,0 +1,131 @@
+"""SQLAlchemy connection pool configuration and statistics.
+
+``engine_options()`` turns the ``DB_POOL_*`` settings into
+``SQLALCHEMY_ENGINE_OPTIONS``: a bounded QueuePool whose connections are
+pinged before reuse and recycled before MariaDB's ``wait_timeout`` drops them.
+The pool class records how long every checkout waited (including the
+pre-ping) and how often one timed out; ``pool_status()`` combines that with
+the pool's live occupancy for ``/health``. Figures are per worker process.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import PoolProxiedConnection, QueuePool
+
+from metrics import DB_POOL_CAPACITY, DB_POOL_CHECKED_OUT, DB_POOL_TIMEOUTS, DB_POOL_WAIT
+from config import (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+                    DB_POOL_PRE_PING, DB_CONNECT_TIMEOUT)
+
+# Checkout waits kept for the percentiles on /health.
+_SAMPLE_SIZE: int = 1000
+
+
+class PoolStats:
+    """Checkout latency and timeout counters, shared by all threads of a worker."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.max_wait = 0.0
+            self._waits: deque[float] = deque(maxlen=_SAMPLE_SIZE)
+
+    def record(self, wait: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self._waits.append(wait)
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            checkouts, timeouts, max_wait = self.checkouts, self.timeouts, self.max_wait
+
+        def pct(q: float) -> float:
+            return round(waits[min(len(waits) - 1, int(len(waits) * q))] * 1000, 2) if waits else 0.0
+
+        return {'checkouts': checkouts, 'timeouts': timeouts,
+                'wait_ms_p50': pct(0.50), 'wait_ms_p95': pct(0.95), 'wait_ms_max': round(max_wait * 1000, 2)}
+
+
+stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times every checkout into ``stats`` and the pool metrics."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        DB_POOL_CAPACITY.set(self.size() + max(self._max_overflow, 0))
+
+    def connect(self) -> PoolProxiedConnection:
+        start = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            stats.record(time.perf_counter() - start, timed_out=True)
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        wait = time.perf_counter() - start
+        stats.record(wait)
+        DB_POOL_WAIT.observe(wait)
+        DB_POOL_CHECKED_OUT.inc()
+        return conn
+
+    def _do_return_conn(self, record: Any) -> None:
+        DB_POOL_CHECKED_OUT.dec()
+        super()._do_return_conn(record)
+
+
+def _is_memory_sqlite(uri: str) -> bool:
+    return uri.startswith('sqlite') and (uri in ('sqlite://', 'sqlite:///') or ':memory:' in uri)
+
+
+def engine_options(uri: str) -> dict[str, Any]:
+    """SQLALCHEMY_ENGINE_OPTIONS for the given database URI."""
+    if _is_memory_sqlite(uri):
+        # A single shared in-memory connection (tests); there is nothing to size.
+        return {}
+    options: dict[str, Any] = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+    if uri.startswith('mysql'):
+        options['connect_args'] = {'connect_timeout': DB_CONNECT_TIMEOUT}
+    return options
+
+
+def pool_status(engine: Engine) -> dict[str, Any]:
+    """Live occupancy of the engine's pool plus this worker's checkout stats."""
+    pool = engine.pool
+    status: dict[str, Any] = {'class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        in_use = pool.checkedout()
+        status.update({
+            'size': pool.size(),
+            'max_overflow': pool._max_overflow,
+            'checked_out': in_use,
+            'idle': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'saturation': round(in_use / capacity, 2) if capacity else 0.0,
+        })
+    status.update(stats.snapshot())
+    return status
@@ -15,6 +15,7 @@ from flask_babel import gettext as _
 from extensions import db
 from models import User, Transaction, EmailLog
 from helpers import get_setting, get_tpl, apply_template, fmt_amount, now_local
+from metrics import EMAILS
 
 logger = logging.getLogger(__name__)
 
@@ -134,7 +135,7 @@ def build_email_html(user: User) -> str:
     footer1_html  = f'<p>{footer1}</p>' if footer1.strip() else ''
     footer2_html  = f'<p style="margin-top: 10px;">{footer2}</p>' if footer2.strip() else ''
 
-    html = f"""
+    body = f"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -166,7 +167,7 @@ def build_email_html(user: User) -> str:
     </body>
     </html>
     """
-    return html
+    return body
 
 
 def build_admin_summary_email(users: list[User], include_emails: bool = False) -> str:
@@ -236,6 +237,7 @@ def send_single_email(to_email: str, to_name: str, subject: str, html: str) -> t
     from_name     = get_setting('from_name', 'Bank of Tina')
 
     if not smtp_username or not smtp_password:
+        EMAILS.labels('failed').inc()
         return False, _('SMTP credentials not configured')
 
     msg = MIMEMultipart('alternative')
@@ -251,9 +253,11 @@ def send_single_email(to_email: str, to_name: str, subject: str, html: str) -> t
         server.send_message(msg)
         server.quit()
         logger.info('Email sent to %s', to_email)
+        EMAILS.labels('sent').inc()
         return True, None
     except Exception as e:
         logger.error('Email failed to %s: %s', to_email, e)
+        EMAILS.labels('failed').inc()
         return False, str(e)
 
 
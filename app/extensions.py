@@ -1,9 +1,9 @@
 from __future__ import annotations
 
+from flask import Flask
 from flask_babel import Babel
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf.csrf import CSRFProtect
-from flask_migrate import Migrate
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -11,6 +11,16 @@ from apscheduler.schedulers.background import BackgroundScheduler
 babel: Babel = Babel()
 db: SQLAlchemy = SQLAlchemy()
 csrf: CSRFProtect = CSRFProtect()
-migrate: Migrate = Migrate()
-limiter: Limiter = Limiter(key_func=get_remote_address, storage_uri="memory://", default_limits=[])
+# Storage and strategy come from RATELIMIT_STORAGE_URI / RATELIMIT_STRATEGY in
+# app.config; if the shared store fails, limits fall back to per-process memory.
+limiter: Limiter = Limiter(key_func=get_remote_address, default_limits=[], in_memory_fallback_enabled=True)
 scheduler: BackgroundScheduler = BackgroundScheduler(daemon=True)
+
+
+def init_migrate(app: Flask) -> None:
+    """Register Flask-Migrate. Importing it pulls in all of Alembic, which only
+    the ``flask db`` commands and ``flask bot-init`` need, so web workers skip it."""
+    if 'migrate' in app.extensions:
+        return
+    from flask_migrate import Migrate
+    Migrate(app, db)
@@ -0,0 +1,22 @@
+"""gunicorn settings picked up automatically from the working directory.
+
+Prepares the shared directory for Prometheus multiprocess metrics (see
+metrics.py): it is emptied once when the server starts, so counters do not
+carry over from a previous container run, and files of exited workers are
+marked dead so their live gauges drop out of the aggregate.
+"""
+import os
+import shutil
+
+
+def on_starting(server):
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
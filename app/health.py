@@ -0,0 +1,138 @@
+"""Liveness and readiness checks behind ``/health/live`` and ``/health/ready``.
+
+Liveness looks only inside the worker: are the background threads it started
+still running? It never touches the database or the disk, so a slow database
+cannot make it fail. Readiness pings the database (with its latency), reports
+the scheduler role, free space of the upload and backup directories and the
+latest scheduled job runs. Those results are cached for ``HEALTH_CACHE_TTL``
+seconds and refreshed by a thread per worker, so a probe only reads the last
+snapshot. A snapshot older than ``HEALTH_STALE_AFTER`` means the refresh is
+stuck, which makes the worker not ready. Without the thread (tests) a probe
+refreshes inline once the snapshot has expired.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import UTC, datetime
+from typing import Any
+
+from flask import Flask, current_app
+
+from extensions import db, scheduler
+from job_runs import latest_runs
+from scheduler_leader import election_state, is_leader, lease_expires_in
+from config import BACKUP_DIR, HEALTH_CACHE_TTL, HEALTH_STALE_AFTER, HEALTH_MIN_FREE_MB
+
+logger = logging.getLogger(__name__)
+
+_snapshot: dict[str, Any] | None = None
+_snapshot_at: float = 0.0
+_refresh_lock = threading.Lock()
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+
+
+def _disk(path: str) -> dict[str, Any]:
+    try:
+        usage = shutil.disk_usage(path)
+    except OSError:
+        return {'status': 'missing'}
+    free_mb = usage.free // (1024 * 1024)
+    if not os.access(path, os.W_OK):
+        status = 'not writable'
+    else:
+        status = 'ok' if free_mb >= HEALTH_MIN_FREE_MB else 'low'
+    return {'status': status, 'free_mb': free_mb, 'used_pct': round(usage.used / usage.total * 100, 1)}
+
+
+def _check() -> dict[str, Any]:
+    """Run every readiness check once; needs an app context."""
+    checks: dict[str, str] = {}
+    started = time.perf_counter()
+    try:
+        db.session.execute(db.text('SELECT 1'))
+        checks['database'] = 'ok'
+    except Exception as e:
+        db.session.rollback()
+        checks['database'] = f'error: {e}'
+    database_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    checks['scheduler'] = 'ok' if scheduler.running else 'not running'
+    checks['scheduler_role'] = 'leader' if is_leader() else 'standby'
+
+    # Latest run of each scheduled job; slow or failed runs are reported, not fatal
+    jobs = latest_runs() if checks['database'] == 'ok' else {}
+    problems = [f'{job} {"failed" if r["outcome"] == "error" else "slow"}'
+                for job, r in sorted(jobs.items()) if r['outcome'] == 'error' or r['slow']]
+    checks['jobs'] = ', '.join(problems) if problems else 'ok'
+
+    icons_dir = os.path.join(current_app.root_path, 'static', 'icons')
+    checks['icons_writable'] = 'ok' if os.access(icons_dir, os.W_OK) else 'not writable'
+
+    disk = {'uploads': _disk(current_app.config['UPLOAD_FOLDER']), 'backups': _disk(BACKUP_DIR)}
+    for name, d in disk.items():
+        checks[f'disk_{name}'] = d['status']
+
+    expires = lease_expires_in()
+    return {'checks': checks, 'database_ms': database_ms, 'disk': disk, 'jobs': jobs,
+            'lease_expires_in_s': round(expires, 1) if expires is not None else None,
+            'checked_at': datetime.now(UTC).isoformat(timespec='seconds')}
+
+
+def refresh() -> dict[str, Any]:
+    global _snapshot, _snapshot_at
+    snapshot = _check()
+    with _refresh_lock:
+        _snapshot, _snapshot_at = snapshot, time.monotonic()
+    return snapshot
+
+
+def readiness() -> tuple[dict[str, Any], bool]:
+    """The cached readiness snapshot with its age, and whether the worker is ready."""
+    with _refresh_lock:
+        snapshot, age = _snapshot, time.monotonic() - _snapshot_at
+    if snapshot is None or (age > HEALTH_CACHE_TTL and refresher_state() != 'ok'):
+        snapshot, age = refresh(), 0.0
+    checks = dict(snapshot['checks'])
+    if age > HEALTH_STALE_AFTER:
+        checks['database'] = f'stale: last checked {age:.0f} s ago'
+    ready = checks['database'] == 'ok'
+    return {**snapshot, 'status': 'ok' if ready else 'error', 'checks': checks, 'age_s': round(age, 1)}, ready
+
+
+def liveness() -> tuple[dict[str, Any], bool]:
+    """In-process state only: the threads this worker started and its scheduler."""
+    checks = {'scheduler_election': election_state(), 'health_refresh': refresher_state()}
+    if checks['scheduler_election'] != 'not started':
+        checks['scheduler'] = 'ok' if scheduler.running else 'not running'
+    alive = 'stopped' not in checks.values() and checks.get('scheduler') != 'not running'
+    return {'status': 'ok' if alive else 'error', 'checks': checks, 'pid': os.getpid()}, alive
+
+
+def refresher_state() -> str:
+    if _thread is None:
+        return 'not started'
+    return 'ok' if _thread.is_alive() else 'stopped'
+
+
+def _run(app: Flask) -> None:
+    while not _stop.is_set():
+        try:
+            with app.app_context():
+                refresh()
+        except Exception:
+            logger.exception('Health check refresh failed')
+        _stop.wait(HEALTH_CACHE_TTL)
+
+
+def start_health_refresher(app: Flask) -> None:
+    """Refresh the readiness snapshot every HEALTH_CACHE_TTL seconds in this worker."""
+    global _thread
+    _thread = threading.Thread(target=_run, args=(app,), name='health-refresh', daemon=True)
+    _thread.start()
+    atexit.register(_stop.set)
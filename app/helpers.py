@@ -1,63 +1,160 @@
 from __future__ import annotations
 
+import functools
+import hashlib
 import os
 import re
 import struct
+import tempfile
 import time
 import zlib
 from datetime import UTC, datetime
 from decimal import Decimal, InvalidOperation
 
 import pytz
-from flask import current_app, g
+from flask import Response, current_app, g
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
 from extensions import db
-from models import Setting, Transaction
-from config import ALLOWED_EXTENSIONS, TEMPLATE_DEFAULTS, TEMPLATE_DEFAULTS_DE, DEFAULT_ICON_BG
+from metrics import SETTINGS_LOOKUPS
+from models import Receipt, Setting, Transaction
+from config import (ALLOWED_EXTENSIONS, TEMPLATE_DEFAULTS, TEMPLATE_DEFAULTS_DE, DEFAULT_ICON_BG,
+                    IMMUTABLE_MAX_AGE)
 
 
 def allowed_file(filename: str) -> bool:
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def save_receipt(file: FileStorage | None, buyer_name: str) -> str | None:
-    """Save an uploaded receipt to UPLOAD_FOLDER/YYYY/MM/DD/BUYER_filename."""
+_CAS_PATH_RE = re.compile(r'^([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})(?:\.min)?\.[a-z0-9]+$')
+
+
+def receipt_rel_path(digest: str, ext: str) -> str:
+    """Content-addressed location of a receipt, sharded as ab/cd/<sha256>.<ext>."""
+    return f'{digest[:2]}/{digest[2:4]}/{digest}.{ext}'
+
+
+def is_content_addressed(rel_path: str) -> bool:
+    """True if the path follows the receipt_rel_path layout, i.e. its bytes never change."""
+    return _CAS_PATH_RE.match(rel_path) is not None
+
+
+def mark_immutable(response: Response) -> Response:
+    """Let browsers and the service worker cache a response for good."""
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    response.expires = int(time.time() + IMMUTABLE_MAX_AGE)
+    return response
+
+
+def save_receipt(file: FileStorage | None, buyer_name: str) -> Receipt | None:
+    """Store an uploaded receipt by content hash under UPLOAD_FOLDER/ab/cd/<sha256>.<ext>.
+
+    Identical uploads share one file and one ``Receipt`` row. A new row is only
+    added to the session once attach_receipt() links it to a transaction, so an
+    upload nothing takes a reference on leaves just the file for the GC.
+    """
     if not file or not file.filename or not allowed_file(file.filename):
         return None
 
     safe_buyer = re.sub(r'[^\w]', '_', buyer_name)
     safe_buyer = re.sub(r'_+', '_', safe_buyer).strip('_') or 'unknown'
     original = secure_filename(file.filename) or 'file'
+    ext = file.filename.rsplit('.', 1)[1].lower()
 
-    now = now_local()
-    rel_dir = now.strftime('%Y/%m/%d')
-    abs_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], rel_dir)
-    os.makedirs(abs_dir, exist_ok=True)
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=upload_folder, prefix='.upload-')
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while chunk := file.stream.read(64 * 1024):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    sha = digest.hexdigest()
+
+    receipt = db.session.execute(db.select(Receipt).filter_by(sha256=sha)).scalar()
+    rel_path = receipt.path if receipt else receipt_rel_path(sha, ext)
+    abs_path = os.path.join(upload_folder, rel_path)
+    if os.path.exists(abs_path):
+        os.remove(tmp_path)
+    else:
+        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+        os.replace(tmp_path, abs_path)
+
+    if receipt is None:
+        receipt = Receipt(sha256=sha, path=rel_path, original_name=f'{safe_buyer}_{original}',
+                          size=size, ref_count=0)
+    return receipt
+
+
+def _store_receipt(receipt: Receipt) -> Receipt:
+    """Insert a new receipt row, or return the one a concurrent upload of the same content stored."""
+    try:
+        with db.session.begin_nested():
+            db.session.add(receipt)
+    except IntegrityError:
+        return db.session.execute(db.select(Receipt).filter_by(sha256=receipt.sha256)).scalar_one()
+    return receipt
+
+
+def attach_receipt(transaction: Transaction, receipt: Receipt) -> Receipt:
+    """Point a transaction at a receipt and take a reference on it; returns the stored row."""
+    if receipt.id is None:
+        receipt = _store_receipt(receipt)
+    transaction.receipt = receipt
+    transaction.receipt_path = receipt.path
+    receipt.ref_count = (receipt.ref_count or 0) + 1
+    return receipt
+
+
+def release_receipt(receipt: Receipt | None) -> None:
+    """Drop one reference; delete the row once nothing points at it, and its files after the commit."""
+    if receipt is None:
+        return
+    receipt.ref_count = (receipt.ref_count or 0) - 1
+    if receipt.ref_count > 0:
+        return
+    db.session.delete(receipt)
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    db.session.info.setdefault('released_receipt_files', []).extend(
+        os.path.join(upload_folder, rel_path) for rel_path in (receipt.path, receipt.original_path) if rel_path)
 
-    filename = f"{safe_buyer}_{original}"
-    file.save(os.path.join(abs_dir, filename))
-    return f"{rel_dir}/{filename}"
 
+def _remove_released_files(session: Session) -> None:
+    for path in session.info.pop('released_receipt_files', ()):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _keep_released_files(session: Session) -> None:
+    # Rolled back: the rows still exist, so do their files; true orphans are left to the GC.
+    session.info.pop('released_receipt_files', None)
+
+
+event.listen(Session, 'after_commit', _remove_released_files)
+event.listen(Session, 'after_rollback', _keep_released_files)
 
-def delete_receipt_file(receipt_path: str | None, exclude_transaction_id: int) -> None:
-    """Delete a receipt file from disk only if no other transaction still references it."""
-    if not receipt_path:
-        return
-    others = db.session.execute(
-        db.select(Transaction).where(
-            Transaction.receipt_path == receipt_path,
-            Transaction.id != exclude_transaction_id
-        )
-    ).scalar()
-    if others:
-        return
-    abs_path = os.path.join(current_app.config['UPLOAD_FOLDER'], receipt_path)
-    try:
-        os.remove(abs_path)
-    except OSError:
-        pass
+
+def detach_receipt(transaction: Transaction) -> None:
+    """Remove the receipt from a transaction, releasing its reference."""
+    receipt = transaction.receipt
+    transaction.receipt = None
+    transaction.receipt_path = None
+    release_receipt(receipt)
 
 
 def update_balance(user_id: int, amount: Decimal) -> None:
@@ -69,6 +166,9 @@ def update_balance(user_id: int, amount: Decimal) -> None:
 
 
 def get_setting(key: str, default: str | None = None) -> str | None:
+    # A hit is a row the session already holds loaded; anything else costs a query.
+    held = db.session.identity_map.get(db.session.identity_key(Setting, key))
+    SETTINGS_LOOKUPS.labels('miss' if held is None or inspect(held).expired else 'hit').inc()
     s = db.session.get(Setting, key)
     return s.value if s else default
 
@@ -136,45 +236,59 @@ def hex_to_rgb(hex_color: str) -> str:
         return '0, 0, 0'
 
 
-def make_icon_png(size: int, bg_color: tuple[int, int, int],
-                  fg_color: tuple[int, int, int] = (0xff, 0xff, 0xff)) -> bytes:
-    """Generate a square PNG of `size` pixels with a bank silhouette."""
-    width = height = size
-    pixels: list[list[tuple[int, int, int]]] = [[bg_color] * width for _ in range(height)]
+# Bank silhouette as (x0, y0, x1, y1) fractions of the padded drawing area.
+_ICON_RECTS: tuple[tuple[float, float, float, float], ...] = (
+    (0.10, 0.00, 0.90, 0.18),                                    # roof
+    (0.20, 0.18, 0.80, 0.26),                                    # frieze
+    *((cx, 0.26, cx + 0.10, 0.78) for cx in (0.20, 0.45, 0.70)),  # columns
+    (0.10, 0.78, 0.90, 0.88),                                    # base
+    (0.05, 0.88, 0.95, 1.00),                                    # steps
+)
+
 
+def _icon_scanlines(size: int) -> list[tuple[tuple[int, int], ...]]:
+    """Foreground column spans of every row of a `size` px icon."""
     pad = size * 0.15
-    draw_w = size - 2 * pad
-    draw_h = size - 2 * pad
-
-    def fill_rect(x0f: float, y0f: float, x1f: float, y1f: float) -> None:
-        x0 = int(pad + x0f * draw_w)
-        y0 = int(pad + y0f * draw_h)
-        x1 = int(pad + x1f * draw_w)
-        y1 = int(pad + y1f * draw_h)
-        for row in range(max(0, y0), min(height, y1)):
-            for col in range(max(0, x0), min(width, x1)):
-                pixels[row][col] = fg_color
-
-    fill_rect(0.10, 0.00, 0.90, 0.18)
-    fill_rect(0.20, 0.18, 0.80, 0.26)
-    col_w = 0.10
-    for cx in (0.20, 0.45, 0.70):
-        fill_rect(cx, 0.26, cx + col_w, 0.78)
-    fill_rect(0.10, 0.78, 0.90, 0.88)
-    fill_rect(0.05, 0.88, 0.95, 1.00)
+    draw = size - 2 * pad
+    rows: list[list[tuple[int, int]]] = [[] for _ in range(size)]
+    for x0f, y0f, x1f, y1f in _ICON_RECTS:
+        x0 = max(0, int(pad + x0f * draw))
+        x1 = min(size, int(pad + x1f * draw))
+        if x0 >= x1:
+            continue
+        for row in range(max(0, int(pad + y0f * draw)), min(size, int(pad + y1f * draw))):
+            rows[row].append((x0, x1))
+    return [tuple(sorted(spans)) for spans in rows]
+
+
+@functools.lru_cache(maxsize=32)
+def make_icon_png(size: int, bg_color: tuple[int, int, int],
+                  fg_color: tuple[int, int, int] = (0xff, 0xff, 0xff)) -> bytes:
+    """Generate a square PNG of `size` pixels with a bank silhouette.
 
+    The silhouette only has a handful of distinct scanlines, so each one is
+    built once as a filtered PNG row and repeated; results are memoized per
+    (size, colours).
+    """
+    bg = bytes(bg_color)
+    fg = bytes(fg_color)
+    templates: dict[tuple[tuple[int, int], ...], bytes] = {}
     raw_rows: list[bytes] = []
-    for row in pixels:
-        row_bytes = b'\x00' + b''.join(bytes(p) for p in row)
-        raw_rows.append(row_bytes)
-    raw = b''.join(raw_rows)
-    compressed = zlib.compress(raw, level=9)
+    for spans in _icon_scanlines(size):
+        row = templates.get(spans)
+        if row is None:
+            line = bytearray(bg * size)
+            for x0, x1 in spans:
+                line[x0 * 3:x1 * 3] = fg * (x1 - x0)
+            row = templates[spans] = b'\x00' + bytes(line)
+        raw_rows.append(row)
+    compressed = zlib.compress(b''.join(raw_rows), level=9)
 
     def chunk(tag: bytes, data: bytes) -> bytes:
         c = tag + data
         return struct.pack('>I', len(data)) + c + struct.pack('>I', zlib.crc32(c) & 0xFFFFFFFF)
 
-    ihdr_data = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    ihdr_data = struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0)
     return (b'\x89PNG\r\n\x1a\n'
             + chunk(b'IHDR', ihdr_data)
             + chunk(b'IDAT', compressed)
@@ -194,9 +308,32 @@ def generate_and_save_icons(bg_hex: str) -> str:
     version = str(int(time.time()))
     set_setting('icon_version', version)
     set_setting('icon_mode', 'generated')
+    set_setting('icon_bg', bg_hex)
     return version
 
 
+@functools.lru_cache(maxsize=16)
+def _resize_custom_icon(source: str, size: int, version: str) -> bytes:
+    """Downscale an uploaded icon; `version` only keys the cache."""
+    import io
+    from PIL import Image
+    with Image.open(source) as img:
+        resized = img.convert('RGB').resize((size, size), Image.LANCZOS)
+    buf = io.BytesIO()
+    resized.save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def render_icon(size: int) -> bytes:
+    """Render the current app icon at any size, e.g. 180 px for Apple touch icons."""
+    version = get_setting('icon_version', '0')
+    if get_setting('icon_mode', 'generated') == 'custom':
+        source = os.path.join(current_app.root_path, 'static', 'icons', 'icon-512.png')
+        return _resize_custom_icon(source, size, version)
+    h = (get_setting('icon_bg') or DEFAULT_ICON_BG).lstrip('#')
+    return make_icon_png(size, (int(h[0:2], 16), int(h[2:4], 16), int(h[4:6], 16)))
+
+
 def detect_theme() -> str:
     """Return the key of the active preset theme, or 'custom'."""
     from config import THEMES
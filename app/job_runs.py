@@ -0,0 +1,154 @@
+"""Run history of the scheduled jobs.
+
+Every job registered in scheduler_jobs runs inside ``record_job_run()``, which
+stores a ``JobRun`` row: the time the scheduler fired it, start and finish,
+duration, outcome, how much work it did (rows, emails or bytes, as reported by
+the job) and the worker's peak RSS during the run. A run that takes more than
+``JOB_SLOW_FACTOR`` times the median of the job's previous successful runs is
+flagged as slow, logged as a warning and counted in ``bot_job_slow_runs``.
+The settings page lists the recent runs and ``/health`` the latest per job.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import resource
+import statistics
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from typing import Any
+
+from apscheduler.events import EVENT_JOB_SUBMITTED, JobSubmissionEvent
+from sqlalchemy.exc import SQLAlchemyError
+
+from extensions import db, scheduler
+from models import JobRun
+from metrics import JOB_SLOW_RUNS, observe_job
+from config import JOB_RUN_KEEP, JOB_SLOW_FACTOR, JOB_SLOW_WINDOW, JOB_SLOW_MIN_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Slow-run checks need a few previous runs to compare against.
+_MIN_HISTORY: int = 3
+
+_fired_at: dict[str, datetime] = {}
+_fired_lock = threading.Lock()
+
+
+class RunInfo:
+    """Filled in by the job: how much it processed and whether it failed."""
+
+    def __init__(self) -> None:
+        self.processed: int | None = None
+        self.unit: str | None = None
+        self.error: str | None = None
+
+    def count(self, processed: int, unit: str) -> None:
+        self.processed, self.unit = processed, unit
+
+    def fail(self, message: str) -> None:
+        self.error = message
+
+
+def _utcnow() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def _on_submitted(event: JobSubmissionEvent) -> None:
+    with _fired_lock:
+        _fired_at[event.job_id] = event.scheduled_run_times[-1].astimezone(UTC).replace(tzinfo=None)
+
+
+def init_job_runs() -> None:
+    """Remember when the scheduler fired each job; call once per process."""
+    scheduler.add_listener(_on_submitted, EVENT_JOB_SUBMITTED)
+
+
+def _reset_peak_rss() -> None:
+    # Linux: writing 5 to clear_refs resets VmHWM, so the peak covers this run only.
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _peak_rss() -> int:
+    try:
+        with open('/proc/self/status') as f:
+            m = re.search(r'^VmHWM:\s+(\d+) kB', f.read(), re.M)
+        if m:
+            return int(m.group(1)) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _median_duration(job_id: str) -> float | None:
+    durations = db.session.execute(
+        db.select(JobRun.duration).where(JobRun.job_id == job_id, JobRun.outcome == 'success')
+        .order_by(JobRun.id.desc()).limit(JOB_SLOW_WINDOW)).scalars().all()
+    return statistics.median(durations) if len(durations) >= _MIN_HISTORY else None
+
+
+def _save(job_id: str, run: RunInfo, started_at: datetime, duration: float, peak_rss: int) -> None:
+    with _fired_lock:
+        scheduled_at = _fired_at.pop(job_id, None)
+    median = _median_duration(job_id)
+    slow = (median is not None and duration >= JOB_SLOW_MIN_SECONDS
+            and duration > median * JOB_SLOW_FACTOR)
+    if slow:
+        JOB_SLOW_RUNS.labels(job_id).inc()
+        logger.warning('Job %s took %.1f s, %.1fx its median of %.1f s',
+                       job_id, duration, duration / median, median)
+    db.session.add(JobRun(job_id=job_id, scheduled_at=scheduled_at, started_at=started_at,
+                          finished_at=_utcnow(), duration=duration,
+                          outcome='error' if run.error else 'success',
+                          processed=run.processed, processed_unit=run.unit, peak_rss=peak_rss,
+                          median_duration=median, slow=slow,
+                          message=run.error[:500] if run.error else None))
+    oldest_kept = db.session.execute(
+        db.select(JobRun.id).where(JobRun.job_id == job_id)
+        .order_by(JobRun.id.desc()).offset(JOB_RUN_KEEP)).scalar()
+    if oldest_kept:
+        db.session.execute(db.delete(JobRun).where(JobRun.job_id == job_id, JobRun.id <= oldest_kept))
+    db.session.commit()
+
+
+@contextmanager
+def record_job_run(job_id: str) -> Iterator[RunInfo]:
+    """Record one run of `job_id`; needs an app context. Exceptions are re-raised."""
+    run = RunInfo()
+    started_at = _utcnow()
+    _reset_peak_rss()
+    started = time.monotonic()
+    try:
+        yield run
+    except Exception as e:
+        run.fail(str(e) or type(e).__name__)
+        db.session.rollback()
+        raise
+    finally:
+        duration = time.monotonic() - started
+        observe_job(job_id, duration, ok=run.error is None)
+        try:
+            _save(job_id, run, started_at, duration, _peak_rss())
+        except SQLAlchemyError:
+            db.session.rollback()
+            logger.exception('Could not record run of job %s', job_id)
+
+
+def recent_runs(limit: int = 50) -> list[JobRun]:
+    return db.session.execute(db.select(JobRun).order_by(JobRun.id.desc()).limit(limit)).scalars().all()
+
+
+def latest_runs() -> dict[str, dict[str, Any]]:
+    """The newest run of every job, for /health."""
+    newest = db.select(db.func.max(JobRun.id)).group_by(JobRun.job_id)
+    runs = db.session.execute(db.select(JobRun).where(JobRun.id.in_(newest))).scalars().all()
+    return {r.job_id: {'finished_at': r.finished_at.isoformat(timespec='seconds') + 'Z',
+                       'duration_s': round(r.duration, 2), 'outcome': r.outcome, 'slow': r.slow}
+            for r in runs}
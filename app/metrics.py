@@ -0,0 +1,81 @@
+"""Prometheus metrics, served in text format on ``/metrics``.
+
+Under gunicorn every worker is its own process, so the metrics live in
+prometheus_client's multiprocess mode: with ``PROMETHEUS_MULTIPROC_DIR`` set,
+each worker writes its samples to mmap'd files in that directory and a scrape
+of any worker aggregates all of them. ``gunicorn.conf.py`` empties the
+directory when the server starts and marks exited workers dead. Without the
+variable (tests, ``python app.py``) the default single-process registry is
+used.
+"""
+from __future__ import annotations
+
+import os
+import time
+
+_multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+if _multiproc_dir:
+    os.makedirs(_multiproc_dir, exist_ok=True)
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+                               Histogram, generate_latest, multiprocess)
+
+REQUEST_LATENCY = Histogram(
+    'bot_request_duration_seconds', 'Request wall time by endpoint',
+    ['endpoint', 'method', 'status'])
+REQUEST_QUERIES = Histogram(
+    'bot_request_queries', 'SQL statements per request by endpoint', ['endpoint'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+
+DB_POOL_CHECKED_OUT = Gauge(
+    'bot_db_pool_checked_out', 'Connections currently checked out', multiprocess_mode='livesum')
+DB_POOL_CAPACITY = Gauge(
+    'bot_db_pool_capacity', 'Pool size plus max overflow', multiprocess_mode='livesum')
+DB_POOL_WAIT = Histogram(
+    'bot_db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30))
+DB_POOL_TIMEOUTS = Counter('bot_db_pool_timeouts', 'Checkouts that hit the pool timeout')
+
+JOB_DURATION = Histogram(
+    'bot_job_duration_seconds', 'Scheduled job run time', ['job'],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600))
+JOB_RUNS = Counter('bot_job_runs', 'Scheduled job runs by outcome', ['job', 'outcome'])
+JOB_LAST_SUCCESS = Gauge(
+    'bot_job_last_success_timestamp_seconds', 'Unix time of the last successful run', ['job'],
+    multiprocess_mode='max')
+JOB_SLOW_RUNS = Counter('bot_job_slow_runs', 'Runs much slower than the job\'s recent median', ['job'])
+
+EMAILS = Counter('bot_emails', 'Emails handed to the SMTP server by result', ['result'])
+
+BACKUP_RUNS = Counter('bot_backup_runs', 'Backups written to the backup directory by outcome', ['outcome'])
+BACKUP_SIZE = Gauge('bot_backup_size_bytes', 'Size of the most recent backup archive',
+                    multiprocess_mode='mostrecent')
+BACKUP_DURATION = Gauge('bot_backup_duration_seconds', 'Run time of the most recent backup',
+                        multiprocess_mode='mostrecent')
+
+SETTINGS_LOOKUPS = Counter(
+    'bot_settings_lookups', "get_setting() calls answered from the session's identity map (hit) or the database (miss)",
+    ['result'])
+
+
+def observe_request(endpoint: str | None, method: str, status: int, seconds: float, queries: int) -> None:
+    endpoint = endpoint or 'unmatched'
+    REQUEST_LATENCY.labels(endpoint, method, str(status)).observe(seconds)
+    REQUEST_QUERIES.labels(endpoint).observe(queries)
+
+
+def observe_job(job: str, seconds: float, ok: bool) -> None:
+    JOB_DURATION.labels(job).observe(seconds)
+    JOB_RUNS.labels(job, 'success' if ok else 'error').inc()
+    if ok:
+        JOB_LAST_SUCCESS.labels(job).set(time.time())
+
+
+def render() -> tuple[bytes, str]:
+    """The exposition text for a scrape, aggregated over all workers if multiprocess."""
+    if _multiproc_dir:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
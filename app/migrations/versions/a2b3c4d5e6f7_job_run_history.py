@@ -0,0 +1,42 @@
+"""scheduled job run history
+
+Revision ID: a2b3c4d5e6f7
+Revises: f0a1b2c3d4e5
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2b3c4d5e6f7'
+down_revision = 'f0a1b2c3d4e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'job_run',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.String(length=50), nullable=False),
+        sa.Column('scheduled_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=False),
+        sa.Column('duration', sa.Float(), nullable=False),
+        sa.Column('outcome', sa.String(length=10), nullable=False),
+        sa.Column('processed', sa.BigInteger(), nullable=True),
+        sa.Column('processed_unit', sa.String(length=10), nullable=True),
+        sa.Column('peak_rss', sa.BigInteger(), nullable=True),
+        sa.Column('median_duration', sa.Float(), nullable=True),
+        sa.Column('slow', sa.Boolean(), nullable=False),
+        sa.Column('message', sa.String(length=500), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_job_run_job_id_id', 'job_run', ['job_id', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_job_run_job_id_id', table_name='job_run')
+    op.drop_table('job_run')
@@ -0,0 +1,37 @@
+"""slow query log
+
+Revision ID: b3c4d5e6f7a8
+Revises: a2b3c4d5e6f7
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3c4d5e6f7a8'
+down_revision = 'a2b3c4d5e6f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'slow_query',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('fingerprint', sa.String(length=40), nullable=False),
+        sa.Column('statement', sa.Text(), nullable=False),
+        sa.Column('params', sa.String(length=500), nullable=True),
+        sa.Column('duration', sa.Float(), nullable=False),
+        sa.Column('endpoint', sa.String(length=100), nullable=True),
+        sa.Column('query_plan', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_slow_query_fingerprint', 'slow_query', ['fingerprint'])
+
+
+def downgrade():
+    op.drop_index('ix_slow_query_fingerprint', table_name='slow_query')
+    op.drop_table('slow_query')
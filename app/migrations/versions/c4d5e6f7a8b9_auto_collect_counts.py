@@ -0,0 +1,37 @@
+"""auto-collect usage counters
+
+Revision ID: c4d5e6f7a8b9
+Revises: b3c4d5e6f7a8
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d5e6f7a8b9'
+down_revision = 'b3c4d5e6f7a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled on the next auto-collect run, which finds no high-water marks yet.
+    op.create_table(
+        'auto_collect_count',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('category', sa.String(length=20), nullable=False),
+        sa.Column('key', sa.String(length=40), nullable=False),
+        sa.Column('value', sa.String(length=500), nullable=False),
+        sa.Column('uses', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('category', 'key'),
+    )
+
+
+def downgrade():
+    op.drop_table('auto_collect_count')
+    # Without the counters the high-water marks are meaningless; a later upgrade rebuilds
+    setting = sa.table('setting', sa.column('key'))
+    op.execute(setting.delete().where(setting.c.key.in_(['common_auto_item_mark', 'common_auto_tx_mark'])))
@@ -0,0 +1,120 @@
+"""content-addressed receipt storage with reference counting
+
+Revision ID: c7d8e9f0a1b2
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+import hashlib
+import logging
+import os
+from datetime import UTC, datetime
+
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d8e9f0a1b2'
+down_revision = 'a1b2c3d4e5f6'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def upgrade():
+    op.create_table('receipt',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('path', sa.String(length=500), nullable=False),
+    sa.Column('original_name', sa.String(length=255), nullable=True),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('sha256')
+    )
+    with op.batch_alter_table('transaction') as batch_op:
+        batch_op.add_column(sa.Column('receipt_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_transaction_receipt_id'), ['receipt_id'], unique=False)
+        batch_op.create_foreign_key('fk_transaction_receipt_id', 'receipt', ['receipt_id'], ['id'])
+
+    _move_receipts_to_content_store()
+
+
+def _move_receipts_to_content_store():
+    """Move every referenced receipt into ab/cd/<sha256>.<ext> and create its Receipt row."""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    bind = op.get_bind()
+    tx = sa.table('transaction',
+                  sa.column('receipt_path', sa.String), sa.column('receipt_id', sa.Integer))
+    receipt = sa.table('receipt',
+                       sa.column('id', sa.Integer), sa.column('sha256', sa.String),
+                       sa.column('path', sa.String), sa.column('original_name', sa.String),
+                       sa.column('size', sa.Integer), sa.column('ref_count', sa.Integer),
+                       sa.column('created_at', sa.DateTime))
+
+    rows = bind.execute(
+        sa.select(tx.c.receipt_path, sa.func.count())
+        .where(tx.c.receipt_path.isnot(None), tx.c.receipt_path != '')
+        .group_by(tx.c.receipt_path)
+    ).all()
+
+    by_digest = {}
+    moved = 0
+    for old_path, refs in rows:
+        src = os.path.join(upload_folder, old_path)
+        if not os.path.isfile(src):
+            logger.warning('Receipt file missing, left as-is: %s', old_path)
+            continue
+
+        digest = hashlib.sha256()
+        with open(src, 'rb') as f:
+            while chunk := f.read(64 * 1024):
+                digest.update(chunk)
+        sha = digest.hexdigest()
+
+        if sha in by_digest:
+            receipt_id, new_path = by_digest[sha]
+            bind.execute(receipt.update().where(receipt.c.id == receipt_id)
+                         .values(ref_count=receipt.c.ref_count + refs))
+            os.remove(src)
+        else:
+            ext = old_path.rsplit('.', 1)[-1].lower() if '.' in old_path else 'bin'
+            new_path = f'{sha[:2]}/{sha[2:4]}/{sha}.{ext}'
+            dest = os.path.join(upload_folder, new_path)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            size = os.path.getsize(src)
+            if os.path.exists(dest):
+                os.remove(src)
+            else:
+                os.replace(src, dest)
+            bind.execute(receipt.insert().values(
+                sha256=sha, path=new_path, original_name=os.path.basename(old_path)[:255],
+                size=size, ref_count=refs,
+                created_at=datetime.now(UTC).replace(tzinfo=None),
+            ))
+            receipt_id = bind.execute(sa.select(receipt.c.id).where(receipt.c.sha256 == sha)).scalar()
+            by_digest[sha] = (receipt_id, new_path)
+
+        bind.execute(tx.update().where(tx.c.receipt_path == old_path)
+                     .values(receipt_path=new_path, receipt_id=receipt_id))
+        try:
+            os.removedirs(os.path.dirname(src))
+        except OSError:
+            pass
+        moved += 1
+
+    if moved:
+        logger.info('Moved %d receipt(s) into content-addressed storage', moved)
+
+
+def downgrade():
+    # Files stay in the content-addressed layout; receipt_path still points at them.
+    with op.batch_alter_table('transaction') as batch_op:
+        batch_op.drop_constraint('fk_transaction_receipt_id', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_transaction_receipt_id'))
+        batch_op.drop_column('receipt_id')
+    op.drop_table('receipt')
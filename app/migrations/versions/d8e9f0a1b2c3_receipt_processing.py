@@ -0,0 +1,30 @@
+"""receipt recompression bookkeeping
+
+Revision ID: d8e9f0a1b2c3
+Revises: c7d8e9f0a1b2
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e9f0a1b2c3'
+down_revision = 'c7d8e9f0a1b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('receipt') as batch_op:
+        batch_op.add_column(sa.Column('processed_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('original_size', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('original_path', sa.String(length=500), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('receipt') as batch_op:
+        batch_op.drop_column('original_path')
+        batch_op.drop_column('original_size')
+        batch_op.drop_column('processed_at')
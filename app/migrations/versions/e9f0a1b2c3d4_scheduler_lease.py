@@ -0,0 +1,33 @@
+"""scheduler leader lease
+
+Revision ID: e9f0a1b2c3d4
+Revises: d8e9f0a1b2c3
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9f0a1b2c3d4'
+down_revision = 'd8e9f0a1b2c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    lease = op.create_table(
+        'scheduler_lease',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('holder', sa.String(length=100), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('schedule_version', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    op.bulk_insert(lease, [{'name': 'scheduler', 'schedule_version': 0}])
+
+
+def downgrade():
+    op.drop_table('scheduler_lease')
@@ -0,0 +1,46 @@
+"""shared rate limit storage
+
+Revision ID: f0a1b2c3d4e5
+Revises: e9f0a1b2c3d4
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f0a1b2c3d4e5'
+down_revision = 'e9f0a1b2c3d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Unix timestamps need double precision: MariaDB's FLOAT is only accurate to ~2 minutes here.
+    op.create_table(
+        'rate_limit_counter',
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.Double(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+    )
+    op.create_index('ix_rate_limit_counter_expires_at', 'rate_limit_counter', ['expires_at'])
+    op.create_table(
+        'rate_limit_entry',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('hit_at', sa.Double(), nullable=False),
+        sa.Column('expires_at', sa.Double(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_rate_limit_entry_key_hit_at', 'rate_limit_entry', ['key', 'hit_at'])
+    op.create_index('ix_rate_limit_entry_expires_at', 'rate_limit_entry', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_rate_limit_entry_expires_at', table_name='rate_limit_entry')
+    op.drop_index('ix_rate_limit_entry_key_hit_at', table_name='rate_limit_entry')
+    op.drop_table('rate_limit_entry')
+    op.drop_index('ix_rate_limit_counter_expires_at', table_name='rate_limit_counter')
+    op.drop_table('rate_limit_counter')
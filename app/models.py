@@ -38,6 +38,7 @@ class Transaction(db.Model):
     to_user_id: int | None
     transaction_type: str
     receipt_path: str | None
+    receipt_id: int | None
     notes: str | None
 
     id = db.Column(db.Integer, primary_key=True)
@@ -48,15 +49,49 @@ class Transaction(db.Model):
     to_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     transaction_type = db.Column(db.String(50), index=True)
     receipt_path = db.Column(db.String(500))
+    receipt_id = db.Column(db.Integer, db.ForeignKey('receipt.id'), index=True)
     notes = db.Column(db.Text, nullable=True)
 
     from_user = db.relationship('User', foreign_keys=[from_user_id], backref='transactions_sent')
     to_user = db.relationship('User', foreign_keys=[to_user_id], backref='transactions_received')
+    receipt = db.relationship('Receipt')
 
     def __repr__(self) -> str:
         return f'<Transaction {self.id}: {self.description}>'
 
 
+class Receipt(db.Model):
+    """A stored receipt file, addressed by the SHA-256 of its content.
+
+    ``ref_count`` is the number of transactions pointing at this row; the file
+    is removed from disk when it drops to zero.
+    """
+    id: int
+    sha256: str
+    path: str
+    original_name: str | None
+    size: int
+    ref_count: int
+    created_at: datetime
+    processed_at: datetime | None
+    original_size: int | None
+    original_path: str | None
+
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    path = db.Column(db.String(500), nullable=False)
+    original_name = db.Column(db.String(255))
+    size = db.Column(db.Integer, nullable=False, default=0)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC).replace(tzinfo=None))
+    processed_at = db.Column(db.DateTime, nullable=True)
+    original_size = db.Column(db.Integer, nullable=True)
+    original_path = db.Column(db.String(500), nullable=True)
+
+    def __repr__(self) -> str:
+        return f'<Receipt {self.sha256[:12]} refs={self.ref_count}>'
+
+
 class ExpenseItem(db.Model):
     id: int
     transaction_id: int
@@ -120,6 +155,27 @@ class CommonBlacklist(db.Model):
     __table_args__ = (db.UniqueConstraint('type', 'value'),)
 
 
+class AutoCollectCount(db.Model):
+    """How often an item name, description or price has been used.
+
+    ``key`` is the SHA-1 of the normalized value (text stripped and lowercased,
+    prices with two decimals); ``value`` is the first spelling seen. Maintained
+    incrementally by ``common_counts``.
+    """
+    id: int
+    category: str
+    key: str
+    value: str
+    uses: int
+
+    id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(20), nullable=False)
+    key = db.Column(db.String(40), nullable=False)
+    value = db.Column(db.String(500), nullable=False)
+    uses = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = (db.UniqueConstraint('category', 'key'),)
+
+
 class AutoCollectLog(db.Model):
     id: int
     ran_at: datetime
@@ -158,3 +214,100 @@ class BackupLog(db.Model):
     ran_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC).replace(tzinfo=None))
     level = db.Column(db.String(10), nullable=False)
     message = db.Column(db.String(500), nullable=False)
+
+
+class SchedulerLease(db.Model):
+    """Single-row lease deciding which gunicorn worker runs the scheduled jobs."""
+    name: str
+    holder: str | None
+    expires_at: datetime | None
+    heartbeat_at: datetime | None
+    schedule_version: int
+
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(100))
+    expires_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    schedule_version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class JobRun(db.Model):
+    """One execution of a scheduled job (see job_runs); the newest runs per job are kept."""
+    id: int
+    job_id: str
+    scheduled_at: datetime | None
+    started_at: datetime
+    finished_at: datetime
+    duration: float
+    outcome: str
+    processed: int | None
+    processed_unit: str | None
+    peak_rss: int | None
+    median_duration: float | None
+    slow: bool
+    message: str | None
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(50), nullable=False)
+    scheduled_at = db.Column(db.DateTime, nullable=True)
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=False)
+    duration = db.Column(db.Float, nullable=False)
+    outcome = db.Column(db.String(10), nullable=False)
+    processed = db.Column(db.BigInteger, nullable=True)
+    processed_unit = db.Column(db.String(10), nullable=True)
+    peak_rss = db.Column(db.BigInteger, nullable=True)
+    median_duration = db.Column(db.Float, nullable=True)
+    slow = db.Column(db.Boolean, nullable=False, default=False)
+    message = db.Column(db.String(500), nullable=True)
+
+    __table_args__ = (db.Index('ix_job_run_job_id_id', 'job_id', 'id'),)
+
+
+class SlowQuery(db.Model):
+    """A statement slower than SLOW_QUERY_MS with its EXPLAIN output (see slow_queries)."""
+    id: int
+    created_at: datetime
+    fingerprint: str
+    statement: str
+    params: str | None
+    duration: float
+    endpoint: str | None
+    query_plan: str | None
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    fingerprint = db.Column(db.String(40), nullable=False)
+    statement = db.Column(db.Text, nullable=False)
+    params = db.Column(db.String(500), nullable=True)
+    duration = db.Column(db.Float, nullable=False)
+    endpoint = db.Column(db.String(100), nullable=True)
+    query_plan = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (db.Index('ix_slow_query_fingerprint', 'fingerprint'),)
+
+
+class RateLimitCounter(db.Model):
+    """Fixed-window rate limit counter shared by all workers (see ratelimit_storage)."""
+    key: str
+    count: int
+    expires_at: float
+
+    key = db.Column(db.String(255), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    expires_at = db.Column(db.Double, nullable=False, index=True)
+
+
+class RateLimitEntry(db.Model):
+    """One hit inside a moving rate limit window (see ratelimit_storage)."""
+    id: int
+    key: str
+    hit_at: float
+    expires_at: float
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(255), nullable=False)
+    hit_at = db.Column(db.Double, nullable=False)
+    expires_at = db.Column(db.Double, nullable=False, index=True)
+
+    __table_args__ = (db.Index('ix_rate_limit_entry_key_hit_at', 'key', 'hit_at'),)
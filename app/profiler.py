@@ -0,0 +1,159 @@
+"""Opt-in per-request profiler.
+
+A request carrying ``PROFILER_TOKEN`` in the ``X-Profile`` header or the
+``_profile`` query parameter runs under cProfile. The stats are written to
+``PROFILE_DIR`` as a ``.prof`` file (readable by ``python -m pstats`` and
+snakeviz), only the newest ``PROFILE_KEEP`` are kept, and the response names
+the file in an ``X-Profile-Id`` header. Settings → General lists them with a
+plain-text report. Without ``PROFILER_TOKEN`` nothing is ever profiled and a
+request costs one module-level check.
+
+cProfile only sees the thread it was enabled in, and one profile runs per
+worker at a time; a concurrent request asking for one is served unprofiled.
+"""
+from __future__ import annotations
+
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+from datetime import UTC, datetime
+from typing import Any
+
+from flask import Flask, Response, g, request, request_started
+
+from config import PROFILER_TOKEN, PROFILE_DIR, PROFILE_KEEP
+
+logger = logging.getLogger(__name__)
+
+PROFILE_NAME_RE: re.Pattern[str] = re.compile(
+    r'^(?P<ts>\d{8}T\d{12})_(?P<method>[A-Z]+)_(?P<endpoint>[\w.]+)_(?P<ms>\d+)ms\.prof$')
+REPORT_SORTS: tuple[str, ...] = ('cumulative', 'tottime', 'calls')
+_REPORT_LINES: int = 60
+
+_busy = threading.Lock()
+
+
+def _requested() -> bool:
+    token = request.headers.get('X-Profile') or request.args.get('_profile')
+    return bool(token) and hmac.compare_digest(token.encode(), PROFILER_TOKEN.encode())
+
+
+def _start(sender: Flask, **extra: Any) -> None:
+    if not PROFILER_TOKEN or not _requested():
+        return
+    if not _busy.acquire(blocking=False):
+        logger.info('Profile of %s %s skipped: another request is being profiled',
+                    request.method, request.path)
+        return
+    profile = cProfile.Profile()
+    g._profile = (profile, time.perf_counter())
+    profile.enable()
+
+
+def _stop() -> tuple[cProfile.Profile, float] | None:
+    started = g.pop('_profile', None)
+    if started is None:
+        return None
+    profile, t0 = started
+    profile.disable()
+    _busy.release()
+    return profile, time.perf_counter() - t0
+
+
+def _save(profile: cProfile.Profile, seconds: float) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = (f'{datetime.now(UTC):%Y%m%dT%H%M%S%f}_{request.method}_'
+            f'{request.endpoint or "none"}_{seconds * 1000:.0f}ms.prof')
+    tmp = os.path.join(PROFILE_DIR, f'.{name}.tmp')
+    profile.dump_stats(tmp)
+    os.replace(tmp, os.path.join(PROFILE_DIR, name))
+    for old in sorted(f for f in os.listdir(PROFILE_DIR) if PROFILE_NAME_RE.match(f))[:-PROFILE_KEEP]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, old))
+        except OSError:
+            pass
+    return name
+
+
+def _finish(response: Response) -> Response:
+    stopped = _stop()
+    if stopped is None:
+        return response
+    try:
+        name = _save(*stopped)
+    except OSError:
+        logger.exception('Could not save profile of %s %s', request.method, request.path)
+        return response
+    logger.info('Profiled %s %s -> %s', request.method, request.path, name)
+    response.headers['X-Profile-Id'] = name
+    return response
+
+
+def _teardown(exc: BaseException | None) -> None:
+    # after_request is skipped when a response cannot be built at all.
+    _stop()
+
+
+def list_profiles() -> list[dict[str, Any]]:
+    """Saved profiles, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for f in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        m = PROFILE_NAME_RE.match(f)
+        if not m:
+            continue
+        try:
+            size = os.path.getsize(os.path.join(PROFILE_DIR, f))
+        except OSError:
+            continue  # pruned by another worker meanwhile
+        profiles.append({
+            'name': f,
+            'created': datetime.strptime(m['ts'], '%Y%m%dT%H%M%S%f').replace(tzinfo=UTC),
+            'method': m['method'],
+            'endpoint': m['endpoint'],
+            'duration_ms': int(m['ms']),
+            'size': size,
+        })
+    return profiles
+
+
+def profile_path(name: str) -> str | None:
+    """Path of a saved profile, or None if `name` is not one."""
+    if not PROFILE_NAME_RE.match(name):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+def profile_report(path: str, sort: str = 'cumulative') -> str:
+    """pstats text report of the functions with the highest `sort` key."""
+    out = io.StringIO()
+    stats = pstats.Stats(path, stream=out)
+    stats.strip_dirs().sort_stats(sort if sort in REPORT_SORTS else 'cumulative').print_stats(_REPORT_LINES)
+    return out.getvalue()
+
+
+def clear_profiles() -> int:
+    removed = 0
+    for p in list_profiles():
+        try:
+            os.remove(os.path.join(PROFILE_DIR, p['name']))
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def init_profiler(app: Flask) -> None:
+    """Hook the profiler into the app; register after request timing so the
+    profile is closed before the timings are logged."""
+    request_started.connect(_start, app)
+    app.after_request(_finish)
+    app.teardown_request(_teardown)
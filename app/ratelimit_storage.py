@@ -0,0 +1,161 @@
+"""Flask-Limiter storage backed by the application database.
+
+With ``memory://`` every gunicorn worker (and every container) kept its own
+counters, so a ``3/minute`` limit really allowed three requests per process.
+This backend registers the ``botdb://`` scheme with the ``limits`` package and
+keeps the counters in two tables every worker shares:
+
+* ``rate_limit_counter`` — one row per key for the fixed-window strategy,
+  bumped with a single conditional UPDATE (INSERT on the first hit).
+* ``rate_limit_entry`` — one row per hit for the moving-window strategy.
+
+Expired rows are not deleted on the request path; at most every
+``RATELIMIT_CLEANUP_INTERVAL`` seconds one request per worker removes them in
+a single batched DELETE. Statements run on their own connection, so they never
+touch the request's ORM session.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any
+
+from limits.storage import MovingWindowSupport, Storage
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import Executable
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from extensions import db
+from models import RateLimitCounter, RateLimitEntry
+from config import RATELIMIT_CLEANUP_INTERVAL
+
+_counters = RateLimitCounter.__table__
+_entries = RateLimitEntry.__table__
+
+# Moving-window hits are serialised per key through a row in the counter table.
+_LOCK_PREFIX: str = 'lock:'
+
+
+class DatabaseStorage(Storage, MovingWindowSupport):
+    """Rate limit counters in the ``rate_limit_*`` tables, shared by all workers."""
+
+    STORAGE_SCHEME = ['botdb']
+
+    def __init__(self, uri: str | None = None, wrap_exceptions: bool = False, **options) -> None:
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self._cleanup_lock = threading.Lock()
+        self._next_cleanup = 0.0
+
+    @property
+    def base_exceptions(self) -> type[Exception]:
+        return SQLAlchemyError
+
+    def _maybe_cleanup(self, conn: Connection, now: float) -> None:
+        if now < self._next_cleanup or not self._cleanup_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_cleanup = now + RATELIMIT_CLEANUP_INTERVAL
+            conn.execute(delete(_counters).where(_counters.c.expires_at <= now))
+            conn.execute(delete(_entries).where(_entries.c.expires_at <= now))
+        finally:
+            self._cleanup_lock.release()
+
+    def _bump(self, conn: Connection, key: str, expiry: float, amount: int, now: float) -> bool:
+        expired = _counters.c.expires_at <= now
+        # MySQL evaluates SET assignments left to right against already updated
+        # values, so count must be computed before expires_at changes.
+        result = conn.execute(
+            update(_counters).where(_counters.c.key == key).ordered_values(
+                (_counters.c.count, case((expired, amount), else_=_counters.c.count + amount)),
+                (_counters.c.expires_at, case((expired, now + expiry), else_=_counters.c.expires_at)),
+            )
+        )
+        return bool(result.rowcount)
+
+    def _incr(self, key: str, expiry: float, amount: int) -> int:
+        now = time.time()
+        with db.engine.begin() as conn:
+            self._maybe_cleanup(conn, now)
+            if not self._bump(conn, key, expiry, amount, now):
+                conn.execute(insert(_counters).values(key=key, count=amount, expires_at=now + expiry))
+            return conn.execute(select(_counters.c.count).where(_counters.c.key == key)).scalar_one()
+
+    def incr(self, key: str, expiry: float, amount: int = 1, elastic_expiry: bool = False) -> int:
+        """Add ``amount`` to the counter, starting a new window if the old one expired."""
+        try:
+            return self._incr(key, expiry, amount)
+        except IntegrityError:
+            # Another worker inserted the first hit concurrently; bump its row instead.
+            return self._incr(key, expiry, amount)
+
+    def get(self, key: str) -> int:
+        return self._scalar(
+            select(_counters.c.count)
+            .where(_counters.c.key == key, _counters.c.expires_at > time.time())
+        ) or 0
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        expires_at = self._scalar(
+            select(_counters.c.expires_at)
+            .where(_counters.c.key == key, _counters.c.expires_at > now)
+        )
+        return expires_at or now
+
+    def check(self) -> bool:
+        try:
+            self._scalar(select(1))
+            return True
+        except SQLAlchemyError:
+            return False
+
+    def reset(self) -> int | None:
+        with db.engine.begin() as conn:
+            counters = conn.execute(delete(_counters)).rowcount
+            entries = conn.execute(delete(_entries)).rowcount
+        return counters + entries
+
+    def clear(self, key: str) -> None:
+        with db.engine.begin() as conn:
+            conn.execute(delete(_counters).where(_counters.c.key == key))
+            conn.execute(delete(_entries).where(_entries.c.key == key))
+
+    def _acquire_entry(self, key: str, limit: int, expiry: int, amount: int) -> bool:
+        now = time.time()
+        with db.engine.begin() as conn:
+            self._maybe_cleanup(conn, now)
+            # The UPDATE row lock makes concurrent acquirers of one key wait here.
+            lock_key = _LOCK_PREFIX + key
+            if not self._bump(conn, lock_key, expiry, 1, now):
+                conn.execute(insert(_counters).values(key=lock_key, count=1, expires_at=now + expiry))
+            in_window = conn.execute(
+                select(func.count()).select_from(_entries)
+                .where(_entries.c.key == key, _entries.c.hit_at > now - expiry)
+            ).scalar_one()
+            if in_window + amount > limit:
+                return False
+            conn.execute(insert(_entries), [{'key': key, 'hit_at': now, 'expires_at': now + expiry}] * amount)
+            return True
+
+    def acquire_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        """Record ``amount`` hits if the moving window still has room for them."""
+        if amount > limit:
+            return False
+        try:
+            return self._acquire_entry(key, limit, expiry, amount)
+        except IntegrityError:
+            return self._acquire_entry(key, limit, expiry, amount)
+
+    def get_moving_window(self, key: str, limit: int, expiry: int) -> tuple[float, int]:
+        now = time.time()
+        with db.engine.connect() as conn:
+            oldest, count = conn.execute(
+                select(func.min(_entries.c.hit_at), func.count()).select_from(_entries)
+                .where(_entries.c.key == key, _entries.c.hit_at > now - expiry)
+            ).one()
+        return (oldest if oldest is not None else now), count
+
+    def _scalar(self, stmt: Executable) -> Any:
+        with db.engine.connect() as conn:
+            return conn.execute(stmt).scalar()
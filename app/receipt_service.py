@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import UTC, datetime
+from itertools import islice
+
+from flask import Flask, current_app
+
+from extensions import db
+from models import Receipt, Transaction
+from helpers import get_setting
+from thumbnail_service import thumbnail_path
+from config import THUMBNAIL_DIR, QUARANTINE_DIR
+
+logger = logging.getLogger(__name__)
+
+RECOMPRESSIBLE_EXTENSIONS: set[str] = {'png', 'jpg', 'jpeg'}
+
+# Prefixes of the temp files save_receipt() and process_receipt() write before
+# an atomic rename; one that outlives the GC grace period was abandoned.
+_TEMP_PREFIXES: tuple[str, ...] = ('.upload-', '.recompress-')
+_GC_BATCH_SIZE: int = 500
+
+# A single worker keeps recompression from competing with request handling
+# for more than one core.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='receipt-processing')
+
+
+def _int_setting(key: str, default: int, lo: int, hi: int) -> int:
+    try:
+        return max(lo, min(hi, int(get_setting(key, str(default)))))
+    except ValueError:
+        return default
+
+
+def process_receipt(receipt_id: int) -> int:
+    """Downscale and re-encode one stored receipt image. Returns the bytes saved.
+
+    The receipt keeps its content hash (of the original upload, so re-uploads
+    still deduplicate) but moves to a ``<sha>.min.<ext>`` name, so a receipt
+    URL never serves two different contents and can be cached as immutable;
+    every transaction pointing at it is updated and the thumbnail cached for
+    the old name is dropped. If re-encoding would not make the file smaller it
+    is left untouched and only marked as processed.
+    """
+    receipt = db.session.get(Receipt, receipt_id)
+    if receipt is None or receipt.processed_at is not None:
+        return 0
+    old_ext = receipt.path.rsplit('.', 1)[-1].lower()
+    if old_ext not in RECOMPRESSIBLE_EXTENSIONS:
+        return 0
+
+    from PIL import Image, ImageOps
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    src = os.path.join(upload_folder, receipt.path)
+    if not os.path.isfile(src):
+        return 0
+    old_size = os.path.getsize(src)
+
+    max_edge = _int_setting('receipt_max_edge', 2000, 320, 10000)
+    quality = _int_setting('receipt_quality', 80, 30, 95)
+    webp = get_setting('receipt_format', 'jpeg') == 'webp'
+    keep_original = get_setting('receipt_keep_original', '0') == '1'
+
+    with Image.open(src) as opened:
+        img = ImageOps.exif_transpose(opened)
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        if img.mode in ('RGBA', 'LA', 'P'):
+            rgba = img.convert('RGBA')
+            img = Image.new('RGB', rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel('A'))
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+
+    rel_dir = os.path.dirname(receipt.path)
+    new_ext = 'webp' if webp else 'jpg'
+    new_rel = f'{rel_dir}/{receipt.sha256}.min.{new_ext}'
+    new_abs = os.path.join(upload_folder, new_rel)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(new_abs), prefix='.recompress-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if webp:
+                img.save(f, 'WEBP', quality=quality, method=6)
+            else:
+                img.save(f, 'JPEG', quality=quality, optimize=True, progressive=True)
+        new_size = os.path.getsize(tmp_path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+    now = datetime.now(UTC).replace(tzinfo=None)
+    if new_size >= old_size:
+        os.remove(tmp_path)
+        receipt.processed_at = now
+        receipt.original_size = old_size
+        db.session.commit()
+        return 0
+
+    # The old file stays in place until the commit has repointed every
+    # transaction, so requests in between still find it and a failed commit
+    # leaves the receipt intact.
+    created = [new_abs]
+    try:
+        if keep_original:
+            orig_rel = f'{rel_dir}/{receipt.sha256}.orig.{old_ext}'
+            orig_abs = os.path.join(upload_folder, orig_rel)
+            try:
+                os.link(src, orig_abs)
+            except OSError:  # no hard links here, or a leftover from a crashed run
+                shutil.copy2(src, orig_abs)
+            created.append(orig_abs)
+            receipt.original_path = orig_rel
+        os.replace(tmp_path, new_abs)
+
+        old_rel = receipt.path
+        receipt.path = new_rel
+        receipt.size = new_size
+        receipt.original_size = old_size
+        receipt.processed_at = now
+        db.session.execute(db.update(Transaction).where(Transaction.receipt_id == receipt.id)
+                           .values(receipt_path=new_rel))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        for path in [tmp_path, *created]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        raise
+
+    for path in (src, thumbnail_path(old_rel)):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    saved = old_size - new_size
+    logger.info('Receipt %s recompressed: %d -> %d bytes', receipt.sha256[:12], old_size, new_size)
+    return saved
+
+
+def _process_in_background(app: Flask, receipt_id: int) -> None:
+    with app.app_context():
+        try:
+            process_receipt(receipt_id)
+        except Exception as e:
+            db.session.rollback()
+            logger.error('Receipt processing failed for id=%s: %s', receipt_id, str(e)[:200])
+
+
+def queue_receipt_processing(receipt: Receipt | None) -> Future[None] | None:
+    """Recompress a freshly committed receipt in the background, if enabled.
+
+    A receipt no transaction took a reference on was never stored and is skipped.
+    """
+    if receipt is None or receipt.id is None or get_setting('receipt_processing', '0') != '1':
+        return None
+    if receipt.processed_at is not None:
+        return None
+    return _executor.submit(_process_in_background, current_app._get_current_object(), receipt.id)
+
+
+def process_all_receipts() -> tuple[int, int]:
+    """Recompress every unprocessed receipt. Returns (receipts changed, bytes saved)."""
+    ids = db.session.execute(
+        db.select(Receipt.id).where(Receipt.processed_at.is_(None)).order_by(Receipt.id)
+    ).scalars().all()
+    changed = saved = 0
+    for receipt_id in ids:
+        try:
+            n = process_receipt(receipt_id)
+        except Exception as e:
+            db.session.rollback()
+            logger.error('Receipt processing failed for id=%s: %s', receipt_id, str(e)[:200])
+            continue
+        if n:
+            changed += 1
+            saved += n
+    logger.info('Receipt recompression: %d changed, %d bytes saved', changed, saved)
+    return changed, saved
+
+
+def _iter_files(root: str, skip_dirs: set[str]) -> Iterator[tuple[str, os.stat_result]]:
+    """Yield (path relative to root, stat) for every file below root."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in skip_dirs]
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            yield os.path.relpath(path, root).replace(os.sep, '/'), st
+
+
+def _batched(items: Iterable[tuple[str, os.stat_result]],
+             size: int) -> Iterator[list[tuple[str, os.stat_result]]]:
+    it = iter(items)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def _referenced(paths: list[str]) -> set[str]:
+    """The subset of `paths` that a referenced receipt row or a transaction still points at."""
+    found: set[str] = set()
+    for column in (Receipt.path, Receipt.original_path, Transaction.receipt_path):
+        remaining = [p for p in paths if p not in found]
+        if not remaining:
+            break
+        query = db.select(column).where(column.in_(remaining)).distinct()
+        if column.class_ is Receipt:
+            query = query.where(Receipt.ref_count > 0)
+        found.update(db.session.execute(query).scalars())
+    return found
+
+
+def _delete_unreferenced_rows(cutoff: float) -> int:
+    """Delete receipt rows older than the cutoff that are left at ref_count 0 and
+    that no transaction points at, so their files count as orphans."""
+    used = db.select(Transaction.id).where(Transaction.receipt_id == Receipt.id).exists()
+    result = db.session.execute(db.delete(Receipt).where(
+        Receipt.ref_count <= 0, ~used,
+        Receipt.created_at < datetime.fromtimestamp(cutoff, UTC).replace(tzinfo=None)))
+    db.session.commit()
+    return result.rowcount
+
+
+def collect_orphan_receipts(grace_days: int | None = None) -> tuple[int, int, int]:
+    """Quarantine upload files nothing refers to, and delete them after a grace period.
+
+    The upload tree is walked lazily and checked against the database in
+    batches, so memory is bounded by the batch size rather than the number of
+    receipts. Only files older than the grace period are considered, which
+    keeps in-flight uploads safe. Orphans are first moved to ``.quarantine/``
+    and deleted once they have sat there for another grace period; a
+    quarantined file that is referenced again (e.g. after a restore) is moved
+    back instead. Abandoned temp files are deleted directly. Receipt rows left
+    at a reference count of zero are removed first, so their files count as
+    orphans too.
+
+    Returns (files quarantined, files deleted, bytes reclaimed).
+    """
+    if grace_days is None:
+        grace_days = _int_setting('receipt_gc_grace_days', 7, 1, 365)
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    quarantine = os.path.join(upload_folder, QUARANTINE_DIR)
+    cutoff = time.time() - grace_days * 86400
+    quarantined = deleted = reclaimed = 0
+    rows_removed = _delete_unreferenced_rows(cutoff)
+
+    for batch in _batched(_iter_files(quarantine, set()), _GC_BATCH_SIZE):
+        referenced = _referenced([rel for rel, _ in batch])
+        for rel, st in batch:
+            src = os.path.join(quarantine, rel)
+            try:
+                if rel in referenced:
+                    dest = os.path.join(upload_folder, rel)
+                    if os.path.exists(dest):
+                        os.remove(src)
+                    else:
+                        os.makedirs(os.path.dirname(dest), exist_ok=True)
+                        os.replace(src, dest)
+                    logger.warning('Receipt %s is referenced again, restored from quarantine', rel)
+                elif st.st_mtime < cutoff:
+                    os.remove(src)
+                    deleted += 1
+                    reclaimed += st.st_size
+            except OSError as e:
+                logger.error('Receipt GC failed for %s: %s', rel, e)
+
+    candidates = ((rel, st) for rel, st in _iter_files(upload_folder, {THUMBNAIL_DIR, QUARANTINE_DIR})
+                  if st.st_mtime < cutoff)
+    for batch in _batched(candidates, _GC_BATCH_SIZE):
+        orphans = {rel for rel, _ in batch} - _referenced([rel for rel, _ in batch])
+        for rel, st in batch:
+            if rel not in orphans:
+                continue
+            src = os.path.join(upload_folder, rel)
+            try:
+                if os.path.basename(rel).startswith(_TEMP_PREFIXES):
+                    os.remove(src)
+                    deleted += 1
+                    reclaimed += st.st_size
+                    continue
+                dest = os.path.join(quarantine, rel)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(src, dest)
+                os.utime(dest)  # starts the quarantine clock
+                quarantined += 1
+            except OSError as e:
+                logger.error('Receipt GC failed for %s: %s', rel, e)
+                continue
+            try:
+                os.remove(thumbnail_path(rel))
+            except OSError:
+                pass
+
+    message = (f'Receipt GC: {quarantined} quarantined, {deleted} deleted, '
+               f'{reclaimed} bytes reclaimed, {rows_removed} unreferenced rows removed')
+    logger.info(message)
+    if get_setting('backup_debug', '0') == '1':
+        from backup_service import _backup_log
+        _backup_log('INFO', message)
+    return quarantined, deleted, reclaimed
@@ -0,0 +1,117 @@
+"""Per-request timing: wall time, SQL time and count, template render time.
+
+SQLAlchemy cursor events and Flask's template signals accumulate into a
+``RequestTimings`` object on ``g``. Every response gets a ``Server-Timing``
+header (shown in the browser's network panel), and requests slower than
+``SLOW_REQUEST_MS`` are logged with their endpoint, view arguments and the
+most repeated SQL statements, which is where N+1 query patterns show up.
+The same figures feed the request histograms on ``/metrics``.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import Counter
+from typing import Any
+
+from flask import (Flask, Response, g, has_request_context, request,
+                   before_render_template, request_started, template_rendered)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import SLOW_REQUEST_MS, SERVER_TIMING_ENABLED
+from metrics import observe_request
+
+logger = logging.getLogger(__name__)
+
+TOP_STATEMENTS: int = 3
+_STATEMENT_PREVIEW: int = 200
+
+
+class RequestTimings:
+    """Accumulated timings of the current request, in seconds."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.statements: Counter[str] = Counter()
+        self.render_time = 0.0
+        self._render_starts: list[float] = []
+
+    @property
+    def wall_time(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        return (f'total;dur={self.wall_time * 1000:.1f}, '
+                f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+                f'render;dur={self.render_time * 1000:.1f}')
+
+    def repeated_statements(self) -> list[tuple[str, int]]:
+        return [(sql, n) for sql, n in self.statements.most_common(TOP_STATEMENTS) if n > 1]
+
+
+def current_timings() -> RequestTimings | None:
+    return g.get('_timings') if has_request_context() else None
+
+
+def _before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any,
+                           context: Any, executemany: bool) -> None:
+    if context is not None:
+        context._timing_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any,
+                          context: Any, executemany: bool) -> None:
+    timings = current_timings()
+    started = getattr(context, '_timing_start', None)
+    if timings is not None and started is not None:
+        timings.db_time += time.perf_counter() - started
+        timings.queries += 1
+        timings.statements[' '.join(statement.split())[:_STATEMENT_PREVIEW]] += 1
+
+
+def _start(sender: Flask, **extra: Any) -> None:
+    g._timings = RequestTimings()
+
+
+def _before_render(sender: Flask, template: Any, context: dict[str, Any], **extra: Any) -> None:
+    timings = current_timings()
+    if timings is not None:
+        timings._render_starts.append(time.perf_counter())
+
+
+def _rendered(sender: Flask, template: Any, context: dict[str, Any], **extra: Any) -> None:
+    timings = current_timings()
+    if timings is not None and timings._render_starts:
+        timings.render_time += time.perf_counter() - timings._render_starts.pop()
+
+
+def _finish(response: Response) -> Response:
+    timings = current_timings()
+    if timings is None:
+        return response
+    if SERVER_TIMING_ENABLED:
+        response.headers['Server-Timing'] = timings.server_timing()
+    wall_ms = timings.wall_time * 1000
+    observe_request(request.endpoint, request.method, response.status_code, wall_ms / 1000, timings.queries)
+    if wall_ms >= SLOW_REQUEST_MS:
+        repeated = '; '.join(f'{n}x {sql}' for sql, n in timings.repeated_statements())
+        logger.warning('Slow request %s %s endpoint=%s args=%s: %.0f ms total, %.0f ms db '
+                       '(%d queries), %.0f ms render%s',
+                       request.method, request.path, request.endpoint, request.view_args,
+                       wall_ms, timings.db_time * 1000, timings.queries, timings.render_time * 1000,
+                       f'; repeated: {repeated}' if repeated else '')
+    return response
+
+
+def init_request_timing(app: Flask) -> None:
+    """Hook the timers into the app; call before other after_request handlers
+    are registered so the total includes them."""
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    request_started.connect(_start, app)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+    app.after_request(_finish)
@@ -8,13 +8,21 @@ from datetime import datetime, timedelta
 from decimal import Decimal
 
 import calendar as cal_mod
-from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, current_app, abort
+from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, send_file, current_app, abort
 from flask_babel import gettext as _, format_date as babel_format_date
 
 from extensions import db, limiter
 from models import User, Transaction, ExpenseItem
 from helpers import (get_setting, get_tpl, parse_amount, fmt_amount, update_balance,
-                     save_receipt, delete_receipt_file, parse_submitted_date, get_app_tz, to_local)
+                     save_receipt, attach_receipt, release_receipt, detach_receipt, parse_submitted_date, get_app_tz, to_local,
+                     is_content_addressed, mark_immutable, render_icon)
+from config import THUMBNAIL_MAX_AGE
+from receipt_service import queue_receipt_processing
+from static_assets import SHELL_ASSETS, build_hash, static_url
+from db_pool import pool_status
+from health import liveness, readiness
+from metrics import render as render_metrics
+from common_counts import count_transaction, uncount_transaction
 
 logger = logging.getLogger(__name__)
 
@@ -24,28 +32,23 @@ VALID_EMAIL_TX: set[str] = {'none', 'last3', 'this_week', 'this_month'}
 
 
 @main_bp.route('/health')
+@main_bp.route('/health/ready')
 def health() -> tuple[Response, int]:
-    checks: dict[str, str] = {}
+    report, ready = readiness()
+    report['pool'] = pool_status(db.engine)
+    return jsonify(report), 200 if ready else 503
 
-    # DB check
-    try:
-        db.session.execute(db.text('SELECT 1'))
-        checks['database'] = 'ok'
-    except Exception as e:
-        checks['database'] = f'error: {e}'
 
-    # Scheduler check
-    from extensions import scheduler
-    checks['scheduler'] = 'ok' if scheduler.running else 'not running'
+@main_bp.route('/health/live')
+def health_live() -> tuple[Response, int]:
+    report, alive = liveness()
+    return jsonify(report), 200 if alive else 503
 
-    # Icons directory writable
-    icons_dir = os.path.join(current_app.root_path, 'static', 'icons')
-    checks['icons_writable'] = 'ok' if os.access(icons_dir, os.W_OK) else 'not writable'
 
-    db_ok = checks['database'] == 'ok'
-    overall = 'ok' if db_ok else 'error'
-    status_code = 200 if db_ok else 503
-    return jsonify({'status': overall, 'checks': checks}), status_code
+@main_bp.route('/metrics')
+def metrics() -> Response:
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
 
 
 @main_bp.route('/')
@@ -196,7 +199,7 @@ def add_transaction() -> str | Response:
 
         buyer = db.session.get(User, buyer_id)
         buyer_name = buyer.name if buyer else 'unknown'
-        receipt_path = save_receipt(request.files.get('receipt'), buyer_name)
+        receipt = save_receipt(request.files.get('receipt'), buyer_name)
 
         items_data = request.form.get('items_json')
         if items_data:
@@ -216,10 +219,11 @@ def add_transaction() -> str | Response:
                     from_user_id=debtor_id,
                     to_user_id=buyer_id,
                     transaction_type='expense',
-                    receipt_path=receipt_path,
                     date=submitted_date,
                     notes=notes
                 )
+                if receipt:
+                    receipt = attach_receipt(transaction, receipt)
                 db.session.add(transaction)
 
                 update_balance(debtor_id, -total_amount)
@@ -236,6 +240,7 @@ def add_transaction() -> str | Response:
                         db.session.add(expense_item)
 
             db.session.commit()
+            queue_receipt_processing(receipt)
             logger.info('Transaction created: expense buyer_id=%s', buyer_id)
             flash(_('Expense recorded successfully!'), 'success')
         else:
@@ -384,7 +389,25 @@ def user_detail(user_id: int) -> str:
 
 @main_bp.route('/receipt/<path:filepath>')
 def view_receipt(filepath: str) -> Response:
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filepath)
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    if not is_content_addressed(filepath):
+        # Pre-hash layout: revalidate via mtime/size ETag and Last-Modified.
+        return send_from_directory(upload_folder, filepath)
+    response = send_from_directory(upload_folder, filepath, etag=os.path.basename(filepath))
+    return mark_immutable(response)
+
+
+@main_bp.route('/receipt-thumb/<path:filepath>')
+def receipt_thumbnail(filepath: str) -> Response:
+    from thumbnail_service import get_thumbnail
+    path = get_thumbnail(filepath)
+    if not path:
+        abort(404)
+    if not is_content_addressed(filepath):
+        return send_file(path, max_age=THUMBNAIL_MAX_AGE)
+    # The cache file's mtime moves on every LRU touch, so validate by name instead.
+    response = send_file(path, etag=os.path.basename(path))
+    return mark_immutable(response)
 
 
 @main_bp.route('/favicon.ico')
@@ -394,17 +417,40 @@ def favicon() -> Response:
         'icon-32.png',
         mimetype='image/png',
         max_age=86400,
+        etag=f"icon-32-{get_setting('icon_version', '0')}",
     )
 
 
+@main_bp.route('/icons/icon-<int:size>.png')
+def icon(size: int) -> Response:
+    """Icon sizes beyond the stored 32/192/512 px set, rendered on demand."""
+    if not 16 <= size <= 1024:
+        abort(404)
+    version = get_setting('icon_version', '0')
+    response = current_app.response_class(render_icon(size), mimetype='image/png')
+    response.set_etag(f'icon-{size}-{version}')
+    if request.args.get('v') == version:
+        mark_immutable(response)
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
 @main_bp.route('/sw.js')
 def service_worker() -> Response:
-    return send_from_directory(
-        os.path.join(current_app.root_path, 'static'),
-        'sw.js',
-        mimetype='application/javascript',
-        max_age=0,
-    )
+    static_dir = current_app.static_folder
+    build = build_hash(static_dir)
+    version = get_setting('icon_version', '0')
+    precache = [static_url(name) for name in SHELL_ASSETS]
+    precache += [f'/static/icons/icon-{size}.png?v={version}' for size in (32, 192)]
+    precache.append(f'/icons/icon-180.png?v={version}')
+    with open(os.path.join(static_dir, 'sw.js'), encoding='utf-8') as f:
+        body = (f'const BUILD = {json.dumps(build)};\n'
+                f'const PRECACHE_URLS = {json.dumps(precache)};\n\n' + f.read())
+    response = current_app.response_class(body, mimetype='application/javascript')
+    response.set_etag(f'sw-{build}-{version}')
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 @main_bp.route('/manifest.json')
@@ -439,6 +485,7 @@ def edit_transaction(transaction_id: int) -> str | Response:
         return render_template('edit_transaction.html', trans=trans, users=users)
 
     old_amount = Decimal(str(trans.amount))
+    uncount_transaction(trans)
 
     if trans.from_user_id:
         old_from = db.session.get(User, trans.from_user_id)
@@ -509,20 +556,24 @@ def edit_transaction(transaction_id: int) -> str | Response:
             new_to.balance = Decimal(str(new_to.balance)) + Decimal(str(trans.amount))
 
     if request.form.get('remove_receipt'):
-        delete_receipt_file(trans.receipt_path, trans.id)
-        trans.receipt_path = None
+        detach_receipt(trans)
 
     new_file = request.files.get('receipt')
+    saved = None
     if new_file and new_file.filename:
-        if trans.receipt_path:
-            delete_receipt_file(trans.receipt_path, trans.id)
         buyer = db.session.get(User, trans.from_user_id) if trans.from_user_id else None
         buyer_name = buyer.name if buyer else 'unknown'
         saved = save_receipt(new_file, buyer_name)
         if saved:
-            trans.receipt_path = saved
+            # Take the new reference before releasing the old one so that
+            # re-uploading the same file never drops it to zero.
+            old_receipt = trans.receipt
+            saved = attach_receipt(trans, saved)
+            release_receipt(old_receipt)
 
+    count_transaction(trans)
     db.session.commit()
+    queue_receipt_processing(saved)
     logger.info('Transaction edited: id=%s type=%s amount=%s', trans.id, trans.transaction_type, trans.amount)
     flash(_('Transaction updated successfully!'), 'success')
     return redirect(url_for('main.view_transactions'))
@@ -541,7 +592,8 @@ def delete_transaction(transaction_id: int) -> Response:
         if to_user:
             to_user.balance = Decimal(str(to_user.balance)) - Decimal(str(trans.amount))
 
-    delete_receipt_file(trans.receipt_path, trans.id)
+    detach_receipt(trans)
+    uncount_transaction(trans)
     db.session.execute(db.delete(ExpenseItem).filter_by(transaction_id=trans.id))
     db.session.delete(trans)
     db.session.commit()
@@ -5,7 +5,6 @@ import os
 import re
 import shutil
 import subprocess
-import tarfile
 import tempfile
 import time
 from datetime import datetime
@@ -15,16 +14,18 @@ import pytz
 from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, jsonify, abort, current_app
 from flask_babel import gettext as _
 
-from extensions import db, scheduler, limiter
+from extensions import db, limiter
 from models import (User, CommonItem, CommonDescription, CommonPrice, CommonBlacklist,
                     AutoCollectLog, EmailLog, BackupLog)
 from helpers import (get_setting, set_setting, get_tpl, parse_amount, fmt_amount,
                      detect_theme, generate_and_save_icons, now_local)
-from config import THEMES, TEMPLATE_DEFAULTS, TEMPLATE_DEFAULTS_DE, BACKUP_DIR, DEFAULT_ICON_BG
-from email_service import send_all_emails, build_email_html, build_admin_summary_email
-from backup_service import run_backup, _list_backups, build_backup_status_email
-from scheduler_jobs import (_add_email_job, _add_common_job, _add_backup_job,
-                            auto_collect_common)
+from config import (THEMES, TEMPLATE_DEFAULTS, TEMPLATE_DEFAULTS_DE, BACKUP_DIR, DEFAULT_ICON_BG, JOB_SLOW_FACTOR,
+                    SLOW_QUERY_MS)
+from scheduler_jobs import auto_collect_common
+from scheduler_leader import reschedule
+from job_runs import recent_runs
+import profiler
+from slow_queries import slow_query_summary, clear_slow_queries
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +42,7 @@ _db_name = os.environ.get('DB_NAME', 'bank_of_tina')
 
 @settings_bp.route('/settings')
 def settings() -> str:
+    from backup_service import _list_backups
     cfg = {
         'smtp_server':   get_setting('smtp_server', 'smtp.gmail.com'),
         'smtp_port':     get_setting('smtp_port', '587'),
@@ -95,9 +97,18 @@ def settings() -> str:
         'backup_hour':         get_setting('backup_hour',         '3'),
         'backup_minute':       get_setting('backup_minute',       '0'),
         'backup_keep':         get_setting('backup_keep',         '7'),
+        'backup_throttle':     get_setting('backup_throttle',     '0'),
+        'backup_throttle_kbps': get_setting('backup_throttle_kbps', '0'),
         'decimal_separator':         get_setting('decimal_separator',         '.'),
         'currency_symbol':           get_setting('currency_symbol',           '\u20ac'),
         'show_email_on_dashboard':   get_setting('show_email_on_dashboard',   '0'),
+        'receipt_processing':        get_setting('receipt_processing',        '0'),
+        'receipt_max_edge':          get_setting('receipt_max_edge',          '2000'),
+        'receipt_quality':           get_setting('receipt_quality',           '80'),
+        'receipt_format':            get_setting('receipt_format',            'jpeg'),
+        'receipt_keep_original':     get_setting('receipt_keep_original',     '0'),
+        'receipt_gc_enabled':        get_setting('receipt_gc_enabled',        '1'),
+        'receipt_gc_grace_days':     get_setting('receipt_gc_grace_days',     '7'),
     }
     common_items        = db.session.execute(db.select(CommonItem).order_by(CommonItem.name)).scalars().all()
     common_descriptions = db.session.execute(db.select(CommonDescription).order_by(CommonDescription.value)).scalars().all()
@@ -107,6 +118,9 @@ def settings() -> str:
     email_logs          = db.session.execute(db.select(EmailLog).order_by(EmailLog.id.desc()).limit(500)).scalars().all()
     backup_logs         = db.session.execute(db.select(BackupLog).order_by(BackupLog.id.desc()).limit(500)).scalars().all()
     backups             = _list_backups()
+    job_runs            = recent_runs(50)
+    profiles            = profiler.list_profiles()
+    slow_queries        = slow_query_summary(50)
     all_users = db.session.execute(db.select(User).order_by(User.name)).scalars().all()
     timezone_groups = {}
     for tz in pytz.common_timezones:
@@ -116,6 +130,9 @@ def settings() -> str:
                            common_descriptions=common_descriptions, common_prices=common_prices,
                            common_blacklist=common_blacklist, auto_collect_logs=auto_collect_logs,
                            email_logs=email_logs, backup_logs=backup_logs, backups=backups,
+                           job_runs=job_runs, job_slow_factor=f'{JOB_SLOW_FACTOR:g}',
+                           profiles=profiles, profiler_enabled=bool(profiler.PROFILER_TOKEN),
+                           slow_queries=slow_queries, slow_query_ms=SLOW_QUERY_MS,
                            all_users=all_users, timezone_groups=timezone_groups,
                            themes=THEMES, current_theme=detect_theme())
 
@@ -143,6 +160,7 @@ def settings_email() -> Response:
 @settings_bp.route('/settings/send-now', methods=['POST'])
 @limiter.limit("5/minute")
 def settings_send_now() -> Response:
+    from email_service import send_all_emails
     success, fail, errors = send_all_emails()
     flash(_('%(success)s email(s) sent, %(fail)s failed.', success=success, fail=fail), 'success' if fail == 0 else 'error')
     if errors and get_setting('email_debug', '0') == '1':
@@ -174,12 +192,10 @@ def settings_schedule() -> Response:
     set_setting('schedule_hour',    hour)
     set_setting('schedule_minute',  minute)
 
+    reschedule()
     if enabled == '1':
-        _add_email_job(current_app._get_current_object())
         flash(_('Schedule saved and enabled.'), 'success')
     else:
-        if scheduler.get_job('email_job'):
-            scheduler.remove_job('email_job')
         flash(_('Schedule disabled.'), 'success')
 
     return redirect(url_for('settings_bp.settings'))
@@ -204,10 +220,7 @@ def settings_general() -> Response:
     timezone = request.form.get('timezone', 'UTC')
     if timezone in pytz.common_timezones:
         set_setting('timezone', timezone)
-        if get_setting('schedule_enabled') == '1':
-            _add_email_job(current_app._get_current_object())
-        if get_setting('common_auto_enabled', '0') == '1':
-            _add_common_job(current_app._get_current_object())
+        reschedule()
     admin_id = request.form.get('site_admin_id', '').strip()
     if admin_id == '' or (admin_id.isdigit() and db.session.get(User, int(admin_id))):
         set_setting('site_admin_id', admin_id)
@@ -221,6 +234,38 @@ def settings_general() -> Response:
     return redirect(url_for('settings_bp.settings'))
 
 
+@settings_bp.route('/settings/receipts', methods=['POST'])
+def settings_receipts() -> Response:
+    try:
+        max_edge = str(max(320, min(10000, int(request.form.get('receipt_max_edge', '2000')))))
+    except ValueError:
+        max_edge = '2000'
+    try:
+        quality = str(max(30, min(95, int(request.form.get('receipt_quality', '80')))))
+    except ValueError:
+        quality = '80'
+    fmt = request.form.get('receipt_format', 'jpeg')
+    if fmt not in ('jpeg', 'webp'):
+        fmt = 'jpeg'
+    try:
+        grace_days = str(max(1, min(365, int(request.form.get('receipt_gc_grace_days', '7')))))
+    except ValueError:
+        grace_days = '7'
+    gc_enabled = '1' if request.form.get('receipt_gc_enabled') else '0'
+
+    set_setting('receipt_processing',    '1' if request.form.get('receipt_processing')    else '0', commit=False)
+    set_setting('receipt_keep_original', '1' if request.form.get('receipt_keep_original') else '0', commit=False)
+    set_setting('receipt_max_edge', max_edge, commit=False)
+    set_setting('receipt_quality',  quality,  commit=False)
+    set_setting('receipt_format',   fmt,      commit=False)
+    set_setting('receipt_gc_enabled',    gc_enabled, commit=False)
+    set_setting('receipt_gc_grace_days', grace_days, commit=False)
+    db.session.commit()
+    reschedule()
+    flash(_('Receipt settings saved.'), 'success')
+    return redirect(url_for('settings_bp.settings'))
+
+
 @settings_bp.route('/api/common-items')
 def api_common_items() -> Response:
     if get_setting('common_enabled', '1') != '1':
@@ -385,12 +430,10 @@ def settings_common_auto() -> Response:
     set_setting('common_prices_auto',            prices_auto)
     set_setting('common_prices_threshold',       prices_threshold)
 
+    reschedule()
     if enabled == '1':
-        _add_common_job(current_app._get_current_object())
         flash(_('Auto-collect schedule saved and enabled.'), 'success')
     else:
-        if scheduler.get_job('common_job'):
-            scheduler.remove_job('common_job')
         flash(_('Auto-collect schedule disabled.'), 'success')
 
     return redirect(url_for('settings_bp.settings'))
@@ -500,6 +543,7 @@ def settings_icon() -> Response:
 
 @settings_bp.route('/settings/templates/preview/email')
 def preview_email() -> str:
+    from email_service import build_email_html
     user = db.session.execute(db.select(User).filter_by(is_active=True).order_by(User.name)).scalar()
     if not user:
         class _Dummy:
@@ -514,6 +558,7 @@ def preview_email() -> str:
 
 @settings_bp.route('/settings/templates/preview/admin-summary')
 def preview_admin_summary() -> str:
+    from email_service import build_admin_summary_email
     users = db.session.execute(db.select(User).filter_by(is_active=True).order_by(User.name)).scalars().all()
     if not users:
         class _D:
@@ -526,6 +571,7 @@ def preview_admin_summary() -> str:
 
 @settings_bp.route('/settings/templates/preview/backup')
 def preview_backup() -> str:
+    from backup_service import build_backup_status_email
     return build_backup_status_email(
         True, f'bot_backup_{now_local().strftime("%Y_%m_%d")}_03-00-00.tar.gz', 5, 1)
 
@@ -545,6 +591,12 @@ def settings_backup() -> Response:
     except ValueError:
         keep = '7'
 
+    throttle = '1' if request.form.get('backup_throttle') else '0'
+    try:
+        throttle_kbps = str(max(0, int(request.form.get('backup_throttle_kbps', '0'))))
+    except ValueError:
+        throttle_kbps = '0'
+
     admin_email = '1' if request.form.get('backup_admin_email') else '0'
     set_setting('backup_enabled',     enabled)
     set_setting('backup_debug',       debug)
@@ -553,13 +605,13 @@ def settings_backup() -> Response:
     set_setting('backup_hour',    hour)
     set_setting('backup_minute',  minute)
     set_setting('backup_keep',    keep)
+    set_setting('backup_throttle',      throttle)
+    set_setting('backup_throttle_kbps', throttle_kbps)
 
+    reschedule()
     if enabled == '1':
-        _add_backup_job(current_app._get_current_object())
         flash(_('Backup schedule saved and enabled.'), 'success')
     else:
-        if scheduler.get_job('backup_job'):
-            scheduler.remove_job('backup_job')
         flash(_('Backup schedule disabled.'), 'success')
 
     return redirect(url_for('settings_bp.settings'))
@@ -568,6 +620,7 @@ def settings_backup() -> Response:
 @settings_bp.route('/settings/backup/create', methods=['POST'])
 @limiter.limit("5/minute")
 def settings_backup_create() -> Response:
+    from backup_service import run_backup
     ok, result = run_backup()
     if ok:
         flash(_('Backup created: %(result)s', result=result), 'success')
@@ -576,6 +629,18 @@ def settings_backup_create() -> Response:
     return redirect(url_for('settings_bp.settings'))
 
 
+@settings_bp.route('/settings/backup/stream', methods=['POST'])
+@limiter.limit("5/minute")
+def settings_backup_stream() -> Response:
+    from backup_service import stream_backup
+    ok, result, chunks = stream_backup()
+    if not ok:
+        flash(_('Backup failed: %(result)s', result=result), 'error')
+        return redirect(url_for('settings_bp.settings'))
+    return Response(chunks, mimetype='application/gzip',
+                    headers={'Content-Disposition': f'attachment; filename={result}'})
+
+
 @settings_bp.route('/settings/backup/clear-log', methods=['POST'])
 def settings_backup_clear_log() -> Response:
     db.session.execute(db.delete(BackupLog))
@@ -606,6 +671,34 @@ def backup_delete(filename: str) -> Response:
     return redirect(url_for('settings_bp.settings'))
 
 
+@settings_bp.route('/settings/profiles/<name>')
+def profile_view(name: str) -> Response:
+    path = profiler.profile_path(name) or abort(404)
+    report = profiler.profile_report(path, request.args.get('sort', 'cumulative'))
+    return Response(report, mimetype='text/plain')
+
+
+@settings_bp.route('/settings/profiles/<name>/download')
+def profile_download(name: str) -> Response:
+    from flask import send_file
+    path = profiler.profile_path(name) or abort(404)
+    return send_file(path, as_attachment=True, download_name=name)
+
+
+@settings_bp.route('/settings/profiles/clear', methods=['POST'])
+def profiles_clear() -> Response:
+    removed = profiler.clear_profiles()
+    flash(_('%(count)s profiles deleted.', count=removed), 'success')
+    return redirect(url_for('settings_bp.settings'))
+
+
+@settings_bp.route('/settings/slow-queries/clear', methods=['POST'])
+def slow_queries_clear() -> Response:
+    clear_slow_queries()
+    flash(_('Slow query log cleared.'), 'success')
+    return redirect(url_for('settings_bp.settings'))
+
+
 @settings_bp.route('/backups/upload-chunk', methods=['POST'])
 def backup_upload_chunk() -> tuple[Response, int] | Response:
     upload_id   = request.form.get('uploadId', '')
@@ -646,6 +739,7 @@ def backup_upload_chunk() -> tuple[Response, int] | Response:
 @settings_bp.route('/backups/restore/<filename>', methods=['POST'])
 @limiter.limit("3/minute")
 def backup_restore(filename: str) -> Response:
+    import tarfile
     if not BACKUP_FILENAME_RE.match(filename):
         flash(_('Invalid filename.'), 'error')
         return redirect(url_for('settings_bp.settings'))
@@ -1,19 +1,23 @@
 from __future__ import annotations
 
 import logging
+import os
+from typing import Any
 
 import pytz
 from flask import Flask
-from sqlalchemy import func
+from sqlalchemy import Numeric, Row, cast, func
 
 from flask_babel import force_locale
 
 from extensions import db, scheduler
-from models import (User, Transaction, ExpenseItem, CommonItem, CommonDescription,
-                    CommonPrice, CommonBlacklist, AutoCollectLog)
+from models import (User, CommonItem, CommonDescription, CommonPrice, CommonBlacklist,
+                    AutoCollectCount, AutoCollectLog)
+from common_counts import count_new_rows
 from helpers import get_setting, get_tpl, apply_template, now_local
-from email_service import send_all_emails, send_single_email
-from backup_service import run_backup, _prune_old_backups, _list_backups, build_backup_status_email
+from receipt_service import collect_orphan_receipts
+from job_runs import record_job_run
+from config import BACKUP_DIR
 
 logger = logging.getLogger(__name__)
 
@@ -29,91 +33,92 @@ def _add_email_job(app: Flask) -> None:
         tz = pytz.UTC
 
     def job() -> None:
-        with app.app_context():
+        from email_service import send_all_emails
+        with app.app_context(), record_job_run('email_job') as run:
             locale = get_setting('language', 'de')
             with force_locale(locale):
-                send_all_emails()
+                sent, failed, errors = send_all_emails()
+            run.count(sent, 'emails')
+            if failed:
+                run.fail(f'{failed} failed: ' + '; '.join(errors))
 
     scheduler.add_job(job, 'cron', day_of_week=day, hour=hour, minute=minute,
                       timezone=tz, id='email_job', replace_existing=True)
     logger.info('Email job scheduled: day=%s hour=%s minute=%s tz=%s', day, hour, minute, tz_name)
 
 
-def auto_collect_common() -> None:
+# Setting prefix, log/blacklist category, common list column.
+AUTO_COLLECT_CATEGORIES: tuple[tuple[str, str, Any], ...] = (
+    ('common_items', 'item', CommonItem.name),
+    ('common_descriptions', 'description', CommonDescription.value),
+    ('common_prices', 'price', CommonPrice.value),
+)
+
+
+def _auto_collect_candidates(category: str, target: Any, threshold: int) -> list[Row]:
+    """(value, blacklisted) for every counted value used at least `threshold`
+    times that is blacklisted or not yet in `target`, in a single query."""
+    counts = (db.select(AutoCollectCount.value)
+              .where(AutoCollectCount.category == category, AutoCollectCount.uses >= threshold)
+              .subquery())
+    if category == 'price':
+        value = cast(counts.c.value, Numeric(12, 2))
+        # Blacklisted prices are typed with either decimal separator.
+        listed = cast(func.replace(CommonBlacklist.value, ',', '.'), Numeric(12, 2)) == value
+        same = target == value
+    else:
+        value = counts.c.value
+        listed = func.lower(CommonBlacklist.value) == func.lower(value)
+        same = func.lower(target) == func.lower(value)
+    blacklisted = db.select(CommonBlacklist.id).where(CommonBlacklist.type == category, listed).exists()
+    existing = db.select(target).where(same).exists()
+    return db.session.execute(
+        db.select(value.label('value'), blacklisted.label('blacklisted'))
+        .where(blacklisted | ~existing).order_by(value)).all()
+
+
+def auto_collect_common() -> int:
+    """Add frequently used items, descriptions and prices to the common lists; returns how many.
+
+    Usage comes from the counters in ``common_counts``, which are first brought
+    up to date with the rows added since the last run.
+    """
     debug = get_setting('common_auto_debug', '0') == '1'
     added_count = 0
     skip_count = 0
-
-    if get_setting('common_items_auto', '0') == '1':
-        threshold = int(get_setting('common_items_threshold', '5'))
-        blacklisted = {b.value.lower() for b in db.session.execute(db.select(CommonBlacklist).filter_by(type='item')).scalars().all()}
-        rows = db.session.execute(db.select(ExpenseItem.item_name, func.count(ExpenseItem.id))
-                          .group_by(ExpenseItem.item_name)
-                          .having(func.count(ExpenseItem.id) >= threshold)).all()
-        for name, _ in rows:
-            if name.lower() in blacklisted:
-                if debug:
-                    db.session.add(AutoCollectLog(level='SKIP', category='item',
-                                                  message=f'"{name}" (blacklist)'))
-                skip_count += 1
-            elif not db.session.execute(db.select(CommonItem).filter_by(name=name)).scalar():
-                db.session.add(CommonItem(name=name))
-                if debug:
-                    db.session.add(AutoCollectLog(level='ADDED', category='item',
-                                                  message=f'Added "{name}"'))
-                added_count += 1
-
-    if get_setting('common_descriptions_auto', '0') == '1':
-        threshold = int(get_setting('common_descriptions_threshold', '5'))
-        blacklisted = {b.value.lower() for b in db.session.execute(db.select(CommonBlacklist).filter_by(type='description')).scalars().all()}
-        rows = db.session.execute(db.select(Transaction.description, func.count(Transaction.id))
-                          .group_by(Transaction.description)
-                          .having(func.count(Transaction.id) >= threshold)).all()
-        for desc, _ in rows:
-            if desc.lower() in blacklisted:
-                if debug:
-                    db.session.add(AutoCollectLog(level='SKIP', category='description',
-                                                  message=f'"{desc}" (blacklist)'))
-                skip_count += 1
-            elif not db.session.execute(db.select(CommonDescription).filter_by(value=desc)).scalar():
-                db.session.add(CommonDescription(value=desc))
-                if debug:
-                    db.session.add(AutoCollectLog(level='ADDED', category='description',
-                                                  message=f'Added "{desc}"'))
-                added_count += 1
-
-    if get_setting('common_prices_auto', '0') == '1':
-        threshold = int(get_setting('common_prices_threshold', '5'))
-        blacklisted = {b.value for b in db.session.execute(db.select(CommonBlacklist).filter_by(type='price')).scalars().all()}
-        rows = db.session.execute(db.select(ExpenseItem.price, func.count(ExpenseItem.id))
-                          .group_by(ExpenseItem.price)
-                          .having(func.count(ExpenseItem.id) >= threshold)).all()
-        for price, _ in rows:
-            price_str = f"{price:.2f}"
-            if price_str in blacklisted:
-                if debug:
-                    db.session.add(AutoCollectLog(level='SKIP', category='price',
-                                                  message=f'\u20ac{price_str} (blacklist)'))
-                skip_count += 1
-            elif not db.session.execute(db.select(CommonPrice).filter_by(value=price)).scalar():
-                db.session.add(CommonPrice(value=price))
-                if debug:
-                    db.session.add(AutoCollectLog(level='ADDED', category='price',
-                                                  message=f'Added \u20ac{price_str}'))
-                added_count += 1
-
-    if debug:
-        db.session.add(AutoCollectLog(level='INFO', category='system',
-                                      message=f'Run complete: {added_count} added, {skip_count} skipped'))
-    db.session.commit()
+    logs: list[dict[str, str]] = []
+
+    enabled = [(category, target, int(get_setting(f'{prefix}_threshold', '5')))
+               for prefix, category, target in AUTO_COLLECT_CATEGORIES
+               if get_setting(f'{prefix}_auto', '0') == '1']
+    if enabled:
+        count_new_rows()
+
+    for category, target, threshold in enabled:
+        rows = _auto_collect_candidates(category, target, threshold)
+        new = [value for value, blacklisted in rows if not blacklisted]
+        if new:
+            db.session.execute(db.insert(target.class_), [{target.key: value} for value in new])
+        added_count += len(new)
+        skip_count += len(rows) - len(new)
+        if debug:
+            for value, blacklisted in rows:
+                label = f'\u20ac{value:.2f}' if category == 'price' else f'"{value}"'
+                logs.append({'level': 'SKIP', 'category': category, 'message': f'{label} (blacklist)'}
+                            if blacklisted else
+                            {'level': 'ADDED', 'category': category, 'message': f'Added {label}'})
 
     if debug:
+        logs.append({'level': 'INFO', 'category': 'system',
+                     'message': f'Run complete: {added_count} added, {skip_count} skipped'})
+        db.session.execute(db.insert(AutoCollectLog), logs)
         oldest_kept = db.session.execute(
-            db.select(AutoCollectLog).order_by(AutoCollectLog.id.desc()).offset(500)
+            db.select(AutoCollectLog.id).order_by(AutoCollectLog.id.desc()).offset(500)
         ).scalar()
         if oldest_kept:
-            db.session.execute(db.delete(AutoCollectLog).where(AutoCollectLog.id <= oldest_kept.id))
-        db.session.commit()
+            db.session.execute(db.delete(AutoCollectLog).where(AutoCollectLog.id <= oldest_kept))
+    db.session.commit()
+    return added_count
 
 
 def _add_common_job(app: Flask) -> None:
@@ -126,8 +131,8 @@ def _add_common_job(app: Flask) -> None:
         tz = pytz.UTC
 
     def job() -> None:
-        with app.app_context():
-            auto_collect_common()
+        with app.app_context(), record_job_run('common_job') as run:
+            run.count(auto_collect_common(), 'rows')
 
     scheduler.add_job(job, 'cron', day_of_week=day, hour=hour, minute=minute,
                       timezone=tz, id='common_job', replace_existing=True)
@@ -145,10 +150,16 @@ def _add_backup_job(app: Flask) -> None:
         tz = pytz.UTC
 
     def job() -> None:
-        with app.app_context():
+        from backup_service import run_backup, _prune_old_backups, _list_backups, build_backup_status_email
+        from email_service import send_single_email
+        with app.app_context(), record_job_run('backup_job') as run:
             locale = get_setting('language', 'de')
             with force_locale(locale):
-                ok, result = run_backup()
+                ok, result = run_backup(throttled=get_setting('backup_throttle', '0') == '1')
+                if ok:
+                    run.count(os.path.getsize(os.path.join(BACKUP_DIR, result)), 'bytes')
+                else:
+                    run.fail(result)
                 pruned = 0
                 if ok and keep > 0:
                     before = len(_list_backups())
@@ -171,6 +182,22 @@ def _add_backup_job(app: Flask) -> None:
     logger.info('Backup job scheduled: day=%s hour=%s minute=%s', day, hour, minute)
 
 
+def _add_receipt_gc_job(app: Flask) -> None:
+    try:
+        tz = pytz.timezone(get_setting('timezone', 'UTC'))
+    except pytz.exceptions.UnknownTimeZoneError:
+        tz = pytz.UTC
+
+    def job() -> None:
+        with app.app_context(), record_job_run('receipt_gc_job') as run:
+            _, _, reclaimed = collect_orphan_receipts()
+            run.count(reclaimed, 'bytes')
+
+    scheduler.add_job(job, 'cron', hour=4, minute=30,
+                      timezone=tz, id='receipt_gc_job', replace_existing=True)
+    logger.info('Receipt GC job scheduled: daily at 04:30')
+
+
 def _restore_schedule(app: Flask) -> None:
     if get_setting('schedule_enabled') == '1':
         _add_email_job(app)
@@ -178,3 +205,5 @@ def _restore_schedule(app: Flask) -> None:
         _add_common_job(app)
     if get_setting('backup_enabled', '0') == '1':
         _add_backup_job(app)
+    if get_setting('receipt_gc_enabled', '1') == '1':
+        _add_receipt_gc_job(app)
@@ -0,0 +1,192 @@
+"""Leader election so only one gunicorn worker runs the scheduled jobs.
+
+Every worker starts APScheduler paused and runs a heartbeat thread that tries
+to claim or renew the ``scheduler_lease`` row with a single conditional
+UPDATE. The worker holding the lease loads the job schedule and resumes its
+scheduler; the others stay on standby and take over once the lease expires
+(e.g. the leader was killed), or immediately after a graceful shutdown since
+the lease is released then.
+
+Schedule changes made through the settings pages may be handled by any
+worker, so they bump ``schedule_version`` on the lease row; the leader reloads
+its jobs when it sees a new version, at the latest one heartbeat later.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import UTC, datetime, timedelta
+
+from flask import Flask, current_app
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from extensions import db, scheduler
+from models import SchedulerLease
+from config import SCHEDULER_LEASE_TTL, SCHEDULER_HEARTBEAT
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME: str = 'scheduler'
+
+_identity: str = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+_lock = threading.Lock()
+_stop = threading.Event()
+_is_leader: bool = False
+_applied_version: int | None = None
+_lease_until: datetime | None = None
+_thread: threading.Thread | None = None
+
+
+def _now() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def is_leader() -> bool:
+    return _is_leader
+
+
+def lease_expires_in() -> float | None:
+    """Seconds until our lease runs out, while we hold it."""
+    until = _lease_until
+    return (until - _now()).total_seconds() if _is_leader and until else None
+
+
+def election_state() -> str:
+    """'ok' while the heartbeat thread runs, 'stopped' if it died, 'not started' otherwise."""
+    if _thread is None:
+        return 'not started'
+    return 'ok' if _thread.is_alive() else 'stopped'
+
+
+def try_acquire_lease() -> bool:
+    """Claim the lease if it is free or expired, or renew it if we hold it."""
+    global _lease_until
+    now = _now()
+    expires = now + timedelta(seconds=SCHEDULER_LEASE_TTL)
+    result = db.session.execute(
+        db.update(SchedulerLease)
+        .where(SchedulerLease.name == LEASE_NAME)
+        .where((SchedulerLease.holder == _identity) | SchedulerLease.holder.is_(None)
+               | (SchedulerLease.expires_at < now))
+        .values(holder=_identity, expires_at=expires, heartbeat_at=now)
+    )
+    db.session.commit()
+    if result.rowcount:
+        _lease_until = expires
+        return True
+    if db.session.get(SchedulerLease, LEASE_NAME) is not None:
+        return False
+    try:
+        db.session.add(SchedulerLease(name=LEASE_NAME, holder=_identity, expires_at=expires,
+                                      heartbeat_at=now, schedule_version=0))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    _lease_until = expires
+    return True
+
+
+def release_lease() -> None:
+    db.session.execute(
+        db.update(SchedulerLease)
+        .where(SchedulerLease.name == LEASE_NAME, SchedulerLease.holder == _identity)
+        .values(holder=None, expires_at=None)
+    )
+    db.session.commit()
+
+
+def _schedule_version() -> int:
+    return db.session.execute(
+        db.select(SchedulerLease.schedule_version).where(SchedulerLease.name == LEASE_NAME)
+    ).scalar() or 0
+
+
+def _reload_jobs(app: Flask, version: int) -> None:
+    global _applied_version
+    from scheduler_jobs import _restore_schedule
+    scheduler.remove_all_jobs()
+    _restore_schedule(app)
+    _applied_version = version
+
+
+def _step_down() -> None:
+    global _is_leader, _applied_version
+    _is_leader = False
+    _applied_version = None
+    if scheduler.running:
+        scheduler.pause()
+    scheduler.remove_all_jobs()
+    logger.warning('Scheduler lease lost by %s, jobs paused', _identity)
+
+
+def heartbeat(app: Flask) -> None:
+    """One election round: claim/renew the lease and apply schedule changes."""
+    global _is_leader
+    with _lock, app.app_context():
+        try:
+            leading = try_acquire_lease()
+            version = _schedule_version()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error('Scheduler lease heartbeat failed: %s', str(e)[:200])
+            # Without a renewal another worker may take over once the lease runs out.
+            if _is_leader and (_lease_until is None or _now() >= _lease_until):
+                _step_down()
+            return
+
+        if leading and not _is_leader:
+            _reload_jobs(app, version)
+            _is_leader = True
+            if scheduler.running:
+                scheduler.resume()
+            logger.info('Scheduler lease acquired by %s, jobs running here', _identity)
+        elif leading and version != _applied_version:
+            _reload_jobs(app, version)
+            logger.info('Schedule reloaded (version %d)', version)
+        elif not leading and _is_leader:
+            _step_down()
+
+
+def reschedule() -> None:
+    """Publish changed schedule settings to whichever worker is the leader."""
+    db.session.execute(
+        db.update(SchedulerLease)
+        .where(SchedulerLease.name == LEASE_NAME)
+        .values(schedule_version=SchedulerLease.schedule_version + 1)
+    )
+    db.session.commit()
+    if _is_leader:
+        with _lock:
+            _reload_jobs(current_app._get_current_object(), _schedule_version())
+
+
+def _run(app: Flask) -> None:
+    while not _stop.is_set():
+        heartbeat(app)
+        _stop.wait(SCHEDULER_HEARTBEAT)
+
+
+def _shutdown(app: Flask) -> None:
+    _stop.set()
+    with _lock, app.app_context():
+        if _is_leader:
+            try:
+                release_lease()
+            except SQLAlchemyError:
+                db.session.rollback()
+    scheduler.shutdown(wait=False)
+
+
+def start_leader_election(app: Flask) -> None:
+    """Start this worker's scheduler paused and begin competing for the lease."""
+    global _thread
+    scheduler.start(paused=True)
+    _thread = threading.Thread(target=_run, args=(app,), name='scheduler-lease', daemon=True)
+    _thread.start()
+    atexit.register(_shutdown, app)
+    logger.info('APScheduler started (standby, worker %s)', _identity)
@@ -0,0 +1,191 @@
+"""Slow-query log with EXPLAIN capture.
+
+Cursor events time every statement. One that takes ``SLOW_QUERY_MS`` or
+longer is logged as a warning and queued on ``g`` with its normalized text,
+a fingerprint of it, the shape of its parameters (types only, never values)
+and the backend's query plan (``EXPLAIN`` on MariaDB, ``EXPLAIN QUERY PLAN``
+on SQLite), taken right away on the same connection. Plans are captured at
+most once per fingerprint every ``SLOW_QUERY_EXPLAIN_INTERVAL`` seconds per
+worker. The queue is written to the ``slow_query`` table on a separate
+connection when the request or app context ends, so a rolled-back request
+keeps its entries; the newest ``SLOW_QUERY_KEEP`` rows are kept. Settings →
+General aggregates them by fingerprint.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from datetime import UTC, datetime
+from typing import Any
+
+from flask import Flask, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+from extensions import db
+from models import SlowQuery
+from config import SLOW_QUERY_LOG, SLOW_QUERY_MS, SLOW_QUERY_KEEP, SLOW_QUERY_EXPLAIN_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+_STATEMENT_MAX: int = 4000
+_PLAN_MAX: int = 4000
+_EXPLAINABLE: tuple[str, ...] = ('select', 'with', 'update', 'delete')
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAM_RE = re.compile(r'%\(\w+\)s|%s|\?')
+_LIST_RE = re.compile(r'\((?:\?, )+\?\)')
+_ROWS_RE = re.compile(r'(\(\?(?:\.\.\.)?\))(?:, \1)+')
+
+_explained: dict[str, float] = {}
+_explained_lock = threading.Lock()
+_local = threading.local()
+
+
+def normalize(statement: str) -> str:
+    """Statement text with literals and bound parameters replaced by ``?`` and
+    IN lists and multi-row VALUES collapsed, so its executions share one form."""
+    sql = ' '.join(statement.split())
+    sql = _PARAM_RE.sub('?', _LITERAL_RE.sub('?', sql))
+    sql = _LIST_RE.sub('(?...)', sql)
+    return _ROWS_RE.sub(r'\1, ...', sql)
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def _params_shape(parameters: Any, executemany: bool) -> str:
+    if executemany:
+        return f'{len(parameters)} rows of {_params_shape(parameters[0], False)}' if parameters else '0 rows'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{k}: {type(v).__name__}' for k, v in parameters.items()) + '}'
+    if isinstance(parameters, (list, tuple)):
+        return '(' + ', '.join(type(v).__name__ for v in parameters) + ')'
+    return type(parameters).__name__
+
+
+def _due_for_explain(fp: str) -> bool:
+    now = time.monotonic()
+    with _explained_lock:
+        if now - _explained.get(fp, -SLOW_QUERY_EXPLAIN_INTERVAL) < SLOW_QUERY_EXPLAIN_INTERVAL:
+            return False
+        _explained[fp] = now
+        return True
+
+
+def _explain(conn: Any, statement: str, parameters: Any) -> str:
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    # A raw DBAPI cursor: no events fire, and the statement's own cursor keeps its rows.
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        columns = [d[0] for d in cursor.description or ()]
+        rows = cursor.fetchall()
+    except Exception as e:
+        return f'EXPLAIN failed: {e}'
+    finally:
+        cursor.close()
+    lines = [' | '.join(columns)] + [' | '.join('' if v is None else str(v) for v in row) for row in rows]
+    return '\n'.join(lines)[:_PLAN_MAX]
+
+
+def _before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any,
+                           context: Any, executemany: bool) -> None:
+    if context is not None:
+        context._slow_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any,
+                          context: Any, executemany: bool) -> None:
+    started = getattr(context, '_slow_query_start', None)
+    if started is None or getattr(_local, 'flushing', False) or not has_app_context():
+        return
+    duration = time.perf_counter() - started
+    if duration * 1000 < SLOW_QUERY_MS:
+        return
+    normalized = normalize(statement)
+    fp = fingerprint(normalized)
+    plan = None
+    if (not executemany and statement.lstrip().lower().startswith(_EXPLAINABLE)
+            and _due_for_explain(fp)):
+        plan = _explain(conn, statement, parameters)
+    endpoint = request.endpoint if has_request_context() else None
+    logger.warning('Slow query %.0f ms (%s): %s', duration * 1000, endpoint or 'background',
+                   normalized[:300])
+    g.setdefault('_slow_queries', []).append({
+        'created_at': datetime.now(UTC).replace(tzinfo=None),
+        'fingerprint': fp,
+        'statement': normalized[:_STATEMENT_MAX],
+        'params': _params_shape(parameters, executemany)[:500],
+        'duration': duration,
+        'endpoint': endpoint,
+        'query_plan': plan,
+    })
+
+
+def _flush(exc: BaseException | None = None) -> None:
+    pending = g.pop('_slow_queries', None)
+    if not pending:
+        return
+    _local.flushing = True
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(db.insert(SlowQuery), pending)
+            oldest_kept = conn.execute(
+                db.select(SlowQuery.id).order_by(SlowQuery.id.desc()).offset(SLOW_QUERY_KEEP)).scalar()
+            if oldest_kept:
+                conn.execute(db.delete(SlowQuery).where(SlowQuery.id <= oldest_kept))
+    except SQLAlchemyError:
+        logger.exception('Could not save %d slow queries', len(pending))
+    finally:
+        _local.flushing = False
+
+
+def slow_query_summary(limit: int = 50) -> list[dict[str, Any]]:
+    """Logged statements grouped by fingerprint, by cumulative time."""
+    total = db.func.sum(SlowQuery.duration)
+    groups = db.session.execute(
+        db.select(SlowQuery.fingerprint, db.func.count(SlowQuery.id), total,
+                  db.func.max(SlowQuery.duration), db.func.max(SlowQuery.id))
+        .group_by(SlowQuery.fingerprint).order_by(total.desc()).limit(limit)).all()
+    fps = [row[0] for row in groups]
+    latest = {q.fingerprint: q for q in db.session.execute(
+        db.select(SlowQuery).where(SlowQuery.id.in_([row[4] for row in groups]))).scalars()}
+    plan_ids = db.select(db.func.max(SlowQuery.id)).where(
+        SlowQuery.fingerprint.in_(fps), SlowQuery.query_plan.is_not(None)).group_by(SlowQuery.fingerprint)
+    plans = dict(db.session.execute(
+        db.select(SlowQuery.fingerprint, SlowQuery.query_plan).where(SlowQuery.id.in_(plan_ids))).all())
+    return [{
+        'fingerprint': fp,
+        'count': count,
+        'total_ms': round(total_s * 1000, 1),
+        'avg_ms': round(total_s * 1000 / count, 1),
+        'max_ms': round(max_s * 1000, 1),
+        'last_seen': latest[fp].created_at,
+        'endpoint': latest[fp].endpoint,
+        'statement': latest[fp].statement,
+        'params': latest[fp].params,
+        'query_plan': plans.get(fp),
+    } for fp, count, total_s, max_s, _ in groups]
+
+
+def clear_slow_queries() -> None:
+    db.session.execute(db.delete(SlowQuery))
+    db.session.commit()
+    with _explained_lock:
+        _explained.clear()
+
+
+def init_slow_queries(app: Flask) -> None:
+    """Time every statement; queued slow ones are saved when a request or app context ends."""
+    if not SLOW_QUERY_LOG:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.teardown_request(_flush)
+    app.teardown_appcontext(_flush)
@@ -0,0 +1,181 @@
+"""One-off start-up work, run once per deploy by ``flask bot-init``.
+
+Schema upgrades, data fix-ups and default icon generation used to run at
+import time in every worker. They now live here so workers boot without any
+database writes. Every step is idempotent; fix-ups additionally record their
+name in the ``bot_init_fixups`` setting so later runs skip them after a
+single read.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections.abc import Callable
+
+from flask import Flask, current_app
+from sqlalchemy.exc import OperationalError
+
+from extensions import db, init_migrate
+from models import Setting
+from helpers import get_setting, set_setting, generate_and_save_icons
+from config import TEMPLATE_DEFAULTS, TEMPLATE_DEFAULTS_DE, DEFAULT_ICON_BG
+
+logger = logging.getLogger(__name__)
+
+FIXUPS_SETTING: str = 'bot_init_fixups'
+
+_TPL_KEYS: list[str] = ['tpl_email_subject', 'tpl_email_greeting', 'tpl_email_intro',
+                        'tpl_email_footer1', 'tpl_email_footer2',
+                        'tpl_admin_subject', 'tpl_admin_intro', 'tpl_admin_footer',
+                        'tpl_backup_subject', 'tpl_backup_footer']
+
+
+def wait_for_database(max_retries: int = 5) -> None:
+    """Block until the database answers, backing off exponentially."""
+    for attempt in range(1, max_retries + 1):
+        try:
+            db.session.execute(db.text('SELECT 1'))
+            return
+        except OperationalError:
+            db.session.rollback()
+            if attempt == max_retries:
+                logger.error('Could not connect to database after %d attempts', max_retries)
+                raise
+            delay = 2 ** (attempt - 1)
+            logger.warning('DB not ready, retrying in %ds... (%d/%d)', delay, attempt, max_retries)
+            time.sleep(delay)
+
+
+def upgrade_database() -> None:
+    from flask_migrate import upgrade, stamp
+    tables = db.inspect(db.engine).get_table_names()
+    has_alembic = 'alembic_version' in tables
+    has_tables = 'user' in tables
+
+    if has_tables and not has_alembic:
+        stamp(revision='head')
+        logger.info('Existing database stamped at current migration head')
+    elif not has_tables:
+        upgrade()
+        logger.info('Database created via migrations')
+    else:
+        upgrade()
+        logger.info('Database migrations up to date')
+
+
+def _migrate_tpl_keys() -> None:
+    """Move unsuffixed tpl_* keys to per-language keys.
+
+    Only genuinely customized values are kept; defaults are deleted so
+    get_tpl() falls through to the language-appropriate defaults.
+    """
+    has_old = any(db.session.get(Setting, k) for k in _TPL_KEYS)
+    has_new = any(db.session.get(Setting, f'{k}_{lang}')
+                  for k in _TPL_KEYS[:1] for lang in ('de', 'en'))
+    if not has_old or has_new:
+        return
+    lang = get_setting('language', 'de')
+    for key in _TPL_KEYS:
+        old = db.session.get(Setting, key)
+        if old:
+            is_default = (old.value == TEMPLATE_DEFAULTS.get(key, '')
+                          or old.value == TEMPLATE_DEFAULTS_DE.get(key, ''))
+            if not is_default:
+                set_setting(f'{key}_{lang}', old.value, commit=False)
+            db.session.delete(old)
+    db.session.commit()
+    logger.info('Migrated email templates to per-language keys (%s)', lang)
+
+
+def _drop_default_tpl_overrides() -> None:
+    """Remove suffixed tpl_* keys whose value matches any default (wrong-language
+    or own) so get_tpl() falls through to the correct defaults."""
+    for key in _TPL_KEYS:
+        for lang in ('de', 'en'):
+            s = db.session.get(Setting, f'{key}_{lang}')
+            if s and s.value in (TEMPLATE_DEFAULTS.get(key, ''), TEMPLATE_DEFAULTS_DE.get(key, '')):
+                db.session.delete(s)
+    db.session.commit()
+
+
+def _drop_old_default_colors() -> None:
+    """Remove colour settings that match previous defaults so the current
+    TEMPLATE_DEFAULTS values take effect."""
+    old_colors = {
+        'color_navbar': ('#0d6efd',),
+        'color_email_grad_start': ('#667eea', '#4e5d88'),
+        'color_email_grad_end': ('#764ba2', '#e7b44e', '#a8b4d4'),
+        'color_balance_positive': ('#28a745',),
+        'color_balance_negative': ('#dc3545',),
+    }
+    changed = False
+    for key, old_values in old_colors.items():
+        s = db.session.get(Setting, key)
+        if s and s.value in old_values:
+            db.session.delete(s)
+            changed = True
+    if changed:
+        db.session.commit()
+        logger.info('Removed old default color settings')
+
+
+def _seed_icon_bg() -> None:
+    """Record the background of icons generated before ``icon_bg`` existed, so
+    sizes rendered on demand (e.g. the apple-touch-icon) match them."""
+    if get_setting('icon_bg') or get_setting('icon_mode', 'generated') == 'custom':
+        return
+    path = os.path.join(current_app.root_path, 'static', 'icons', 'icon-512.png')
+    if not os.path.exists(path):
+        return  # ensure_icons() generates the defaults and records their colour
+    from PIL import Image
+    with Image.open(path) as img:
+        r, g, b = img.convert('RGB').getpixel((0, 0))
+    set_setting('icon_bg', f'#{r:02x}{g:02x}{b:02x}')
+    logger.info('Recorded icon background colour #%02x%02x%02x', r, g, b)
+
+
+# Applied in order; names are persisted, so never rename or reuse one.
+FIXUPS: list[tuple[str, Callable[[], None]]] = [
+    ('tpl_per_language_keys', _migrate_tpl_keys),
+    ('tpl_drop_default_overrides', _drop_default_tpl_overrides),
+    ('drop_old_default_colors', _drop_old_default_colors),
+    ('seed_icon_bg', _seed_icon_bg),
+]
+
+
+def apply_fixups() -> list[str]:
+    """Run every data fix-up not yet recorded in the marker setting. Returns their names."""
+    done = set(filter(None, (get_setting(FIXUPS_SETTING) or '').split(',')))
+    applied = []
+    for name, fixup in FIXUPS:
+        if name in done:
+            continue
+        fixup()
+        done.add(name)
+        applied.append(name)
+    if applied:
+        set_setting(FIXUPS_SETTING, ','.join(name for name, _ in FIXUPS if name in done))
+        logger.info('Applied start-up fix-ups: %s', ', '.join(applied))
+    return applied
+
+
+def ensure_icons(app: Flask) -> bool:
+    """Generate the default PWA icons if they are missing. Returns True if generated."""
+    icons_dir = os.path.join(app.root_path, 'static', 'icons')
+    if all(os.path.exists(os.path.join(icons_dir, f'icon-{size}.png')) for size in (32, 192)):
+        return False
+    os.makedirs(icons_dir, exist_ok=True)
+    generate_and_save_icons(DEFAULT_ICON_BG)
+    logger.info('Generated default PWA icons')
+    return True
+
+
+def run_init(app: Flask) -> list[str]:
+    """Everything `flask bot-init` does, in order. Returns the fix-ups applied."""
+    init_migrate(app)
+    wait_for_database()
+    upgrade_database()
+    applied = apply_fixups()
+    ensure_icons(app)
+    return applied
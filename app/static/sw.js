@@ -1,19 +1,95 @@
-const CACHE = 'bot-v2';
+// BUILD and PRECACHE_URLS are prepended by the /sw.js route; BUILD changes with
+// every deploy, which installs this worker anew and rotates the caches below.
+const SHELL_CACHE = `bot-shell-${BUILD}`;
+const API_CACHE = `bot-api-${BUILD}`;
+const PAGES_CACHE = `bot-pages-${BUILD}`;
+const IMMUTABLE_CACHE = 'bot-immutable-v1';
 const OFFLINE = '/static/offline.html';
 
+// Autocomplete data: answered from cache at once, refreshed in the background.
+const STALE_WHILE_REVALIDATE = ['/api/users', '/api/common-items',
+                                '/api/common-descriptions', '/api/common-prices'];
+
+// Content-addressed receipts (ab/cd/<sha256>...), fingerprinted assets under
+// /static/dist/ and ?v=-versioned icons are served with "immutable" caching,
+// so a cached copy never needs the network.
+const CAS_RECEIPT = /^\/receipt(-thumb)?\/[0-9a-f]{2}\/[0-9a-f]{2}\/[0-9a-f]{64}[.\w]*$/;
+
+function isImmutable(url) {
+    if (CAS_RECEIPT.test(url.pathname)) return true;
+    if (url.pathname.startsWith('/static/dist/')) return true;
+    return (url.pathname.startsWith('/static/icons/') || url.pathname.startsWith('/icons/'))
+        && url.searchParams.has('v');
+}
+
+function cacheFirst(request) {
+    return caches.match(request).then(hit => hit || fetch(request).then(response => {
+        if (response.ok) {
+            const copy = response.clone();
+            caches.open(IMMUTABLE_CACHE).then(cache => cache.put(request, copy));
+        }
+        return response;
+    }));
+}
+
+function staleWhileRevalidate(e) {
+    return caches.open(API_CACHE).then(cache => cache.match(e.request).then(hit => {
+        const update = fetch(e.request).then(response => {
+            if (response.ok) cache.put(e.request, response.clone());
+            return response;
+        });
+        if (!hit) return update;
+        e.waitUntil(update.catch(() => {}));
+        return hit;
+    }));
+}
+
+// The cached dashboard is flagged so the page renders itself read-only.
+function dashboardSnapshot() {
+    return caches.open(PAGES_CACHE)
+        .then(cache => cache.match('/'))
+        .then(snapshot => snapshot && snapshot.text().then(html => new Response(
+            html.replace('<body', `<body data-offline-snapshot="${snapshot.headers.get('Date') || ''}"`),
+            {headers: snapshot.headers}
+        )));
+}
+
+function offlineFallback(url) {
+    const snapshot = url.pathname === '/' ? dashboardSnapshot() : Promise.resolve(null);
+    return snapshot.then(page => page || caches.match(OFFLINE));
+}
+
+function navigate(request, url) {
+    return fetch(request)
+        .then(response => {
+            if (!response.ok) {
+                return offlineFallback(url).then(page => page || response);
+            }
+            if (url.pathname === '/' && !url.search) {
+                const copy = response.clone();
+                caches.open(PAGES_CACHE).then(cache => cache.put('/', copy));
+            }
+            return response;
+        })
+        .catch(() => offlineFallback(url));
+}
+
 self.addEventListener('install', e => {
     e.waitUntil(
-        caches.open(CACHE)
-            .then(c => c.add(OFFLINE))
+        caches.open(SHELL_CACHE)
+            .then(cache => cache.add(OFFLINE).then(() => Promise.all(
+                PRECACHE_URLS.map(u => cache.add(u).catch(() => {}))
+            )))
             .then(() => self.skipWaiting())
     );
 });
 
 self.addEventListener('activate', e => {
+    const keep = [SHELL_CACHE, API_CACHE, PAGES_CACHE, IMMUTABLE_CACHE];
     e.waitUntil(
         caches.keys()
             .then(keys => Promise.all(
-                keys.filter(k => k !== CACHE).map(k => caches.delete(k))
+                keys.filter(k => !keep.includes(k)).map(k => caches.delete(k))
             ))
             .then(() => self.clients.claim())
     );
@@ -21,18 +97,14 @@ self.addEventListener('activate', e => {
 
 self.addEventListener('fetch', e => {
     if (e.request.method !== 'GET') return;
-    e.respondWith(
-        fetch(e.request)
-            .then(response => {
-                if (!response.ok && e.request.mode === 'navigate') {
-                    return caches.match(OFFLINE) || response;
-                }
-                return response;
-            })
-            .catch(() => {
-                if (e.request.mode === 'navigate') {
-                    return caches.match(OFFLINE);
-                }
-            })
-    );
+    const url = new URL(e.request.url);
+    if (url.origin !== self.location.origin) return;
+
+    if (isImmutable(url) || PRECACHE_URLS.includes(url.pathname + url.search)) {
+        e.respondWith(cacheFirst(e.request));
+    } else if (STALE_WHILE_REVALIDATE.includes(url.pathname)) {
+        e.respondWith(staleWhileRevalidate(e));
+    } else if (e.request.mode === 'navigate') {
+        e.respondWith(navigate(e.request, url));
+    }
 });
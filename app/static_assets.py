@@ -0,0 +1,167 @@
+"""Fingerprinted, precompressed static assets.
+
+At image build time ``python static_assets.py`` copies everything under
+``static/vendor`` to ``static/dist`` with a content hash in the file name,
+writes gzip and (if the Brotli package is installed) brotli variants next to
+text assets, and records the mapping in ``static/dist/manifest.json``.
+
+At runtime ``static_url()`` resolves a logical name like
+``vendor/css/bootstrap.min.css`` through that manifest, and ``send_static``
+replaces Flask's static view so fingerprinted files are served immutable and
+precompressed according to ``Accept-Encoding``. Without a manifest (local
+development, tests) everything falls back to the plain static files.
+"""
+from __future__ import annotations
+
+import functools
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import sys
+
+from flask import Response, current_app, request, send_from_directory, url_for
+
+from helpers import mark_immutable
+
+try:
+    import brotli
+except ImportError:  # optional; gzip variants are always written
+    brotli = None
+
+SOURCE_DIRS: tuple[str, ...] = ('vendor',)
+DIST_DIR: str = 'dist'
+MANIFEST_NAME: str = 'manifest.json'
+COMPRESSIBLE_EXTENSIONS: set[str] = {'.css', '.js', '.svg', '.json', '.txt', '.map'}
+# Preferred first; each maps a content coding to the suffix of its variant.
+ENCODINGS: tuple[tuple[str, str], ...] = (('br', '.br'), ('gzip', '.gz'))
+
+# Precached by the service worker as part of the app shell.
+SHELL_ASSETS: tuple[str, ...] = (
+    'vendor/css/bootstrap.min.css',
+    'vendor/css/bootstrap-icons.css',
+    'vendor/fonts/bootstrap-icons.woff2',
+    'vendor/js/bootstrap.bundle.min.js',
+    'vendor/js/chart.umd.min.js',
+)
+
+_CSS_URL_RE = re.compile(r'''url\((["']?)([^"')]+)\1\)''')
+
+
+def _fingerprinted_name(rel: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(rel)
+    return f'{DIST_DIR}/{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def _rewrite_css_urls(css: bytes, rel: str, manifest: dict[str, str]) -> bytes:
+    """Point relative url() references in a stylesheet at fingerprinted files."""
+    base = posixpath.dirname(rel)
+
+    def replace(m: re.Match[str]) -> str:
+        target = m.group(2).split('?', 1)[0].split('#', 1)[0]
+        if ':' in target or target.startswith('/'):
+            return m.group(0)
+        resolved = manifest.get(posixpath.normpath(posixpath.join(base, target)))
+        if resolved is None:
+            return m.group(0)
+        new = posixpath.relpath(resolved, posixpath.dirname(_fingerprinted_name(rel, b'')))
+        return f'url({m.group(1)}{new}{m.group(1)})'
+
+    return _CSS_URL_RE.sub(replace, css.decode('utf-8')).encode('utf-8')
+
+
+def _write(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def build(static_dir: str) -> dict[str, str]:
+    """Fingerprint and precompress the static sources; returns the manifest."""
+    sources: list[str] = []
+    for source_dir in SOURCE_DIRS:
+        for root, _, files in os.walk(os.path.join(static_dir, source_dir)):
+            for name in files:
+                sources.append(os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, '/'))
+    # Stylesheets last, so the fonts and images they reference are already hashed.
+    sources.sort(key=lambda rel: (rel.endswith('.css'), rel))
+
+    manifest: dict[str, str] = {}
+    for rel in sources:
+        with open(os.path.join(static_dir, rel), 'rb') as f:
+            data = f.read()
+        if rel.endswith('.css'):
+            data = _rewrite_css_urls(data, rel, manifest)
+        out_rel = _fingerprinted_name(rel, data)
+        out_path = os.path.join(static_dir, out_rel)
+        _write(out_path, data)
+        if os.path.splitext(rel)[1] in COMPRESSIBLE_EXTENSIONS:
+            _write(out_path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                _write(out_path + '.br', brotli.compress(data, quality=11))
+        manifest[rel] = out_rel
+
+    _write(os.path.join(static_dir, DIST_DIR, MANIFEST_NAME),
+           json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+@functools.lru_cache(maxsize=4)
+def load_manifest(static_dir: str) -> dict[str, str]:
+    try:
+        with open(os.path.join(static_dir, DIST_DIR, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+@functools.lru_cache(maxsize=4)
+def _fingerprinted(static_dir: str) -> frozenset[str]:
+    return frozenset(load_manifest(static_dir).values())
+
+
+@functools.lru_cache(maxsize=4)
+def build_hash(static_dir: str) -> str:
+    """Short hash identifying the deployed front end, used to version service worker caches."""
+    h = hashlib.sha256()
+    for rel in ('sw.js', 'offline.html', f'{DIST_DIR}/{MANIFEST_NAME}'):
+        try:
+            with open(os.path.join(static_dir, rel), 'rb') as f:
+                h.update(f.read())
+        except OSError:
+            continue
+    return h.hexdigest()[:12]
+
+
+def static_url(filename: str) -> str:
+    """URL of a static file, fingerprinted when the build step has run."""
+    manifest = load_manifest(current_app.static_folder)
+    return url_for('static', filename=manifest.get(filename, filename))
+
+
+def send_static(filename: str) -> Response:
+    """Flask static view that serves fingerprinted files precompressed and immutable."""
+    static_dir = current_app.static_folder
+    if filename not in _fingerprinted(static_dir):
+        return current_app.send_static_file(filename)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in ENCODINGS:
+        if (request.accept_encodings[encoding]
+                and os.path.isfile(os.path.join(static_dir, filename + suffix))):
+            response = send_from_directory(static_dir, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(static_dir, filename, mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    return mark_immutable(response)
+
+
+if __name__ == '__main__':
+    target = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    result = build(target)
+    print(f'Fingerprinted {len(result)} static assets into {os.path.join(target, DIST_DIR)}')
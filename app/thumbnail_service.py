@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from flask import current_app
+from werkzeug.security import safe_join
+
+from extensions import db
+from models import Transaction
+from config import (THUMBNAIL_DIR, THUMBNAIL_SIZE, THUMBNAIL_QUALITY, THUMBNAIL_CACHE_MAX_BYTES,
+                    THUMBNAIL_CACHE_RESCAN)
+
+if TYPE_CHECKING:
+    from PIL.Image import Image
+
+logger = logging.getLogger(__name__)
+
+# Upload folder -> (estimated cache bytes, monotonic time of the last full walk).
+# New thumbnails are added to the estimate, so a cache miss only walks the tree
+# when the cap may be exceeded or the estimate is older than THUMBNAIL_CACHE_RESCAN
+# (other workers add thumbnails this one does not see).
+_cache_size: dict[str, tuple[int, float]] = {}
+_cache_lock = threading.Lock()
+
+
+def _thumb_format() -> tuple[str, str]:
+    """Return (Pillow format, file extension), preferring WebP when Pillow supports it."""
+    from PIL import features
+    return ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+
+def thumbnail_path(receipt_path: str) -> str:
+    """Absolute cache path for a receipt's thumbnail: a .thumbs dir next to the original."""
+    rel_dir, name = os.path.split(receipt_path)
+    _, ext = _thumb_format()
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], rel_dir, THUMBNAIL_DIR,
+                        f'{name}.{THUMBNAIL_SIZE}.{ext}')
+
+
+def _render_pdf_page(pdf_path: str) -> Image | None:
+    """Rasterize the first PDF page with poppler's pdftoppm, or None if unavailable."""
+    if not shutil.which('pdftoppm'):
+        return None
+    from PIL import Image
+    with tempfile.TemporaryDirectory() as tmp:
+        prefix = os.path.join(tmp, 'page')
+        result = subprocess.run(
+            ['pdftoppm', '-f', '1', '-l', '1', '-singlefile', '-jpeg',
+             '-scale-to', str(THUMBNAIL_SIZE * 2), pdf_path, prefix],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=60
+        )
+        if result.returncode != 0:
+            logger.warning('pdftoppm failed for %s: %s', pdf_path,
+                           result.stderr.decode(errors='replace')[:200])
+            return None
+        img = Image.open(prefix + '.jpg')
+        img.load()
+        return img
+
+
+def _placeholder(label: str) -> Image:
+    """Neutral tile used when a document cannot be rendered (e.g. no PDF renderer)."""
+    from PIL import Image, ImageDraw
+    img = Image.new('RGB', (THUMBNAIL_SIZE * 3 // 4, THUMBNAIL_SIZE), (233, 236, 239))
+    draw = ImageDraw.Draw(img)
+    box = draw.textbbox((0, 0), label)
+    draw.text(((img.width - (box[2] - box[0])) // 2, (img.height - (box[3] - box[1])) // 2),
+              label, fill=(108, 117, 125))
+    return img
+
+
+def _build_thumbnail(src: str, dest: str) -> None:
+    from PIL import Image, ImageOps
+    if src.lower().endswith('.pdf'):
+        img = _render_pdf_page(src) or _placeholder('PDF')
+    else:
+        img = ImageOps.exif_transpose(Image.open(src))
+    img.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.LANCZOS)
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+
+    fmt, _ = _thumb_format()
+    if fmt == 'JPEG' and img.mode == 'RGBA':
+        img = img.convert('RGB')
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            img.save(f, fmt, quality=THUMBNAIL_QUALITY)
+        os.replace(tmp_path, dest)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+def enforce_cache_limit(max_bytes: int | None = None) -> int:
+    """Evict least-recently-used thumbnails until the cache fits `max_bytes`.
+
+    Thumbnail mtimes double as the LRU clock (they are touched on every hit).
+    Evicts down to 90% of the cap to avoid thrashing. Returns bytes freed.
+    """
+    if max_bytes is None:
+        max_bytes = THUMBNAIL_CACHE_MAX_BYTES
+    entries: list[tuple[float, int, str]] = []
+    total = 0
+    for root, dirs, files in os.walk(current_app.config['UPLOAD_FOLDER']):
+        if os.path.basename(root) != THUMBNAIL_DIR:
+            continue
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+    freed = 0
+    if total > max_bytes:
+        target = total - int(max_bytes * 0.9)
+        for _, size, path in sorted(entries):
+            if freed >= target:
+                break
+            try:
+                os.remove(path)
+                freed += size
+            except OSError:
+                pass
+        logger.info('Thumbnail cache trimmed: %d bytes freed', freed)
+    with _cache_lock:
+        _cache_size[current_app.config['UPLOAD_FOLDER']] = (total - freed, time.monotonic())
+    return freed
+
+
+def _count_new_thumbnail(path: str) -> None:
+    """Add a freshly built thumbnail to the running total; walk and trim only when needed."""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+    folder = current_app.config['UPLOAD_FOLDER']
+    now = time.monotonic()
+    with _cache_lock:
+        known = _cache_size.get(folder)
+        if (known is not None and known[0] + size <= THUMBNAIL_CACHE_MAX_BYTES
+                and now - known[1] < THUMBNAIL_CACHE_RESCAN):
+            _cache_size[folder] = (known[0] + size, known[1])
+            return
+    enforce_cache_limit()
+
+
+def get_thumbnail(receipt_path: str, enforce_limit: bool = True) -> str | None:
+    """Return the absolute path of a receipt thumbnail, generating it on first request.
+
+    Returns None if the receipt does not exist or cannot be decoded.
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    src = safe_join(upload_folder, receipt_path)
+    if not src or THUMBNAIL_DIR in receipt_path.split('/') or not os.path.isfile(src):
+        return None
+
+    dest = thumbnail_path(receipt_path)
+    try:
+        if os.path.getmtime(dest) >= os.path.getmtime(src):
+            os.utime(dest)
+            return dest
+    except OSError:
+        pass
+
+    try:
+        _build_thumbnail(src, dest)
+    except Exception as e:
+        logger.warning('Thumbnail generation failed for %s: %s', receipt_path, str(e)[:200])
+        return None
+    if enforce_limit:
+        _count_new_thumbnail(dest)
+    return dest
+
+
+def pregenerate_thumbnails() -> tuple[int, int, int]:
+    """Fill the thumbnail cache for every referenced receipt. Returns (generated, cached, failed)."""
+    paths = db.session.execute(
+        db.select(Transaction.receipt_path).where(Transaction.receipt_path.isnot(None),
+                                                  Transaction.receipt_path != '').distinct()
+    ).scalars().all()
+    generated = cached = failed = 0
+    for receipt_path in paths:
+        existed = os.path.exists(thumbnail_path(receipt_path))
+        if get_thumbnail(receipt_path, enforce_limit=False) is None:
+            failed += 1
+        elif existed:
+            cached += 1
+        else:
+            generated += 1
+    enforce_cache_limit()
+    logger.info('Thumbnails: %d generated, %d cached, %d failed', generated, cached, failed)
+    return generated, cached, failed
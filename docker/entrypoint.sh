@@ -6,4 +6,10 @@ set -e
 # ownership here before dropping privileges.
 chown appuser:appuser /uploads /backups /app/static/icons 2>/dev/null || true
 
+# Run migrations, data fix-ups and icon generation once, before any worker
+# starts (idempotent; workers themselves never write to the DB on boot).
+if [ "$1" = "gunicorn" ]; then
+    gosu appuser flask bot-init
+fi
+
 exec gosu appuser "$@"
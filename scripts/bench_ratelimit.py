@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Measure the per-request cost of the rate limit storage backends.
+Run: python3 scripts/bench_ratelimit.py [hits]
+Uses SQLALCHEMY_DATABASE_URI if set (e.g. the MariaDB container), otherwise a
+temporary SQLite file. Prints the mean and p95 latency of one limiter hit for
+memory:// and botdb:// with both strategies.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', f'sqlite:///{_tmp}/bench.db')
+os.environ.setdefault('SECRET_KEY', 'bench-ratelimit-not-for-production')
+os.environ['FLASK_TESTING'] = '1'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from limits import parse  # noqa: E402
+from limits.storage import storage_from_string  # noqa: E402
+from limits.strategies import FixedWindowRateLimiter, MovingWindowRateLimiter  # noqa: E402
+
+from app import app  # noqa: E402
+from extensions import db  # noqa: E402
+
+
+def bench(uri: str, strategy: type, hits: int) -> list[float]:
+    limiter = strategy(storage_from_string(uri))
+    limit = parse('1000000/minute')
+    timings = []
+    for i in range(hits):
+        # One key per simulated client, as get_remote_address produces.
+        key = f'10.0.{i % 50}.1'
+        start = time.perf_counter()
+        limiter.hit(limit, 'bench', key)
+        timings.append((time.perf_counter() - start) * 1000)
+    limiter.storage.reset()
+    return timings
+
+
+def main() -> None:
+    hits = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with app.app_context():
+        db.create_all()
+        print(f'{hits} hits, database {db.engine.url.render_as_string(hide_password=True)}')
+        for uri in ('memory://', 'botdb://'):
+            for strategy in (FixedWindowRateLimiter, MovingWindowRateLimiter):
+                t = sorted(bench(uri, strategy, hits))
+                print(f'{uri:<10} {strategy.__name__:<24} '
+                      f'mean {statistics.mean(t):7.3f} ms   p95 {t[int(len(t) * 0.95)]:7.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Measure the cold-start import cost of the web app.
+Run: python3 scripts/bench_startup.py [--runs N] [--top N] [--max-depth N] [--budget-ms MS]
+Imports app.py in fresh interpreters, prints the median wall time of the
+import and the modules with the highest cumulative `python -X importtime`
+cost. With --budget-ms it exits 1 if the median cold import is slower, which
+tests/test_startup.py uses as a regression guard.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+_TIMED_IMPORT = ('import time; t = time.perf_counter(); import app; '
+                 'print(round((time.perf_counter() - t) * 1000, 1))')
+
+
+def _env() -> dict[str, str]:
+    env = dict(os.environ)
+    env.update({'FLASK_TESTING': '1', 'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    env.setdefault('SECRET_KEY', 'bench-startup-not-for-production')
+    return env
+
+
+def cold_import_ms() -> float:
+    """Wall time of `import app` in a fresh interpreter."""
+    out = subprocess.run([sys.executable, '-c', _TIMED_IMPORT], cwd=APP_DIR, env=_env(),
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def import_profile() -> dict[str, tuple[int, int, int]]:
+    """Module -> (self us, cumulative us, depth) from one `-X importtime` run."""
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=APP_DIR,
+                         env=_env(), capture_output=True, text=True, check=True)
+    profile = {}
+    for line in out.stderr.splitlines():
+        m = _IMPORTTIME_RE.match(line)
+        if m:
+            profile[m.group(4)] = (int(m.group(1)), int(m.group(2)), (len(m.group(3)) - 1) // 2)
+    return profile
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=25)
+    parser.add_argument('--max-depth', type=int, default=2, help='0 = app, 1 = its direct imports, ...')
+    parser.add_argument('--budget-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    walls = [cold_import_ms() for _ in range(args.runs)]
+    cumulative: dict[str, list[int]] = defaultdict(list)
+    own: dict[str, list[int]] = defaultdict(list)
+    depth: dict[str, int] = {}
+    for _ in range(args.runs):
+        for name, (self_us, cum_us, level) in import_profile().items():
+            own[name].append(self_us)
+            cumulative[name].append(cum_us)
+            depth[name] = level
+
+    median = statistics.median(walls)
+    print(f'cold import of app: median {median:.1f} ms, min {min(walls):.1f} ms ({args.runs} runs)')
+    print(f'{"cumulative ms":>14} {"self ms":>8}  module (depth)')
+    shown = [n for n in cumulative if depth[n] <= args.max_depth]
+    ranked = sorted(shown, key=lambda n: statistics.median(cumulative[n]), reverse=True)
+    for name in ranked[:args.top]:
+        print(f'{statistics.median(cumulative[name]) / 1000:14.1f} '
+              f'{statistics.median(own[name]) / 1000:8.1f}  {"  " * depth[name]}{name} ({depth[name]})')
+
+    if args.budget_ms is not None and median > args.budget_ms:
+        print(f'FAIL: cold import {median:.1f} ms exceeds budget {args.budget_ms:.0f} ms')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
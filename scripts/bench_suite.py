@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Time the app's heaviest code paths on synthetic ledgers of several sizes.
+Run: python3 scripts/bench_suite.py [--scales 1000,100000,1000000] [--repeat N]
+                                    [--output report.json] [--compare old.json]
+For each scale a fresh database is filled by ledger_data.seed_ledger() and every
+benchmark runs once to warm up and then --repeat times. The JSON report holds
+the per-run timings, median and min for each benchmark and scale plus the git
+commit, so reports of two commits can be compared with --compare, which
+prints the median ratio new/old per benchmark.
+The database is a temporary SQLite file unless BENCH_DATABASE_URI is set; all
+of its tables are dropped and recreated, so never point it at real data.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta, UTC
+
+_tmp = tempfile.mkdtemp()
+os.environ['SQLALCHEMY_DATABASE_URI'] = os.environ.get('BENCH_DATABASE_URI', f'sqlite:///{_tmp}/bench.db')
+os.environ.setdefault('SECRET_KEY', 'bench-suite-not-for-production')
+os.environ['FLASK_TESTING'] = '1'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import sqlalchemy  # noqa: E402
+
+from app import app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import CommonDescription, CommonItem, CommonPrice, User  # noqa: E402
+from helpers import make_icon_png, set_setting  # noqa: E402
+from ledger_data import seed_ledger  # noqa: E402
+import backup_service  # noqa: E402
+
+# Slow-request warnings and backup notices would drown the results.
+logging.disable(logging.WARNING)
+
+# A benchmark is (setup, timed call); setup runs before every timed call, untimed.
+Benchmark = tuple[Callable[[], None] | None, Callable[[], object]]
+
+
+def _get(client, url: str) -> Callable[[], object]:
+    def call() -> object:
+        resp = client.get(url)
+        assert resp.status_code == 200, f'{url}: {resp.status_code}'
+        return resp
+    return call
+
+
+def _sqlite_dump(dump_file, low_priority: bool = False) -> tuple[bool, str]:
+    """Stand-in for mysqldump when benchmarking against SQLite."""
+    conn = sqlite3.connect(db.engine.url.database)
+    for line in conn.iterdump():
+        dump_file.write(line.encode() + b'\n')
+    conn.close()
+    return True, ''
+
+
+def benchmarks(client, backup_dir: str) -> dict[str, Benchmark]:
+    top_user = db.session.execute(db.select(User).order_by(User.id)).scalars().first()
+    year_ago = (datetime.now(UTC) - timedelta(days=365)).strftime('%Y-%m-%d')
+
+    def reset_common() -> None:
+        for model in (CommonItem, CommonDescription, CommonPrice):
+            db.session.execute(db.delete(model))
+        db.session.commit()
+
+    def auto_collect() -> None:
+        from scheduler_jobs import auto_collect_common
+        auto_collect_common()
+
+    def recount() -> None:
+        from common_counts import rebuild_counts
+        rebuild_counts()
+        db.session.commit()
+
+    def email() -> str:
+        from email_service import build_email_html
+        with app.test_request_context():
+            return build_email_html(db.session.get(User, top_user.id))
+
+    def backup() -> None:
+        ok, result = backup_service.run_backup()
+        assert ok, result
+        os.remove(os.path.join(backup_dir, result))
+
+    return {
+        'analytics_data': (None, _get(client, f'/analytics/data?date_from={year_ago}')),
+        'view_transactions': (None, _get(client, '/transactions')),
+        'search': (None, _get(client, '/search?q=Milch')),
+        'build_email_html': (None, email),
+        'auto_collect_common': (reset_common, auto_collect),
+        'recount_common': (None, recount),
+        'make_icon_png': (make_icon_png.cache_clear, lambda: make_icon_png(512, (0x1a, 0x73, 0xe8))),
+        'run_backup': (None, backup),
+    }
+
+
+def run_scale(transactions: int, users: int, repeat: int, only: set[str]) -> dict:
+    backup_dir = tempfile.mkdtemp()
+    backup_service.BACKUP_DIR = backup_dir
+    app.config['UPLOAD_FOLDER'] = os.path.join(backup_dir, 'no-uploads')
+
+    with app.app_context():
+        if db.engine.url.get_backend_name() == 'sqlite':
+            backup_service._dump_database = _sqlite_dump
+        db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        counts = seed_ledger(db.engine, users=users, transactions=transactions)
+        seed_s = time.perf_counter() - started
+        for key in ('common_items_auto', 'common_descriptions_auto', 'common_prices_auto'):
+            set_setting(key, '1', commit=False)
+        db.session.commit()
+        print(f'\n{transactions} transactions: seeded {counts["items"]} items in {seed_s:.1f} s')
+
+        results = {}
+        client = app.test_client()
+        for name, (setup, call) in benchmarks(client, backup_dir).items():
+            if only and name not in only:
+                continue
+            runs = []
+            for i in range(repeat + 1):
+                if setup:
+                    setup()
+                start = time.perf_counter()
+                call()
+                if i:  # the first run only warms caches
+                    runs.append(round((time.perf_counter() - start) * 1000, 2))
+                db.session.remove()
+            results[name] = {'median_ms': round(statistics.median(runs), 2), 'min_ms': min(runs), 'runs': runs}
+            print(f'  {name:<22} median {results[name]["median_ms"]:10.2f} ms   min {min(runs):10.2f} ms')
+    shutil.rmtree(backup_dir, ignore_errors=True)
+    return {'seed_s': round(seed_s, 2), 'rows': counts, 'benchmarks': results}
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old: dict, new: dict) -> None:
+    print(f'\nmedian new/old ({old["meta"].get("commit")} -> {new["meta"].get("commit")}), < 1 is faster')
+    for scale, result in new['scales'].items():
+        before = old['scales'].get(scale, {}).get('benchmarks', {})
+        for name, b in result['benchmarks'].items():
+            if name in before and before[name]['median_ms']:
+                ratio = b['median_ms'] / before[name]['median_ms']
+                print(f'  {scale:>8} {name:<22} {before[name]["median_ms"]:10.2f} -> '
+                      f'{b["median_ms"]:10.2f} ms   x{ratio:.2f}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', default='1000,100000', help='comma-separated transaction counts')
+    parser.add_argument('--users', type=int, default=25)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', default='', help='comma-separated benchmark names')
+    parser.add_argument('--output', default='bench_report.json')
+    parser.add_argument('--compare', default=None, metavar='OLD_REPORT')
+    args = parser.parse_args()
+
+    with app.app_context():
+        database = db.engine.url.render_as_string(hide_password=True)
+    report = {
+        'meta': {'commit': _git_commit(), 'created': datetime.now(UTC).isoformat(timespec='seconds'),
+                 'python': platform.python_version(), 'sqlalchemy': sqlalchemy.__version__,
+                 'database': database, 'users': args.users, 'repeat': args.repeat},
+        'scales': {},
+    }
+    only = {n for n in args.only.split(',') if n}
+    for scale in (int(s) for s in args.scales.split(',')):
+        report['scales'][str(scale)] = run_scale(scale, args.users, args.repeat, only)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'\nreport written to {args.output}')
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
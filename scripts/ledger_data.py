@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic ledger for benchmarks and load tests.
+Run: python3 scripts/ledger_data.py [--users N] [--transactions N] [--items-per-expense X]
+Writes into SQLALCHEMY_DATABASE_URI (required when run directly; the tables
+must exist). bench_suite.py and load_test.py import seed_ledger() instead.
+
+The data is shaped like a real shared household: a few users buy most of the
+shopping, item names, shop names and prices follow long-tailed popularity so
+that auto-collect thresholds and search terms hit realistic match counts, and
+more recent months are busier than old ones. Rows are written with bulk Core
+inserts and explicit ids, so a million transactions take about a minute.
+Balances are set to the sum of the generated transactions. The same seed
+always produces the same ledger.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta, UTC
+from decimal import Decimal
+from typing import Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from sqlalchemy import func, insert, select, update  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+_CHUNK: int = 20000
+
+_SHOPS = ['Rewe', 'Lidl', 'Aldi', 'Edeka', 'Penny', 'Netto', 'Kaufland', 'dm', 'Rossmann', 'Bäcker',
+          'Metzgerei', 'Wochenmarkt', 'Baumarkt', 'Apotheke', 'Getränkemarkt', 'Tankstelle', 'IKEA',
+          'Pizza', 'Döner', 'Sushi', 'Kino', 'Bahn', 'Amazon', 'Drogerie', 'Biomarkt']
+_GOODS = ['Milch', 'Brot', 'Butter', 'Käse', 'Eier', 'Äpfel', 'Bananen', 'Tomaten', 'Kaffee', 'Tee',
+          'Nudeln', 'Reis', 'Joghurt', 'Wasser', 'Saft', 'Bier', 'Wein', 'Schokolade', 'Chips',
+          'Klopapier', 'Spülmittel', 'Waschmittel', 'Zahnpasta', 'Shampoo', 'Seife', 'Müsli',
+          'Honig', 'Marmelade', 'Wurst', 'Schinken', 'Hähnchen', 'Lachs', 'Kartoffeln', 'Zwiebeln',
+          'Knoblauch', 'Paprika', 'Gurke', 'Salat', 'Mehl', 'Zucker']
+_VARIANTS = ['', ' Bio', ' groß', ' klein', ' light', ' Vorrat', ' 6er', ' XXL', ' regional', ' Angebot']
+_NOTES = ['Quittung im Ordner', 'mit Pfand', 'für die Party', 'Rest bar bezahlt', 'geteilt mit Gästen']
+
+
+def _zipf_weights(n: int, s: float = 1.0) -> list[float]:
+    """Cumulative weights for rank-based popularity (rank 1 is most popular)."""
+    cum, total = [], 0.0
+    for rank in range(1, n + 1):
+        total += 1 / rank ** s
+        cum.append(total)
+    return cum
+
+
+class _Vocabulary:
+    def __init__(self, rng: random.Random) -> None:
+        self.items = [g + v for v in _VARIANTS for g in _GOODS]
+        rng.shuffle(self.items)
+        self.item_weights = _zipf_weights(len(self.items), 0.8)
+        # Each item has a typical price; purchases vary around it in 5 cent steps.
+        self.base_price = {name: max(0.2, rng.lognormvariate(1.0, 0.8)) for name in self.items}
+        self.shop_weights = _zipf_weights(len(_SHOPS), 1.2)
+
+    def item(self, rng: random.Random) -> tuple[str, Decimal]:
+        name = rng.choices(self.items, cum_weights=self.item_weights)[0]
+        price = round(self.base_price[name] * rng.choice((0.9, 1.0, 1.0, 1.0, 1.1)) * 20) / 20
+        return name, Decimal(f'{max(price, 0.05):.2f}')
+
+    def description(self, rng: random.Random, tx_id: int) -> str:
+        if rng.random() < 0.1:
+            return f'Einkauf #{tx_id}'  # one-off descriptions the auto-collect must ignore
+        return rng.choices(_SHOPS, cum_weights=self.shop_weights)[0]
+
+
+def _first_free_id(conn: Any, table: Any) -> int:
+    return (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+
+def seed_ledger(engine: Engine, users: int = 25, transactions: int = 1000,
+                items_per_expense: float = 3.0, span_days: int = 3 * 365,
+                seed: int = 42) -> dict[str, int]:
+    """Insert `users` users and `transactions` transactions ending today.
+
+    About 80 % of the transactions are expenses with on average
+    `items_per_expense` items each, the rest deposits and withdrawals.
+    Returns the number of rows written per table.
+    """
+    from models import ExpenseItem, Transaction, User
+
+    rng = random.Random(seed)
+    vocab = _Vocabulary(rng)
+    user_t, tx_t, item_t = User.__table__, Transaction.__table__, ExpenseItem.__table__
+    now = datetime.now(UTC).replace(tzinfo=None, microsecond=0)
+    balances: dict[int, Decimal] = defaultdict(Decimal)
+    counts = {'users': users, 'transactions': transactions}
+
+    with engine.begin() as conn:
+        first_user = _first_free_id(conn, user_t)
+        user_ids = list(range(first_user, first_user + users))
+        conn.execute(insert(user_t), [
+            {'id': uid, 'name': f'Bench User {uid}', 'email': f'bench{uid}@example.com',
+             'balance': Decimal('0'), 'created_at': now - timedelta(days=span_days),
+             'is_active': True, 'email_opt_in': True, 'email_transactions': 'last3'}
+            for uid in user_ids])
+        user_weights = _zipf_weights(users, 0.8)
+
+        next_tx = _first_free_id(conn, tx_t)
+        first_item = next_item = _first_free_id(conn, item_t)
+        tx_rows: list[dict[str, Any]] = []
+        item_rows: list[dict[str, Any]] = []
+
+        def flush() -> None:
+            if tx_rows:
+                conn.execute(insert(tx_t), tx_rows)
+                tx_rows.clear()
+            if item_rows:
+                conn.execute(insert(item_t), item_rows)
+                item_rows.clear()
+
+        for _ in range(transactions):
+            tx_id, next_tx = next_tx, next_tx + 1
+            # Triangular with the mode at "now": recent months are busiest.
+            age = timedelta(seconds=rng.triangular(0, span_days * 86400, 0))
+            row = {'id': tx_id, 'date': now - age, 'receipt_path': None, 'receipt_id': None,
+                   'notes': rng.choice(_NOTES) if rng.random() < 0.05 else None}
+            kind = rng.random()
+            if kind < 0.8 and users > 1:
+                buyer, debtor = rng.choices(user_ids, cum_weights=user_weights, k=1)[0], rng.choice(user_ids)
+                while debtor == buyer:
+                    debtor = rng.choice(user_ids)
+                total = Decimal('0')
+                for _ in range(1 + int(rng.expovariate(1 / max(items_per_expense - 1, 0.01)))):
+                    name, price = vocab.item(rng)
+                    item_rows.append({'id': next_item, 'transaction_id': tx_id, 'item_name': name,
+                                      'price': price, 'buyer_id': buyer})
+                    next_item += 1
+                    total += price
+                row.update(description=vocab.description(rng, tx_id), amount=total,
+                           from_user_id=debtor, to_user_id=buyer, transaction_type='expense')
+                balances[debtor] -= total
+                balances[buyer] += total
+            elif kind < 0.92:
+                uid = rng.choice(user_ids)
+                amount = Decimal(rng.choice((10, 20, 20, 50, 50, 100)))
+                row.update(description='Einzahlung', amount=amount, from_user_id=None,
+                           to_user_id=uid, transaction_type='deposit')
+                balances[uid] += amount
+            else:
+                uid = rng.choice(user_ids)
+                amount = Decimal(f'{rng.uniform(5, 60):.2f}')
+                row.update(description='Auszahlung', amount=amount, from_user_id=uid,
+                           to_user_id=None, transaction_type='withdrawal')
+                balances[uid] -= amount
+            tx_rows.append(row)
+            if len(tx_rows) >= _CHUNK:
+                flush()
+        flush()
+        counts['items'] = next_item - first_item
+        for uid, balance in balances.items():
+            conn.execute(update(user_t).where(user_t.c.id == uid).values(balance=balance))
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=25)
+    parser.add_argument('--transactions', type=int, default=1000)
+    parser.add_argument('--items-per-expense', type=float, default=3.0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    if 'SQLALCHEMY_DATABASE_URI' not in os.environ:
+        parser.error('set SQLALCHEMY_DATABASE_URI to the database to fill')
+    os.environ.setdefault('SECRET_KEY', 'ledger-data-not-for-production')
+    os.environ['FLASK_TESTING'] = '1'
+
+    from app import app
+    from extensions import db
+    with app.app_context():
+        counts = seed_ledger(db.engine, args.users, args.transactions, args.items_per_expense, seed=args.seed)
+    print(', '.join(f'{n} {table}' for table, n in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
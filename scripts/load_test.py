@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Drive the app under gunicorn with concurrent simulated users.
+Run: python3 scripts/load_test.py [--concurrency N] [--duration S] [--workers N] [--threads N]
+                                  [--transactions N] [--think-ms MS] [--output report.json]
+Seeds a ledger with ledger_data.seed_ledger(), starts gunicorn on a free
+localhost port with the production worker settings and lets --concurrency
+users loop through weighted journeys for --duration seconds: dashboard,
+add expense (form and POST with CSRF token), monthly view, search and
+analytics. Prints request count, errors, throughput and p50/p95/p99 latency
+per step, and the pool timeouts from /metrics, which is where lock
+contention and pool exhaustion show up that single-process benchmarks miss.
+
+The database is a temporary SQLite file unless LOAD_DATABASE_URI is set
+(e.g. a throwaway MariaDB container); its tables are dropped and recreated,
+so never point it at real data. Rate limits are off unless --rate-limits is
+given, since every simulated user shares 127.0.0.1.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from datetime import date, timedelta
+
+_tmp = tempfile.mkdtemp()
+os.environ['SQLALCHEMY_DATABASE_URI'] = os.environ.get('LOAD_DATABASE_URI', f'sqlite:///{_tmp}/load.db')
+os.environ.setdefault('SECRET_KEY', 'load-test-not-for-production')
+os.environ['FLASK_TESTING'] = '1'
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import User  # noqa: E402
+from ledger_data import seed_ledger  # noqa: E402
+
+_CSRF_RE = re.compile(r'<meta name="csrf-token" content="([^"]+)"')
+_SEARCH_TERMS = ['Milch', 'Brot', 'Kaffee', 'Rewe', 'Bio', 'Pfand', 'Lidl', 'Käse']
+_ITEMS = ['Milch', 'Brot', 'Butter', 'Kaffee', 'Äpfel', 'Nudeln']
+# Journey -> relative frequency.
+JOURNEYS = {'dashboard': 35, 'add_expense': 20, 'monthly_view': 20, 'search': 15, 'analytics': 10}
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Time the POST itself, not the page it redirects to."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def add(self, step: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.latencies[step].append(seconds * 1000)
+            if not ok:
+                self.errors[step] += 1
+
+
+class VirtualUser:
+    def __init__(self, base: str, recorder: Recorder, user_ids: list[int], rng: random.Random) -> None:
+        self.base, self.recorder, self.user_ids, self.rng = base, recorder, user_ids, rng
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, step: str, path: str, form: dict | None = None) -> str:
+        data = urllib.parse.urlencode(form).encode() if form is not None else None
+        start = time.perf_counter()
+        try:
+            with self.opener.open(self.base + path, data=data, timeout=60) as resp:
+                body = resp.read().decode(errors='replace')
+            ok = True
+        except urllib.error.HTTPError as e:
+            body = ''
+            ok = e.code < 400
+        except OSError:
+            body, ok = '', False
+        self.recorder.add(step, time.perf_counter() - start, ok)
+        return body
+
+    def dashboard(self) -> None:
+        self.request('GET /', '/')
+
+    def add_expense(self) -> None:
+        page = self.request('GET /transaction/add', '/transaction/add')
+        token = _CSRF_RE.search(page)
+        if not token:
+            return
+        buyer, debtor = self.rng.sample(self.user_ids, 2)
+        items = [{'name': self.rng.choice(_ITEMS), 'price': f'{self.rng.uniform(0.5, 9):.2f}',
+                  'debtor_id': debtor} for _ in range(self.rng.randint(1, 4))]
+        self.request('POST /transaction/add', '/transaction/add', {
+            'csrf_token': token.group(1), 'transaction_type': 'expense', 'buyer_id': buyer,
+            'description': 'Lasttest', 'items_json': json.dumps(items)})
+
+    def monthly_view(self) -> None:
+        month = date.today() - timedelta(days=30 * self.rng.randint(0, 11))
+        self.request('GET /transactions', f'/transactions?year={month.year}&month={month.month}')
+
+    def search(self) -> None:
+        self.request('GET /search', '/search?q=' + urllib.parse.quote(self.rng.choice(_SEARCH_TERMS)))
+
+    def analytics(self) -> None:
+        self.request('GET /analytics/data', '/analytics/data')
+
+    def run(self, deadline: float, think: float) -> None:
+        names, weights = list(JOURNEYS), list(JOURNEYS.values())
+        while time.monotonic() < deadline:
+            getattr(self, self.rng.choices(names, weights)[0])()
+            if think:
+                time.sleep(self.rng.expovariate(1 / think))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(base: str, server: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with {server.returncode}')
+        try:
+            with urllib.request.urlopen(base + '/health', timeout=2):
+                return
+        except urllib.error.HTTPError:
+            return  # up, even if a check reports degraded
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn did not become ready')
+
+
+def _pool_timeouts(base: str) -> float | None:
+    try:
+        with urllib.request.urlopen(base + '/metrics', timeout=10) as resp:
+            text = resp.read().decode()
+    except OSError:
+        return None
+    m = re.search(r'^bot_db_pool_timeouts_total (\S+)$', text, re.M)
+    return float(m.group(1)) if m else None
+
+
+def _pct(sorted_ms: list[float], q: float) -> float:
+    return round(sorted_ms[min(len(sorted_ms) - 1, int(len(sorted_ms) * q))], 2)
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict[str, dict]:
+    report = {}
+    for step, ms in sorted(recorder.latencies.items()):
+        ms = sorted(ms)
+        report[step] = {'requests': len(ms), 'errors': recorder.errors.get(step, 0),
+                        'rps': round(len(ms) / elapsed, 1), 'p50_ms': _pct(ms, 0.50),
+                        'p95_ms': _pct(ms, 0.95), 'p99_ms': _pct(ms, 0.99), 'max_ms': round(ms[-1], 2)}
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=16, help='simulated users')
+    parser.add_argument('--duration', type=float, default=30, help='seconds')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', '2')))
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    parser.add_argument('--users', type=int, default=25)
+    parser.add_argument('--transactions', type=int, default=10000)
+    parser.add_argument('--think-ms', type=float, default=0, help='mean pause between journeys')
+    parser.add_argument('--rate-limits', action='store_true', help='keep the route rate limits on')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=None, help='write the report as JSON')
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed_ledger(db.engine, users=args.users, transactions=args.transactions)
+        user_ids = list(db.session.execute(db.select(User.id)).scalars())
+        db.engine.dispose()
+
+    port = _free_port()
+    base = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=os.path.join(_tmp, 'prometheus'),
+               LOG_LEVEL=os.environ.get('LOG_LEVEL', 'ERROR'))
+    env.pop('FLASK_TESTING')  # run the scheduler and leader election like production
+    if not args.rate_limits:
+        env['RATELIMIT_ENABLED'] = '0'
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}',
+                               '--workers', str(args.workers), '--threads', str(args.threads),
+                               '--timeout', '300', 'app:app'], cwd=APP_DIR, env=env)
+    try:
+        _wait_ready(base, server)
+        recorder = Recorder()
+        deadline = time.monotonic() + args.duration
+        started = time.monotonic()
+        clients = [threading.Thread(target=VirtualUser(base, recorder, user_ids, random.Random(args.seed + i)).run,
+                                    args=(deadline, args.think_ms / 1000)) for i in range(args.concurrency)]
+        for t in clients:
+            t.start()
+        for t in clients:
+            t.join()
+        elapsed = time.monotonic() - started
+        timeouts = _pool_timeouts(base)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        shutil.rmtree(_tmp, ignore_errors=True)
+
+    steps = summarize(recorder, elapsed)
+    total = sum(s['requests'] for s in steps.values())
+    print(f'{args.concurrency} users, {args.workers} workers x {args.threads} threads, {elapsed:.0f} s, '
+          f'{args.transactions} transactions seeded')
+    print(f'{"step":<26}{"requests":>9}{"errors":>8}{"req/s":>8}{"p50 ms":>10}{"p95 ms":>10}'
+          f'{"p99 ms":>10}{"max ms":>10}')
+    for step, s in steps.items():
+        print(f'{step:<26}{s["requests"]:>9}{s["errors"]:>8}{s["rps"]:>8}{s["p50_ms"]:>10}{s["p95_ms"]:>10}'
+              f'{s["p99_ms"]:>10}{s["max_ms"]:>10}')
+    print(f'total {total} requests, {total / elapsed:.1f} req/s, pool timeouts {timeouts}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'elapsed_s': round(elapsed, 1), 'throughput_rps': round(total / elapsed, 1),
+                       'pool_timeouts': timeouts, 'steps': steps}, f, indent=2)
+    return 1 if any(s['errors'] for s in steps.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
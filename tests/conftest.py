@@ -5,6 +5,8 @@ import sys
 os.environ['FLASK_TESTING'] = '1'
 os.environ['SECRET_KEY'] = 'test-key-not-for-production'
 os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+# Every /health probe re-runs the checks instead of serving a cached snapshot
+os.environ['HEALTH_CACHE_TTL'] = '0'
 
 # Add the app directory to sys.path so imports work
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
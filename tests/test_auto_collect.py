@@ -0,0 +1,180 @@
+import json
+from decimal import Decimal
+
+from sqlalchemy import event
+
+
+def _expense(db, buyer, debtor, description, items):
+    from models import ExpenseItem, Transaction
+    tx = Transaction(description=description, amount=sum(p for _, p in items),
+                     from_user_id=debtor.id, to_user_id=buyer.id, transaction_type='expense')
+    db.session.add(tx)
+    db.session.flush()
+    for name, price in items:
+        db.session.add(ExpenseItem(transaction_id=tx.id, item_name=name, price=price, buyer_id=buyer.id))
+    db.session.commit()
+
+
+def _enable(debug='1'):
+    from helpers import set_setting
+    for prefix in ('common_items', 'common_descriptions', 'common_prices'):
+        set_setting(f'{prefix}_auto', '1')
+        set_setting(f'{prefix}_threshold', '3')
+    set_setting('common_auto_debug', debug)
+
+
+def _values(column):
+    from extensions import db
+    return sorted(db.session.execute(db.select(column)).scalars())
+
+
+def test_collects_frequent_values_and_skips_blacklist(app, make_user):
+    from extensions import db
+    from models import AutoCollectLog, CommonBlacklist, CommonDescription, CommonItem, CommonPrice
+    from scheduler_jobs import auto_collect_common
+    with app.app_context():
+        alice, bob = make_user(), make_user()
+        for _ in range(3):
+            _expense(db, alice, bob, 'Rewe', [('Milk', Decimal('1.50')), ('Bread', Decimal('2.00')),
+                                              ('Beer', Decimal('0.80'))])
+        _expense(db, alice, bob, 'Kiosk', [('Gum', Decimal('0.50'))])
+        db.session.add_all([CommonItem(name='bread'), CommonBlacklist(type='item', value='BEER'),
+                            CommonBlacklist(type='price', value='0,80')])
+        db.session.commit()
+        _enable()
+
+        assert auto_collect_common() == 4
+        assert _values(CommonItem.name) == ['Milk', 'bread']
+        assert _values(CommonDescription.value) == ['Rewe']
+        assert [float(v) for v in _values(CommonPrice.value)] == [1.5, 2.0]
+
+        messages = db.session.execute(db.select(AutoCollectLog.level, AutoCollectLog.message)
+                                      .order_by(AutoCollectLog.id)).all()
+        assert messages == [('SKIP', '"Beer" (blacklist)'), ('ADDED', 'Added "Milk"'),
+                            ('ADDED', 'Added "Rewe"'), ('SKIP', '€0.80 (blacklist)'),
+                            ('ADDED', 'Added €1.50'), ('ADDED', 'Added €2.00'),
+                            ('INFO', 'Run complete: 4 added, 2 skipped')]
+
+        # A second run finds nothing new.
+        assert auto_collect_common() == 0
+
+
+def test_query_count_does_not_grow_with_candidates(app, make_user):
+    from extensions import db
+    from scheduler_jobs import auto_collect_common
+    with app.app_context():
+        alice, bob = make_user(), make_user()
+        _enable(debug='0')
+        auto_collect_common()  # the first run sets the marks
+
+        def statements(n_items):
+            for _ in range(3):
+                _expense(db, alice, bob, f'Shop {n_items}',
+                         [(f'Item {n_items}.{i}', Decimal(n_items * 100 + i)) for i in range(n_items)])
+            seen = []
+            listener = lambda *args: seen.append(args[2])  # noqa: E731
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                auto_collect_common()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            return len(seen)
+
+        few = statements(2)
+        many = statements(40)
+        assert many == few
+
+
+def _counters():
+    from extensions import db
+    from models import AutoCollectCount
+    from common_counts import normalize
+    return {(c.category, normalize(c.category, c.value)): c.uses
+            for c in db.session.execute(db.select(AutoCollectCount)).scalars()}
+
+
+def test_counters_follow_new_edited_and_deleted_rows(app, client, make_user):
+    from extensions import db
+    from models import Transaction
+    from common_counts import count_new_rows, rebuild_counts
+    with app.app_context():
+        alice, bob = make_user(), make_user()
+        for description in ('Rewe', 'Aldi', 'rewe'):
+            _expense(db, alice, bob, description, [('Milk', Decimal('1.50')), ('Bread', Decimal('2.00'))])
+        assert count_new_rows() == (6, 3)  # no marks yet: full rebuild
+        db.session.commit()
+        assert _counters() == {('item', 'milk'): 3, ('item', 'bread'): 3, ('price', '1.50'): 3,
+                               ('price', '2.00'): 3, ('description', 'rewe'): 2, ('description', 'aldi'): 1}
+
+        first, second, third = db.session.execute(db.select(Transaction).order_by(Transaction.id)).scalars()
+        client.post(f'/transaction/{first.id}/edit', data={
+            'description': 'Lidl', 'from_user_id': str(bob.id), 'to_user_id': str(alice.id), 'date': '',
+            'items_json': json.dumps([{'name': 'milk', 'price': '1.50'}, {'name': 'Eggs', 'price': '3.10'}]),
+        })
+        client.post(f'/transaction/{second.id}/delete')
+        _expense(db, alice, bob, 'Aldi', [('Bread', Decimal('2.00'))])
+        # Edited items got new ids, so they are counted with the new rows.
+        assert count_new_rows() == (3, 1)
+        db.session.commit()
+
+        expected = {('item', 'milk'): 2, ('item', 'bread'): 2, ('item', 'eggs'): 1, ('price', '1.50'): 2,
+                    ('price', '2.00'): 2, ('price', '3.10'): 1, ('description', 'rewe'): 1,
+                    ('description', 'lidl'): 1, ('description', 'aldi'): 1}
+        assert _counters() == expected
+        assert count_new_rows() == (0, 0)
+        rebuild_counts()
+        assert _counters() == expected
+
+
+def test_spellings_from_separate_batches_share_one_counter(app, client, make_user):
+    from extensions import db
+    from models import AutoCollectCount, Transaction
+    from common_counts import count_new_rows
+    with app.app_context():
+        alice, bob = make_user(), make_user()
+        _expense(db, alice, bob, 'Kiosk', [('Milk', Decimal('1.00'))])
+        count_new_rows()
+        _expense(db, alice, bob, 'kiosk ', [(' milk', Decimal('1.00'))])
+        _expense(db, alice, bob, 'KIOSK', [('MILK', Decimal('1.00'))])
+        count_new_rows()
+        db.session.commit()
+        assert _counters() == {('item', 'milk'): 3, ('price', '1.00'): 3, ('description', 'kiosk'): 3}
+        assert db.session.execute(db.select(AutoCollectCount.value)
+                                  .where(AutoCollectCount.category == 'item')).scalar_one() == 'Milk'
+
+        first, second, third = db.session.execute(db.select(Transaction).order_by(Transaction.id)).scalars()
+        client.post(f'/transaction/{second.id}/delete')
+        client.post(f'/transaction/{first.id}/edit', data={
+            'description': 'Bakery', 'from_user_id': str(bob.id), 'to_user_id': str(alice.id), 'date': '',
+            'items_json': json.dumps([{'name': 'Bread', 'price': '1.00'}]),
+        })
+        count_new_rows()
+        db.session.commit()
+        assert _counters() == {('item', 'milk'): 1, ('item', 'bread'): 1, ('price', '1.00'): 2,
+                               ('description', 'kiosk'): 1, ('description', 'bakery'): 1}
+
+
+def test_missing_marks_rebuild_counters(app, make_user):
+    from extensions import db
+    from models import AutoCollectCount, CommonItem, Setting
+    from scheduler_jobs import auto_collect_common
+    with app.app_context():
+        alice, bob = make_user(), make_user()
+        for _ in range(3):
+            _expense(db, alice, bob, 'Kiosk', [('Gum', Decimal('0.50'))])
+        _enable(debug='0')
+        auto_collect_common()
+        db.session.execute(db.update(AutoCollectCount).values(uses=99))
+        db.session.execute(db.delete(Setting).where(Setting.key.like('common_auto_%_mark')))
+        db.session.execute(db.delete(CommonItem))
+        db.session.commit()
+
+        auto_collect_common()
+        assert _counters()[('item', 'gum')] == 3
+        assert _values(CommonItem.name) == ['Gum']
+
+        db.session.execute(db.update(AutoCollectCount).values(uses=1))
+        db.session.commit()
+        result = app.test_cli_runner().invoke(args=['recount-common'])
+        assert result.exit_code == 0
+        assert _counters()[('item', 'gum')] == 3
@@ -0,0 +1,70 @@
+import os
+import shutil
+import subprocess
+import tarfile
+
+import pytest
+
+
+@pytest.fixture
+def fake_mysqldump(monkeypatch, tmp_path):
+    """Replace mysqldump with a stub and point BACKUP_DIR at a temp directory."""
+    import backup_service
+    calls = []
+
+    def fake_run(cmd, stdout=None, **kwargs):
+        calls.append(cmd)
+        stdout.write(b'-- fake dump\n')
+        return subprocess.CompletedProcess(cmd, 0, stderr=b'')
+
+    monkeypatch.setattr(backup_service.subprocess, 'run', fake_run)
+    monkeypatch.setattr(backup_service, 'BACKUP_DIR', str(tmp_path))
+    return calls
+
+
+def test_rate_limiter_sleeps_when_ahead(monkeypatch):
+    import backup_service
+    slept = []
+    monkeypatch.setattr(backup_service.time, 'sleep', slept.append)
+    limiter = backup_service._RateLimiter(1024)
+    limiter.consume(2048)
+    assert slept and slept[0] > 1.5
+
+
+def test_rate_limiter_unlimited(monkeypatch):
+    import backup_service
+    slept = []
+    monkeypatch.setattr(backup_service.time, 'sleep', slept.append)
+    backup_service._RateLimiter(0).consume(10 * 1024 * 1024)
+    assert slept == []
+
+
+def test_run_backup_throttled(app, fake_mysqldump, tmp_path):
+    with app.app_context():
+        from extensions import db
+        from helpers import set_setting
+        from models import BackupLog
+        from backup_service import run_backup
+        set_setting('backup_debug', '1')
+        set_setting('backup_throttle_kbps', '100000')
+
+        ok, filename = run_backup(throttled=True)
+        assert ok, filename
+        with tarfile.open(os.path.join(tmp_path, filename), 'r:gz') as tar:
+            names = tar.getnames()
+            assert tar.extractfile('dump.sql').read() == b'-- fake dump\n'
+        assert 'receipts' in names and '.env' in names
+
+        if shutil.which('nice'):
+            assert 'nice' in fake_mysqldump[0]
+        messages = [log.message for log in db.session.execute(db.select(BackupLog)).scalars()]
+        assert any(m.startswith('SQL dump created (') for m in messages)
+        assert any(m.startswith('Archive compressed (') for m in messages)
+
+
+def test_run_backup_unthrottled_uses_plain_mysqldump(app, fake_mysqldump):
+    with app.app_context():
+        from backup_service import run_backup
+        ok, _ = run_backup()
+        assert ok
+        assert fake_mysqldump[0][0] == 'mysqldump'
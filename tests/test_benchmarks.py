@@ -0,0 +1,67 @@
+import json
+import os
+import subprocess
+import sys
+from decimal import Decimal
+
+import pytest
+
+_SCRIPTS = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+
+
+def _ledger_data():
+    sys.path.insert(0, _SCRIPTS)
+    try:
+        import ledger_data
+    finally:
+        sys.path.remove(_SCRIPTS)
+    return ledger_data
+
+
+def test_seed_ledger_writes_consistent_ledger(app):
+    with app.app_context():
+        from extensions import db
+        from models import ExpenseItem, Transaction, User
+        counts = _ledger_data().seed_ledger(db.engine, users=5, transactions=300, seed=7)
+
+        assert db.session.execute(db.select(db.func.count(Transaction.id))).scalar() == 300
+        assert db.session.execute(db.select(db.func.count(ExpenseItem.id))).scalar() == counts['items']
+        # Every expense's amount is the sum of its items.
+        sums = db.session.execute(
+            db.select(Transaction.amount, db.func.sum(ExpenseItem.price))
+            .join(ExpenseItem, ExpenseItem.transaction_id == Transaction.id)
+            .group_by(Transaction.id, Transaction.amount)).all()
+        assert sums and all(round(float(amount), 2) == round(float(total), 2) for amount, total in sums)
+        # Balances match the generated transactions.
+        for user in db.session.execute(db.select(User)).scalars():
+            incoming = db.session.execute(db.select(db.func.coalesce(db.func.sum(Transaction.amount), 0))
+                                          .where(Transaction.to_user_id == user.id)).scalar()
+            outgoing = db.session.execute(db.select(db.func.coalesce(db.func.sum(Transaction.amount), 0))
+                                          .where(Transaction.from_user_id == user.id)).scalar()
+            assert round(Decimal(str(user.balance)), 2) == round(Decimal(str(incoming)) - Decimal(str(outgoing)), 2)
+
+
+def test_bench_suite_writes_report(tmp_path):
+    report = tmp_path / 'report.json'
+    env = dict(os.environ, BENCH_DATABASE_URI=f'sqlite:///{tmp_path}/bench.db')
+    out = subprocess.run([sys.executable, os.path.join(_SCRIPTS, 'bench_suite.py'), '--scales', '200',
+                          '--repeat', '1', '--output', str(report)], env=env, capture_output=True, text=True)
+    assert out.returncode == 0, out.stdout + out.stderr
+    data = json.loads(report.read_text())
+    assert data['scales']['200']['rows']['transactions'] == 200
+    assert set(data['scales']['200']['benchmarks']) == {
+        'analytics_data', 'view_transactions', 'search', 'build_email_html',
+        'auto_collect_common', 'recount_common', 'make_icon_png', 'run_backup'}
+
+
+def test_load_test_drives_every_journey(tmp_path):
+    pytest.importorskip('gunicorn')
+    report = tmp_path / 'load.json'
+    out = subprocess.run([sys.executable, os.path.join(_SCRIPTS, 'load_test.py'), '--duration', '3',
+                          '--concurrency', '2', '--workers', '2', '--transactions', '200',
+                          '--output', str(report)], capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stdout + out.stderr
+    steps = json.loads(report.read_text())['steps']
+    assert {'GET /', 'GET /transaction/add', 'POST /transaction/add', 'GET /transactions',
+            'GET /search', 'GET /analytics/data'} <= set(steps)
+    assert all(s['errors'] == 0 and s['p50_ms'] <= s['p99_ms'] for s in steps.values())
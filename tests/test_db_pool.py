@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+
+def test_engine_options_for_mariadb(monkeypatch):
+    import db_pool
+    monkeypatch.setattr(db_pool, 'DB_POOL_SIZE', 8)
+    monkeypatch.setattr(db_pool, 'DB_POOL_RECYCLE', 600)
+    opts = db_pool.engine_options('mysql+pymysql://u:p@db:3306/bot')
+    assert opts['poolclass'] is db_pool.InstrumentedQueuePool
+    assert opts['pool_size'] == 8
+    assert opts['pool_recycle'] == 600
+    assert opts['pool_pre_ping'] is True
+    assert opts['connect_args'] == {'connect_timeout': db_pool.DB_CONNECT_TIMEOUT}
+
+
+def test_engine_options_skip_in_memory_sqlite():
+    from db_pool import engine_options
+    assert engine_options('sqlite://') == {}
+    assert engine_options('sqlite:///:memory:') == {}
+    assert 'connect_args' not in engine_options('sqlite:////tmp/bot.db')
+
+
+def test_checkout_waits_and_timeouts_are_recorded(tmp_path):
+    from sqlalchemy import create_engine, exc, text
+    import db_pool
+    db_pool.stats.reset()
+    engine = create_engine(f'sqlite:///{tmp_path}/pool.db', poolclass=db_pool.InstrumentedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.2)
+    held = engine.connect()
+    status = db_pool.pool_status(engine)
+    assert status['checked_out'] == 1
+    assert status['saturation'] == 1.0
+
+    released = threading.Timer(0.05, held.close)
+    released.start()
+    with engine.connect() as conn:  # waits until the timer returns the connection
+        conn.execute(text('SELECT 1'))
+    released.join()
+
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    status = db_pool.pool_status(engine)
+    assert status['checkouts'] == 3
+    assert status['timeouts'] == 1
+    assert status['wait_ms_max'] >= 150
+    assert status['checked_out'] == 0
+    engine.dispose()
+
+
+def test_health_reports_pool(client):
+    data = client.get('/health').get_json()
+    assert data['pool']['class'] == 'StaticPool'
+    assert 'wait_ms_p95' in data['pool']
@@ -12,6 +12,21 @@ def test_build_email_html_with_user(app, make_user):
         assert '42' in html
 
 
+def test_build_email_html_lists_recent_transactions(app, make_user):
+    with app.app_context():
+        from extensions import db
+        from models import Transaction
+        from email_service import build_email_html
+        alice = make_user(name='Alice', email='alice@test.com')
+        bob = make_user(name='Bob', email='bob@test.com')
+        db.session.add(Transaction(description='Pizza <Friday>', amount=Decimal('12.50'),
+                                   from_user_id=alice.id, to_user_id=bob.id, transaction_type='expense'))
+        db.session.commit()
+        html = build_email_html(alice)
+        assert 'Pizza &lt;Friday&gt;' in html
+        assert 'Bob' in html
+
+
 def test_build_admin_summary_email(app, make_user):
     with app.app_context():
         u1 = make_user(name='Admin1', email='admin1@test.com', balance=Decimal('10'))
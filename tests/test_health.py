@@ -17,6 +17,69 @@ def test_health_json_format(client, app):
     assert 'checks' in data
 
 
+def test_ready_reports_latency_and_disk(client, app, monkeypatch, tmp_path):
+    import health
+    monkeypatch.setattr(health, 'BACKUP_DIR', str(tmp_path))
+    monkeypatch.setattr(health, 'HEALTH_MIN_FREE_MB', 0)
+    response = client.get('/health/ready')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['database_ms'] >= 0
+    assert data['checks']['disk_uploads'] == 'ok'
+    assert data['checks']['disk_backups'] == 'ok'
+    assert data['disk']['backups']['free_mb'] > 0
+
+    monkeypatch.setattr(health, 'HEALTH_MIN_FREE_MB', 10 ** 12)
+    monkeypatch.setattr(health, 'BACKUP_DIR', str(tmp_path / 'gone'))
+    checks = client.get('/health/ready').get_json()['checks']
+    assert checks['disk_uploads'] == 'low'
+    assert checks['disk_backups'] == 'missing'
+
+
+def test_ready_serves_cached_snapshot(client, app, monkeypatch):
+    import health
+    monkeypatch.setattr(health, 'HEALTH_CACHE_TTL', 3600)
+    first = client.get('/health/ready').get_json()
+    calls = []
+    monkeypatch.setattr(health, '_check', lambda: calls.append(1))
+    second = client.get('/health/ready').get_json()
+    assert calls == []
+    assert second['checked_at'] == first['checked_at']
+
+
+def test_stale_snapshot_is_not_ready(client, app, monkeypatch):
+    import health
+    client.get('/health/ready')
+    # A running refresher that has not delivered for a while
+    monkeypatch.setattr(health, 'refresher_state', lambda: 'ok')
+    monkeypatch.setattr(health, '_snapshot_at', health._snapshot_at - 120)
+    response = client.get('/health/ready')
+    assert response.status_code == 503
+    assert response.get_json()['checks']['database'].startswith('stale')
+
+
+def test_live_does_not_touch_the_database(client, app, monkeypatch):
+    from extensions import db
+    def broken(*args, **kwargs):
+        raise AssertionError('liveness must not query')
+    monkeypatch.setattr(db.session, 'execute', broken)
+    response = client.get('/health/live')
+    assert response.status_code == 200
+    assert response.get_json()['checks']['scheduler_election'] == 'not started'
+
+
+def test_live_fails_when_a_background_thread_died(client, app, monkeypatch):
+    import health
+    import threading
+    dead = threading.Thread(target=lambda: None)
+    dead.start()
+    dead.join()
+    monkeypatch.setattr(health, '_thread', dead)
+    response = client.get('/health/live')
+    assert response.status_code == 503
+    assert response.get_json()['checks']['health_refresh'] == 'stopped'
+
+
 def test_csp_header(client, app):
     """CSP header is present on HTML responses with a valid nonce."""
     response = client.get('/')
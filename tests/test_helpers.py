@@ -96,3 +96,43 @@ def test_apply_template_missing_placeholder(app):
         from helpers import apply_template
         result = apply_template('Hello [Name], status: [Status]', Name='Bob')
         assert result == 'Hello Bob, status: [Status]'
+
+
+def test_is_content_addressed(app):
+    with app.app_context():
+        from helpers import is_content_addressed, receipt_rel_path
+        sha = 'ab' * 32
+        assert is_content_addressed(receipt_rel_path(sha, 'pdf'))
+        assert is_content_addressed(f'ab/ab/{sha}.min.webp')
+        assert not is_content_addressed(f'cd/ef/{sha}.pdf')
+        assert not is_content_addressed('2024/01/01/Alice_receipt.png')
+
+
+def _naive_icon_rows(size, bg, fg):
+    """Per-pixel reference rasterization of the bank silhouette."""
+    pixels = [[bg] * size for _ in range(size)]
+    pad = size * 0.15
+    draw = size - 2 * pad
+    rects = [(0.10, 0.00, 0.90, 0.18), (0.20, 0.18, 0.80, 0.26)]
+    rects += [(cx, 0.26, cx + 0.10, 0.78) for cx in (0.20, 0.45, 0.70)]
+    rects += [(0.10, 0.78, 0.90, 0.88), (0.05, 0.88, 0.95, 1.00)]
+    for x0f, y0f, x1f, y1f in rects:
+        for row in range(max(0, int(pad + y0f * draw)), min(size, int(pad + y1f * draw))):
+            for col in range(max(0, int(pad + x0f * draw)), min(size, int(pad + x1f * draw))):
+                pixels[row][col] = fg
+    return b''.join(b'\x00' + b''.join(bytes(p) for p in row) for row in pixels)
+
+
+def test_make_icon_png_matches_per_pixel_reference(app):
+    import struct
+    import zlib
+    with app.app_context():
+        from helpers import make_icon_png
+        for size in (16, 32, 180, 192):
+            png = make_icon_png(size, (127, 141, 187))
+            assert png.startswith(b'\x89PNG\r\n\x1a\n')
+            assert struct.unpack('>II', png[16:24]) == (size, size)
+            idat_len = struct.unpack('>I', png[33:37])[0]
+            raw = zlib.decompress(png[41:41 + idat_len])
+            assert raw == _naive_icon_rows(size, (127, 141, 187), (255, 255, 255))
+        assert make_icon_png(512, (1, 2, 3)) is make_icon_png(512, (1, 2, 3))
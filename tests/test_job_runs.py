@@ -0,0 +1,94 @@
+import time
+from datetime import UTC, datetime
+
+import pytest
+
+
+def _runs(job_id):
+    from extensions import db
+    from models import JobRun
+    return db.session.execute(db.select(JobRun).filter_by(job_id=job_id).order_by(JobRun.id)).scalars().all()
+
+
+def test_successful_run_is_recorded(app):
+    from job_runs import record_job_run
+    with app.app_context():
+        with record_job_run('backup_job') as run:
+            run.count(2048, 'bytes')
+        [r] = _runs('backup_job')
+        assert r.outcome == 'success'
+        assert r.processed == 2048 and r.processed_unit == 'bytes'
+        assert r.peak_rss > 0
+        assert r.finished_at >= r.started_at
+        assert r.slow is False and r.median_duration is None
+
+
+def test_failed_runs_are_recorded(app):
+    from job_runs import record_job_run
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            with record_job_run('email_job'):
+                raise RuntimeError('SMTP down')
+        with record_job_run('email_job') as run:
+            run.fail('2 failed')
+        first, second = _runs('email_job')
+        assert (first.outcome, first.message) == ('error', 'SMTP down')
+        assert (second.outcome, second.message) == ('error', '2 failed')
+
+
+def test_trigger_time_comes_from_the_scheduler_event(app):
+    from apscheduler.events import EVENT_JOB_SUBMITTED, JobSubmissionEvent
+    from job_runs import _on_submitted, record_job_run
+    fired = datetime(2026, 1, 5, 9, 0, tzinfo=UTC)
+    _on_submitted(JobSubmissionEvent(EVENT_JOB_SUBMITTED, 'common_job', 'default', [fired]))
+    with app.app_context():
+        with record_job_run('common_job'):
+            pass
+        assert _runs('common_job')[0].scheduled_at == datetime(2026, 1, 5, 9, 0)
+
+
+def test_run_far_above_median_is_flagged(app, client, monkeypatch):
+    import job_runs
+    from extensions import db
+    from models import JobRun
+    monkeypatch.setattr(job_runs, 'JOB_SLOW_MIN_SECONDS', 0)
+    with app.app_context():
+        now = datetime(2026, 1, 1)
+        for _ in range(3):
+            db.session.add(JobRun(job_id='receipt_gc_job', started_at=now, finished_at=now,
+                                  duration=0.001, outcome='success', slow=False))
+        db.session.commit()
+        with job_runs.record_job_run('receipt_gc_job'):
+            time.sleep(0.05)
+        latest = _runs('receipt_gc_job')[-1]
+        assert latest.slow is True
+        assert latest.median_duration == pytest.approx(0.001)
+
+    body = client.get('/health').get_json()
+    assert body['jobs']['receipt_gc_job']['slow'] is True
+    assert body['checks']['jobs'] == 'receipt_gc_job slow'
+    assert body['status'] == 'ok'
+
+
+def test_history_is_capped_per_job(app, monkeypatch):
+    import job_runs
+    monkeypatch.setattr(job_runs, 'JOB_RUN_KEEP', 2)
+    with app.app_context():
+        for n in range(4):
+            with job_runs.record_job_run('common_job') as run:
+                run.count(n, 'rows')
+        with job_runs.record_job_run('email_job'):
+            pass
+        assert [r.processed for r in _runs('common_job')] == [2, 3]
+        assert len(_runs('email_job')) == 1
+
+
+def test_settings_lists_job_runs(app, client):
+    from job_runs import record_job_run
+    with app.app_context():
+        with record_job_run('email_job') as run:
+            run.count(3, 'emails')
+    html = client.get('/settings').get_data(as_text=True)
+    assert 'Scheduled Job Runs' in html
+    assert 'Weekly email' in html
+    assert '3 emails' in html
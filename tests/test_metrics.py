@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+
+from prometheus_client import REGISTRY
+
+APP_DIR = os.path.join(os.path.dirname(__file__), '..', 'app')
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_metrics_endpoint_exposes_request_histogram(client):
+    client.get('/')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    body = response.get_data(as_text=True)
+    assert 'bot_request_duration_seconds_bucket{endpoint="main.index",le="0.005",method="GET",status="200"}' in body
+    assert 'bot_settings_lookups_total' in body
+
+
+def test_settings_lookups_count_identity_map_hits(app):
+    from extensions import db
+    from helpers import get_setting, set_setting
+    from models import Setting
+    with app.app_context():
+        set_setting('metrics_probe', 'x')
+        hits, misses = _value('bot_settings_lookups_total', result='hit'), _value('bot_settings_lookups_total', result='miss')
+        assert get_setting('metrics_probe') == 'x'
+        assert get_setting('metrics_probe_missing', 'd') == 'd'
+        assert _value('bot_settings_lookups_total', result='miss') == misses + 2
+
+        # The identity map only keeps rows something still references.
+        held = db.session.get(Setting, 'metrics_probe')
+        assert get_setting('metrics_probe') == 'x'
+        assert _value('bot_settings_lookups_total', result='hit') == hits + 1
+
+        db.session.commit()
+        assert get_setting('metrics_probe') == 'x'
+        assert _value('bot_settings_lookups_total', result='miss') == misses + 3
+        assert held.value == 'x'
+
+
+def test_observe_job_records_duration_and_outcome():
+    from metrics import observe_job
+    before = _value('bot_job_runs_total', job='test_job', outcome='success')
+    observe_job('test_job', 0.5, ok=True)
+    assert _value('bot_job_runs_total', job='test_job', outcome='success') == before + 1
+    assert _value('bot_job_last_success_timestamp_seconds', job='test_job') > 0
+
+    observe_job('test_job', 0.5, ok=False)
+    assert _value('bot_job_runs_total', job='test_job', outcome='error') == 1
+    assert _value('bot_job_duration_seconds_count', job='test_job') == before + 2
+
+
+def test_failed_email_is_counted(app):
+    from email_service import send_single_email
+    with app.app_context():
+        before = _value('bot_emails_total', result='failed')
+        ok, _ = send_single_email('a@example.com', 'A', 'Subject', '<p>hi</p>')
+        assert not ok
+        assert _value('bot_emails_total', result='failed') == before + 1
+
+
+def test_workers_aggregate_through_multiproc_dir(tmp_path):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    worker = 'import metrics; metrics.EMAILS.labels("sent").inc(3); metrics.JOB_LAST_SUCCESS.labels("email_job").set({})'
+    for ts in (100, 200):
+        subprocess.run([sys.executable, '-c', worker.format(ts)], cwd=APP_DIR, env=env, check=True)
+    out = subprocess.run([sys.executable, '-c', 'import metrics; print(metrics.render()[0].decode())'],
+                         cwd=APP_DIR, env=env, capture_output=True, text=True, check=True).stdout
+    assert 'bot_emails_total{result="sent"} 6.0' in out
+    assert 'bot_job_last_success_timestamp_seconds{job="email_job"} 200.0' in out
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def profiling(monkeypatch, tmp_path):
+    import profiler
+    monkeypatch.setattr(profiler, 'PROFILER_TOKEN', 's3cret')
+    monkeypatch.setattr(profiler, 'PROFILE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def test_no_profile_without_token(client, monkeypatch, tmp_path):
+    import profiler
+    monkeypatch.setattr(profiler, 'PROFILE_DIR', str(tmp_path))
+    resp = client.get('/', headers={'X-Profile': ''})
+    assert 'X-Profile-Id' not in resp.headers
+    assert os.listdir(tmp_path) == []
+
+
+def test_wrong_token_is_ignored(client, profiling):
+    resp = client.get('/?_profile=guess')
+    assert 'X-Profile-Id' not in resp.headers
+    assert os.listdir(profiling) == []
+
+
+def test_header_profiles_request(client, profiling):
+    resp = client.get('/', headers={'X-Profile': 's3cret'})
+    assert resp.status_code == 200
+    name = resp.headers['X-Profile-Id']
+    assert name.endswith('.prof') and '_GET_main.index_' in name
+    assert os.listdir(profiling) == [name]
+
+
+def test_token_is_not_logged(client, profiling, caplog):
+    caplog.set_level('INFO', logger='profiler')
+    client.get('/search?q=x&_profile=s3cret')
+    assert 'Profiled GET /search' in caplog.text
+    assert 's3cret' not in caplog.text
+
+
+def test_ring_keeps_newest(client, profiling, monkeypatch):
+    import profiler
+    monkeypatch.setattr(profiler, 'PROFILE_KEEP', 2)
+    names = [client.get('/?_profile=s3cret').headers['X-Profile-Id'] for _ in range(4)]
+    assert sorted(os.listdir(profiling)) == names[2:]
+    assert [p['name'] for p in profiler.list_profiles()] == names[:1:-1]
+
+
+def test_settings_lists_and_shows_profiles(client, profiling):
+    name = client.get('/search?q=x', headers={'X-Profile': 's3cret'}).headers['X-Profile-Id']
+    html = client.get('/settings').get_data(as_text=True)
+    assert 'Request Profiles' in html and 'main.search' in html
+
+    report = client.get(f'/settings/profiles/{name}?sort=tottime').get_data(as_text=True)
+    assert 'function calls' in report
+    assert client.get(f'/settings/profiles/{name}/download').status_code == 200
+    assert client.get('/settings/profiles/..%2Fpasswd').status_code == 404
+
+    client.post('/settings/profiles/clear')
+    assert os.listdir(profiling) == []
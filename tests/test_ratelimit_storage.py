@@ -0,0 +1,107 @@
+import pytest
+
+
+class _Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def storage(app, monkeypatch):
+    """A DatabaseStorage with empty tables and a controllable clock."""
+    import ratelimit_storage
+    clock = _Clock()
+    monkeypatch.setattr(ratelimit_storage.time, 'time', clock.time)
+    with app.app_context():
+        store = ratelimit_storage.DatabaseStorage('botdb://')
+        store.reset()
+        store.clock = clock
+        yield store
+        store.reset()
+
+
+def test_botdb_scheme_is_registered(app):
+    from limits.storage import storage_from_string
+    from ratelimit_storage import DatabaseStorage
+    from extensions import limiter
+    assert isinstance(storage_from_string('botdb://'), DatabaseStorage)
+    assert isinstance(limiter.storage, DatabaseStorage)
+
+
+def test_timestamps_are_double_precision_on_mariadb():
+    from sqlalchemy.dialects import mysql
+    from models import RateLimitCounter, RateLimitEntry
+    for column in (RateLimitCounter.expires_at, RateLimitEntry.hit_at, RateLimitEntry.expires_at):
+        assert column.type.compile(dialect=mysql.dialect()) == 'DOUBLE'
+
+
+def test_fixed_window_counts_until_expiry(storage):
+    assert storage.incr('k', 60) == 1
+    assert storage.incr('k', 60, amount=2) == 3
+    assert storage.get('k') == 3
+    assert storage.get_expiry('k') == storage.clock.now + 60
+
+    storage.clock.now += 61
+    assert storage.get('k') == 0
+    assert storage.incr('k', 60) == 1
+    assert storage.get_expiry('k') == storage.clock.now + 60
+
+
+def test_clear_resets_one_key(storage):
+    storage.incr('a', 60)
+    storage.incr('b', 60)
+    storage.clear('a')
+    assert storage.get('a') == 0
+    assert storage.get('b') == 1
+
+
+def test_moving_window_rejects_beyond_limit(storage):
+    assert storage.acquire_entry('m', 2, 60)
+    storage.clock.now += 30
+    assert storage.acquire_entry('m', 2, 60)
+    assert not storage.acquire_entry('m', 2, 60)
+    assert storage.get_moving_window('m', 2, 60) == (storage.clock.now - 30, 2)
+
+    # The first hit leaves the window, freeing one slot.
+    storage.clock.now += 31
+    assert storage.acquire_entry('m', 2, 60)
+    assert not storage.acquire_entry('m', 2, 60)
+    assert not storage.acquire_entry('m', 5, 60, amount=6)
+
+
+def test_limits_strategies_use_shared_counters(storage):
+    from limits import parse
+    from limits.strategies import FixedWindowRateLimiter, MovingWindowRateLimiter
+    from ratelimit_storage import DatabaseStorage
+    for strategy in (FixedWindowRateLimiter, MovingWindowRateLimiter):
+        # Two workers each construct their own storage object.
+        worker_a, worker_b = strategy(storage), strategy(DatabaseStorage('botdb://'))
+        limit = parse('3/minute')
+        assert worker_a.hit(limit, 'restore')
+        assert worker_b.hit(limit, 'restore')
+        assert worker_a.hit(limit, 'restore')
+        assert not worker_b.hit(limit, 'restore')
+        storage.reset()
+
+
+def test_expired_rows_are_purged_in_batches(storage, monkeypatch):
+    import ratelimit_storage
+    from extensions import db
+    from models import RateLimitCounter, RateLimitEntry
+    monkeypatch.setattr(ratelimit_storage, 'RATELIMIT_CLEANUP_INTERVAL', 60)
+    for i in range(5):
+        storage.incr(f'old-{i}', 10)
+        storage.acquire_entry(f'old-{i}', 5, 10)
+    storage.clock.now += 61
+    storage.incr('fresh', 10)  # first call after the interval cleans up
+    count = lambda model: db.session.execute(db.select(db.func.count()).select_from(model)).scalar()
+    assert count(RateLimitCounter) == 1
+    assert count(RateLimitEntry) == 0
+
+    storage.incr('old-0', 5)
+    storage.clock.now += 10
+    storage.incr('fresh', 10)  # within the interval: no DELETE on this request
+    assert count(RateLimitCounter) == 2
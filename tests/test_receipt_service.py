@@ -0,0 +1,237 @@
+import hashlib
+import io
+import os
+from decimal import Decimal
+
+import pytest
+
+
+@pytest.fixture
+def stored_receipt(app, make_user):
+    """Store a noisy 1600x1200 PNG as a referenced Receipt and return its id."""
+    from PIL import Image
+    from extensions import db
+    from models import Receipt, Transaction
+    from helpers import receipt_rel_path
+
+    img = Image.effect_noise((1600, 1200), 64).convert('RGB')
+    buf = io.BytesIO()
+    img.save(buf, 'PNG', compress_level=1)
+    data = buf.getvalue()
+    sha = hashlib.sha256(data).hexdigest()
+    rel = receipt_rel_path(sha, 'png')
+    abs_path = os.path.join(app.config['UPLOAD_FOLDER'], rel)
+    os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+    with open(abs_path, 'wb') as f:
+        f.write(data)
+
+    u1, u2 = make_user(), make_user()
+    receipt = Receipt(sha256=sha, path=rel, size=len(data), ref_count=1)
+    db.session.add(receipt)
+    db.session.flush()
+    db.session.add(Transaction(description='Photo', amount=Decimal('3'), from_user_id=u1.id,
+                               to_user_id=u2.id, transaction_type='expense',
+                               receipt_path=rel, receipt_id=receipt.id))
+    db.session.commit()
+    return receipt.id
+
+
+def test_process_receipt_downscales_and_repoints(app, stored_receipt):
+    with app.app_context():
+        from PIL import Image
+        from extensions import db
+        from helpers import set_setting
+        from models import Receipt, Transaction
+        from receipt_service import process_receipt
+        from thumbnail_service import get_thumbnail
+        set_setting('receipt_max_edge', '1000')
+
+        old_path = db.session.get(Receipt, stored_receipt).path
+        old_thumb = get_thumbnail(old_path, enforce_limit=False)
+        saved = process_receipt(stored_receipt)
+        assert saved > 0
+
+        receipt = db.session.get(Receipt, stored_receipt)
+        assert receipt.path.endswith('.jpg')
+        assert receipt.processed_at is not None
+        assert receipt.original_size - receipt.size == saved
+        abs_path = os.path.join(app.config['UPLOAD_FOLDER'], receipt.path)
+        with Image.open(abs_path) as img:
+            assert max(img.size) == 1000
+            assert img.info.get('progressive') or img.info.get('progression')
+        assert not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], old_path))
+        assert not os.path.exists(old_thumb)
+        tx = db.session.execute(db.select(Transaction).filter_by(receipt_id=stored_receipt)).scalar()
+        assert tx.receipt_path == receipt.path
+
+        assert process_receipt(stored_receipt) == 0
+
+
+def test_process_receipt_keeps_original_when_configured(app, stored_receipt):
+    with app.app_context():
+        from extensions import db
+        from helpers import set_setting, release_receipt
+        from models import Receipt
+        from receipt_service import process_receipt
+        set_setting('receipt_keep_original', '1')
+        set_setting('receipt_format', 'webp')
+
+        process_receipt(stored_receipt)
+        receipt = db.session.get(Receipt, stored_receipt)
+        assert receipt.path.endswith('.webp')
+        orig = os.path.join(app.config['UPLOAD_FOLDER'], receipt.original_path)
+        assert os.path.isfile(orig)
+
+        release_receipt(receipt)
+        db.session.commit()
+        assert not os.path.exists(orig)
+
+
+def test_failed_commit_keeps_original_served(app, client, stored_receipt, monkeypatch):
+    with app.app_context():
+        from extensions import db
+        from helpers import set_setting
+        from models import Receipt
+        from receipt_service import process_receipt
+        set_setting('receipt_keep_original', '1')
+
+        path = db.session.get(Receipt, stored_receipt).path
+        abs_path = os.path.join(app.config['UPLOAD_FOLDER'], path)
+        with open(abs_path, 'rb') as f:
+            data = f.read()
+        before = sorted(os.listdir(os.path.dirname(abs_path)))
+
+        def fail():
+            raise RuntimeError('commit failed')
+        monkeypatch.setattr(db.session, 'commit', fail)
+        with pytest.raises(RuntimeError):
+            process_receipt(stored_receipt)
+        monkeypatch.undo()
+
+        receipt = db.session.get(Receipt, stored_receipt)
+        assert receipt.path == path and receipt.processed_at is None and receipt.original_path is None
+        assert client.get(f'/receipt/{path}').data == data
+        assert sorted(os.listdir(os.path.dirname(abs_path))) == before
+
+
+def test_process_all_receipts_reports_savings(app, stored_receipt):
+    with app.app_context():
+        from receipt_service import process_all_receipts
+        changed, saved = process_all_receipts()
+        assert changed == 1 and saved > 0
+        assert process_all_receipts() == (0, 0)
+
+
+def test_receipt_settings_saved(client, app):
+    with app.app_context():
+        client.post('/settings/receipts', data={
+            'receipt_processing': '1',
+            'receipt_max_edge': '50',
+            'receipt_quality': '85',
+            'receipt_format': 'gif',
+        })
+        from helpers import get_setting
+        assert get_setting('receipt_processing') == '1'
+        assert get_setting('receipt_max_edge') == '320'
+        assert get_setting('receipt_quality') == '85'
+        assert get_setting('receipt_format') == 'jpeg'
+        assert get_setting('receipt_keep_original') == '0'
+
+
+@pytest.fixture
+def gc_uploads(app, tmp_path, monkeypatch):
+    """Point UPLOAD_FOLDER at an empty directory for the orphan GC tests."""
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+
+    def write(rel, data=b'x' * 100, age_days=30):
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        mtime = path.stat().st_mtime - age_days * 86400
+        os.utime(path, (mtime, mtime))
+        return path
+    return tmp_path, write
+
+
+def test_collect_orphan_receipts_quarantines_then_deletes(app, make_user, gc_uploads):
+    root, write = gc_uploads
+    with app.app_context():
+        from extensions import db
+        from models import Transaction
+        from receipt_service import collect_orphan_receipts
+        u1, u2 = make_user(), make_user()
+        referenced = write('2024/01/01/Alice_kept.pdf')
+        db.session.add(Transaction(description='Kept', amount=Decimal('1'), from_user_id=u1.id,
+                                   to_user_id=u2.id, transaction_type='expense',
+                                   receipt_path='2024/01/01/Alice_kept.pdf'))
+        db.session.commit()
+        orphan = write('ab/cd/orphan.pdf')
+        fresh = write('ab/cd/fresh.pdf', age_days=0)
+        thumb = write('ab/cd/.thumbs/orphan.pdf.320.webp')
+        stale_tmp = write('.upload-abc123', data=b'y' * 40)
+
+        assert collect_orphan_receipts(grace_days=7) == (1, 1, 40)
+        assert referenced.exists() and fresh.exists()
+        assert not orphan.exists() and not thumb.exists() and not stale_tmp.exists()
+        quarantined = root / '.quarantine' / 'ab' / 'cd' / 'orphan.pdf'
+        assert quarantined.exists()
+
+        assert collect_orphan_receipts(grace_days=7) == (0, 0, 0)
+        old = quarantined.stat().st_mtime - 8 * 86400
+        os.utime(quarantined, (old, old))
+        assert collect_orphan_receipts(grace_days=7) == (0, 1, 100)
+        assert not quarantined.exists()
+
+
+def test_collect_orphan_receipts_reclaims_zero_ref_rows(app, make_user, gc_uploads):
+    from datetime import datetime, timedelta
+    root, write = gc_uploads
+    with app.app_context():
+        from extensions import db
+        from models import Receipt
+        from receipt_service import collect_orphan_receipts
+        long_ago = datetime.now() - timedelta(days=30)
+        leaked = write('aa/bb/leaked.pdf')
+        live = write('aa/bb/live.pdf')
+        db.session.add_all([
+            Receipt(sha256='a' * 64, path='aa/bb/leaked.pdf', size=100, ref_count=0, created_at=long_ago),
+            Receipt(sha256='b' * 64, path='aa/bb/live.pdf', size=100, ref_count=1, created_at=long_ago),
+        ])
+        db.session.commit()
+
+        assert collect_orphan_receipts(grace_days=7) == (1, 0, 0)
+        assert not leaked.exists() and live.exists()
+        assert [r.path for r in db.session.execute(db.select(Receipt)).scalars()] == ['aa/bb/live.pdf']
+
+
+def test_collect_orphan_receipts_restores_referenced_again(app, make_user, gc_uploads):
+    root, write = gc_uploads
+    with app.app_context():
+        from extensions import db
+        from models import Transaction
+        from receipt_service import collect_orphan_receipts
+        write('ab/cd/restored.pdf')
+        assert collect_orphan_receipts(grace_days=7)[0] == 1
+
+        u1, u2 = make_user(), make_user()
+        db.session.add(Transaction(description='Restored', amount=Decimal('1'), from_user_id=u1.id,
+                                   to_user_id=u2.id, transaction_type='expense',
+                                   receipt_path='ab/cd/restored.pdf'))
+        db.session.commit()
+        collect_orphan_receipts(grace_days=7)
+        assert (root / 'ab' / 'cd' / 'restored.pdf').exists()
+        assert not (root / '.quarantine' / 'ab' / 'cd' / 'restored.pdf').exists()
+
+
+def test_collect_orphan_receipts_keeps_original_path(app, stored_receipt, gc_uploads):
+    root, write = gc_uploads
+    with app.app_context():
+        from extensions import db
+        from models import Receipt
+        from receipt_service import collect_orphan_receipts
+        receipt = db.session.get(Receipt, stored_receipt)
+        receipt.original_path = receipt.path.replace('.png', '.orig.png')
+        db.session.commit()
+        write(receipt.path)
+        write(receipt.original_path)
+        assert collect_orphan_receipts(grace_days=7) == (0, 0, 0)
@@ -0,0 +1,39 @@
+import logging
+import re
+
+
+def test_server_timing_header(client):
+    response = client.get('/')
+    header = response.headers['Server-Timing']
+    assert re.fullmatch(r'total;dur=[\d.]+, db;dur=[\d.]+;desc="(\d+) queries", render;dur=[\d.]+', header)
+    assert int(re.search(r'"(\d+) queries"', header).group(1)) > 0
+    assert float(re.search(r'render;dur=([\d.]+)', header).group(1)) > 0
+
+
+def test_repeated_statements_are_counted(app):
+    from extensions import db
+    from flask import g
+    from request_timing import RequestTimings, current_timings
+    with app.test_request_context('/'):
+        g._timings = RequestTimings()
+        for i in range(4):
+            db.session.execute(db.text('SELECT :n'), {'n': i})
+        db.session.execute(db.text('SELECT 2'))
+        timings = current_timings()
+        assert timings.queries == 5
+        assert timings.repeated_statements() == [('SELECT ?', 4)]
+
+
+def test_slow_requests_are_logged(client, monkeypatch, caplog):
+    import request_timing
+    monkeypatch.setattr(request_timing, 'SLOW_REQUEST_MS', 0)
+    with caplog.at_level(logging.WARNING, logger='request_timing'):
+        client.get('/')
+    assert 'Slow request GET / endpoint=main.index' in caplog.text
+    assert 'queries)' in caplog.text
+
+    caplog.clear()
+    monkeypatch.setattr(request_timing, 'SLOW_REQUEST_MS', 60_000)
+    with caplog.at_level(logging.WARNING, logger='request_timing'):
+        client.get('/')
+    assert 'Slow request' not in caplog.text
@@ -414,3 +414,240 @@ def test_search_has_receipt(client, app, make_user):
         assert response.status_code == 200
         assert b'HasReceipt' in response.data
         assert b'NoReceipt' not in response.data
+
+
+def test_expense_receipts_are_deduplicated_and_refcounted(client, app, make_user):
+    import io
+    import os
+    with app.app_context():
+        from extensions import db
+        from models import Receipt, Transaction
+        buyer = make_user(name='DedupBuyer')
+        d1 = make_user(name='DedupDebtor1')
+        d2 = make_user(name='DedupDebtor2')
+
+        def post_expense(description, debtors):
+            items = [{'name': 'Pizza', 'price': '4.00', 'debtor_id': str(d.id)} for d in debtors]
+            client.post('/transaction/add', data={
+                'transaction_type': 'expense',
+                'buyer_id': str(buyer.id),
+                'description': description,
+                'items_json': json.dumps(items),
+                'date': '',
+                'receipt': (io.BytesIO(b'%PDF same receipt'), 'scan.pdf'),
+            }, content_type='multipart/form-data')
+
+        post_expense('First', [d1, d2])
+        post_expense('Second', [d1])
+
+        receipts = db.session.execute(db.select(Receipt)).scalars().all()
+        assert len(receipts) == 1
+        receipt = receipts[0]
+        assert receipt.ref_count == 3
+        assert receipt.path == f'{receipt.sha256[:2]}/{receipt.sha256[2:4]}/{receipt.sha256}.pdf'
+        abs_path = os.path.join(app.config['UPLOAD_FOLDER'], receipt.path)
+        assert os.path.isfile(abs_path)
+
+        txs = db.session.execute(db.select(Transaction)).scalars().all()
+        assert {t.receipt_path for t in txs} == {receipt.path}
+        for tx in txs[:-1]:
+            client.post(f'/transaction/{tx.id}/delete')
+            assert os.path.isfile(abs_path)
+        client.post(f'/transaction/{txs[-1].id}/delete')
+        assert not os.path.exists(abs_path)
+        assert db.session.execute(db.select(Receipt)).scalar() is None
+
+
+def test_expense_without_debts_stores_no_receipt_row(client, app, make_user):
+    import io
+    with app.app_context():
+        from extensions import db
+        from models import Receipt
+        buyer = make_user(name='SoloBuyer')
+        client.post('/transaction/add', data={
+            'transaction_type': 'expense',
+            'buyer_id': str(buyer.id),
+            'description': 'Own groceries',
+            'items_json': json.dumps([{'name': 'Bread', 'price': '2.00', 'debtor_id': str(buyer.id)}]),
+            'date': '',
+            'receipt': (io.BytesIO(b'%PDF nobody owes'), 'scan.pdf'),
+        }, content_type='multipart/form-data')
+        assert db.session.execute(db.select(Receipt)).scalar() is None
+
+
+def test_released_receipt_file_survives_rollback(app, make_user):
+    import io
+    import os
+    from werkzeug.datastructures import FileStorage
+    with app.app_context():
+        from decimal import Decimal
+        from extensions import db
+        from models import Transaction
+        from helpers import attach_receipt, detach_receipt, save_receipt
+        a, b = make_user(), make_user()
+        tx = Transaction(description='R', amount=Decimal('1'), from_user_id=a.id, to_user_id=b.id,
+                         transaction_type='expense')
+        receipt = attach_receipt(tx, save_receipt(FileStorage(io.BytesIO(b'%PDF r'), 'r.pdf'), 'A'))
+        db.session.add(tx)
+        db.session.commit()
+        abs_path = os.path.join(app.config['UPLOAD_FOLDER'], receipt.path)
+
+        detach_receipt(tx)
+        db.session.rollback()
+        assert os.path.isfile(abs_path)
+
+        detach_receipt(tx)
+        assert os.path.isfile(abs_path)
+        db.session.commit()
+        assert not os.path.exists(abs_path)
+
+
+def test_concurrent_first_upload_reuses_stored_row(app, make_user):
+    import io
+    from werkzeug.datastructures import FileStorage
+    with app.app_context():
+        from decimal import Decimal
+        from extensions import db
+        from models import Receipt, Transaction
+        from helpers import attach_receipt, save_receipt
+        a, b = make_user(), make_user()
+        mine = save_receipt(FileStorage(io.BytesIO(b'%PDF twice'), 'r.pdf'), 'A')
+        # Another request stores the same content between our lookup and our insert.
+        db.session.add(Receipt(sha256=mine.sha256, path=mine.path, size=mine.size, ref_count=1))
+        db.session.commit()
+
+        tx = Transaction(description='Race', amount=Decimal('1'), from_user_id=a.id, to_user_id=b.id,
+                         transaction_type='expense')
+        stored = attach_receipt(tx, mine)
+        db.session.add(tx)
+        db.session.commit()
+        assert stored is not mine
+        assert db.session.execute(db.select(Receipt)).scalar_one().ref_count == 2
+
+
+def test_edit_transaction_reupload_same_receipt_keeps_file(client, app, make_user):
+    import io
+    import os
+    with app.app_context():
+        from extensions import db
+        from models import Receipt, Transaction
+        buyer = make_user(name='ReBuyer')
+        debtor = make_user(name='ReDebtor')
+        client.post('/transaction/add', data={
+            'transaction_type': 'expense',
+            'buyer_id': str(buyer.id),
+            'description': 'Reupload',
+            'items_json': json.dumps([{'name': 'Tea', 'price': '2.00', 'debtor_id': str(debtor.id)}]),
+            'date': '',
+            'receipt': (io.BytesIO(b'same bytes'), 'r.png'),
+        }, content_type='multipart/form-data')
+        tx = db.session.execute(db.select(Transaction).filter_by(description='Reupload')).scalar()
+
+        client.post(f'/transaction/{tx.id}/edit', data={
+            'description': 'Reupload',
+            'amount': '2.00',
+            'from_user_id': str(debtor.id),
+            'to_user_id': str(buyer.id),
+            'date': '',
+            'receipt': (io.BytesIO(b'same bytes'), 'again.png'),
+        }, content_type='multipart/form-data')
+
+        receipt = db.session.execute(db.select(Receipt)).scalar_one()
+        assert receipt.ref_count == 1
+        assert os.path.isfile(os.path.join(app.config['UPLOAD_FOLDER'], receipt.path))
+
+
+def test_content_addressed_receipt_is_immutable_and_revalidates(client, app):
+    import hashlib
+    import os
+    data = b'%PDF immutable receipt'
+    sha = hashlib.sha256(data).hexdigest()
+    rel = f'{sha[:2]}/{sha[2:4]}/{sha}.pdf'
+    abs_path = os.path.join(app.config['UPLOAD_FOLDER'], rel)
+    os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+    with open(abs_path, 'wb') as f:
+        f.write(data)
+    try:
+        response = client.get(f'/receipt/{rel}')
+        assert response.status_code == 200
+        assert response.data == data
+        assert 'immutable' in response.headers['Cache-Control']
+        assert response.headers['ETag'] == f'"{sha}.pdf"'
+
+        response = client.get(f'/receipt/{rel}', headers={'If-None-Match': response.headers['ETag']})
+        assert response.status_code == 304
+        assert 'immutable' in response.headers['Cache-Control']
+    finally:
+        os.remove(abs_path)
+
+
+def test_legacy_receipt_path_revalidates(client, app):
+    import os
+    rel = '2024/03/01/Alice_legacy.pdf'
+    abs_path = os.path.join(app.config['UPLOAD_FOLDER'], rel)
+    os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+    with open(abs_path, 'wb') as f:
+        f.write(b'%PDF legacy')
+    try:
+        response = client.get(f'/receipt/{rel}')
+        assert response.status_code == 200
+        assert 'no-cache' in response.headers['Cache-Control']
+        assert 'immutable' not in response.headers['Cache-Control']
+        assert response.headers.get('Last-Modified')
+
+        response = client.get(f'/receipt/{rel}', headers={'If-None-Match': response.headers['ETag']})
+        assert response.status_code == 304
+    finally:
+        os.remove(abs_path)
+
+
+def test_versioned_icon_is_immutable(client, app):
+    with app.app_context():
+        from helpers import set_setting
+        set_setting('icon_version', '42')
+
+    response = client.get('/static/icons/icon-192.png?v=42')
+    assert response.status_code == 200
+    assert 'immutable' in response.headers['Cache-Control']
+    response = client.get('/static/icons/icon-192.png?v=42',
+                          headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+    assert 'immutable' in response.headers['Cache-Control']
+
+    assert 'immutable' not in client.get('/static/icons/icon-192.png?v=41').headers['Cache-Control']
+    assert 'immutable' not in client.get('/static/icons/icon-192.png').headers['Cache-Control']
+
+
+def test_on_demand_icon_size(client, app):
+    with app.app_context():
+        from helpers import set_setting
+        set_setting('icon_version', '7')
+        set_setting('icon_bg', '#112233')
+
+    response = client.get('/icons/icon-180.png?v=7')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert response.data[16:24] == (180).to_bytes(4, 'big') * 2
+    assert 'immutable' in response.headers['Cache-Control']
+    assert client.get('/icons/icon-180.png?v=7',
+                      headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get('/icons/icon-4096.png').status_code == 404
+
+
+def test_service_worker_gets_build_hash_and_precache_list(client, app):
+    import json as _json
+    with app.app_context():
+        from helpers import set_setting
+        set_setting('icon_version', '9')
+
+    response = client.get('/sw.js')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/javascript'
+    assert 'no-cache' in response.headers['Cache-Control']
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0].startswith('const BUILD = "')
+    precache = _json.loads(lines[1].removeprefix('const PRECACHE_URLS = ').rstrip(';'))
+    assert '/static/vendor/css/bootstrap.min.css' in precache
+    assert '/icons/icon-180.png?v=9' in precache
+
+    assert client.get('/sw.js', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
@@ -0,0 +1,83 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def leader(app, monkeypatch):
+    """Fresh election state with no lease row and no scheduled jobs."""
+    import scheduler_leader
+    from extensions import db, scheduler
+    from models import SchedulerLease
+    monkeypatch.setattr(scheduler_leader, '_identity', 'worker-a')
+    monkeypatch.setattr(scheduler_leader, '_is_leader', False)
+    monkeypatch.setattr(scheduler_leader, '_applied_version', None)
+    with app.app_context():
+        db.session.execute(db.delete(SchedulerLease))
+        db.session.commit()
+        yield scheduler_leader
+        scheduler.remove_all_jobs()
+        db.session.execute(db.delete(SchedulerLease))
+        db.session.commit()
+
+
+def test_only_one_worker_holds_the_lease(leader, monkeypatch):
+    from extensions import db
+    from models import SchedulerLease
+    assert leader.try_acquire_lease()
+    assert leader.try_acquire_lease()  # renewal
+
+    monkeypatch.setattr(leader, '_identity', 'worker-b')
+    assert not leader.try_acquire_lease()
+
+    lease = db.session.get(SchedulerLease, leader.LEASE_NAME)
+    lease.expires_at = datetime.now(UTC).replace(tzinfo=None) - timedelta(seconds=1)
+    db.session.commit()
+    assert leader.try_acquire_lease()
+    assert db.session.get(SchedulerLease, leader.LEASE_NAME).holder == 'worker-b'
+
+
+def test_released_lease_is_taken_over_immediately(leader, monkeypatch):
+    assert leader.try_acquire_lease()
+    leader.release_lease()
+    monkeypatch.setattr(leader, '_identity', 'worker-b')
+    assert leader.try_acquire_lease()
+
+
+def test_heartbeat_loads_jobs_on_leader_and_steps_down(app, leader, monkeypatch):
+    from extensions import db, scheduler
+    from helpers import set_setting
+    from models import SchedulerLease
+    set_setting('schedule_enabled', '1')
+    set_setting('receipt_gc_enabled', '0')
+
+    leader.heartbeat(app)
+    assert leader.is_leader()
+    assert scheduler.get_job('email_job') is not None
+
+    lease = db.session.get(SchedulerLease, leader.LEASE_NAME)
+    lease.holder = 'worker-b'
+    lease.expires_at = datetime.now(UTC).replace(tzinfo=None) + timedelta(minutes=5)
+    db.session.commit()
+    leader.heartbeat(app)
+    assert not leader.is_leader()
+    assert scheduler.get_job('email_job') is None
+
+
+def test_schedule_change_propagates_to_leader(app, client, leader, monkeypatch):
+    from extensions import db, scheduler
+    from helpers import set_setting
+    from models import SchedulerLease
+    set_setting('receipt_gc_enabled', '0')
+    leader.heartbeat(app)
+    assert scheduler.get_job('backup_job') is None
+
+    # A settings POST handled by another worker only bumps the schedule version.
+    monkeypatch.setattr(leader, '_is_leader', False)
+    client.post('/settings/backup', data={'backup_enabled': '1', 'backup_hour': '4'})
+    assert db.session.get(SchedulerLease, leader.LEASE_NAME).schedule_version == 1
+    assert scheduler.get_job('backup_job') is None
+
+    monkeypatch.setattr(leader, '_is_leader', True)
+    leader.heartbeat(app)
+    assert scheduler.get_job('backup_job') is not None
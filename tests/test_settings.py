@@ -1,3 +1,4 @@
+import os
 from decimal import Decimal
 
 
@@ -226,3 +227,40 @@ def test_backup_create(client, app, tmp_path):
             assert response.status_code == 200
     finally:
         backup_service.BACKUP_DIR = original
+
+
+def test_backup_stream(client, app, tmp_path, monkeypatch):
+    """Streaming a backup returns a tar.gz with the run_backup layout and writes nothing to BACKUP_DIR."""
+    import io
+    import subprocess
+    import tarfile
+    import backup_service
+
+    def fake_run(cmd, stdout=None, **kwargs):
+        stdout.write(b'-- fake dump\n')
+        return subprocess.CompletedProcess(cmd, 0, stderr=b'')
+
+    monkeypatch.setattr(backup_service.subprocess, 'run', fake_run)
+    monkeypatch.setattr(backup_service, 'BACKUP_DIR', str(tmp_path))
+    receipt_dir = os.path.join(app.config['UPLOAD_FOLDER'], '2024', '01', '01')
+    os.makedirs(receipt_dir, exist_ok=True)
+    with open(os.path.join(receipt_dir, 'Alice_r.pdf'), 'wb') as f:
+        f.write(b'%PDF receipt')
+
+    response = client.post('/settings/backup/stream')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/gzip'
+    assert 'bot_backup_' in response.headers['Content-Disposition']
+
+    with tarfile.open(fileobj=io.BytesIO(response.data), mode='r:gz') as tar:
+        names = tar.getnames()
+        assert tar.extractfile('dump.sql').read() == b'-- fake dump\n'
+        assert tar.extractfile('receipts/2024/01/01/Alice_r.pdf').read() == b'%PDF receipt'
+    assert '.env' in names
+    assert os.listdir(tmp_path) == []
+
+
+def test_backup_stream_dump_failure(client, app):
+    """Without mysqldump the stream endpoint redirects with an error instead of sending an archive."""
+    response = client.post('/settings/backup/stream')
+    assert response.status_code == 302
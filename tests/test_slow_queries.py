@@ -0,0 +1,80 @@
+import pytest
+
+
+@pytest.fixture
+def log_everything(app, monkeypatch):
+    import slow_queries
+    from flask import g
+    monkeypatch.setattr(slow_queries, 'SLOW_QUERY_MS', 0)
+    monkeypatch.setattr(slow_queries, '_explained', {})
+    yield
+    g.pop('_slow_queries', None)  # queued outside a request by the test itself
+
+
+def _logged():
+    from extensions import db
+    from models import SlowQuery
+    return db.session.execute(db.select(SlowQuery).order_by(SlowQuery.id)).scalars().all()
+
+
+def test_normalize_replaces_literals_and_collapses_lists():
+    from slow_queries import normalize, fingerprint
+    a = normalize("SELECT * FROM user WHERE id IN (?, ?, ?) AND name = 'Bob' LIMIT 10")
+    b = normalize('SELECT *\n  FROM user WHERE id IN (%(id_1)s, %(id_2)s) AND name = %(name)s LIMIT 5')
+    assert a == b == 'SELECT * FROM user WHERE id IN (?...) AND name = ? LIMIT ?'
+    assert fingerprint(a) == fingerprint(b)
+    assert normalize('INSERT INTO t (a, b) VALUES (?, ?), (?, ?), (?, ?)') == \
+        'INSERT INTO t (a, b) VALUES (?...), ...'
+    assert normalize('SELECT anon_1.id FROM t1') == 'SELECT anon_1.id FROM t1'
+
+
+def test_request_queries_are_logged_with_plan(app, client, make_user, log_everything):
+    make_user(name='Alice')
+    client.get('/search?q=Milch')
+    rows = _logged()
+    search = [r for r in rows if r.endpoint == 'main.search']
+    assert search
+    assert all('Milch' not in r.statement for r in search)
+    [plan] = [r for r in search if r.statement.startswith('SELECT user.id')]
+    assert 'SCAN user' in plan.query_plan
+    assert plan.params == '()'
+
+
+def test_plan_is_captured_once_per_fingerprint(app, client, log_everything):
+    client.get('/search?q=a')
+    client.get('/search?q=b')
+    rows = _logged()
+    by_fp = {}
+    for r in rows:
+        by_fp.setdefault(r.fingerprint, []).append(r)
+    repeated = [rs for rs in by_fp.values() if len(rs) > 1 and rs[0].statement.startswith('SELECT')]
+    assert repeated
+    for rs in repeated:
+        assert sum(1 for r in rs if r.query_plan) <= 1
+
+
+def test_log_is_capped(app, client, log_everything, monkeypatch):
+    import slow_queries
+    monkeypatch.setattr(slow_queries, 'SLOW_QUERY_KEEP', 5)
+    for _ in range(3):
+        client.get('/search?q=x')
+    assert len(_logged()) == 5
+
+
+def test_below_threshold_is_not_logged(app, client):
+    client.get('/search?q=x')
+    assert _logged() == []
+
+
+def test_settings_aggregates_by_fingerprint(app, client, log_everything):
+    from slow_queries import slow_query_summary
+    client.get('/search?q=a')
+    client.get('/search?q=b')
+    summary = slow_query_summary()
+    assert summary == sorted(summary, key=lambda s: s['total_ms'], reverse=True)
+    assert any(s['count'] >= 2 and s['query_plan'] for s in summary)
+
+    html = client.get('/settings').get_data(as_text=True)
+    assert 'Slow Queries' in html and 'SCAN' in html
+    client.post('/settings/slow-queries/clear')
+    assert all(s['endpoint'] != 'main.search' for s in slow_query_summary())
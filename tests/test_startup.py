@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+
+
+def test_apply_fixups_runs_once_and_records_marker(app):
+    with app.app_context():
+        from extensions import db
+        from models import Setting
+        from helpers import get_setting, set_setting
+        from startup import FIXUPS, FIXUPS_SETTING, apply_fixups
+        set_setting('color_navbar', '#0d6efd')
+        set_setting('tpl_email_subject', 'Custom subject')
+
+        assert apply_fixups() == [name for name, _ in FIXUPS]
+        assert db.session.get(Setting, 'color_navbar') is None
+        assert db.session.get(Setting, 'tpl_email_subject') is None
+        assert get_setting('tpl_email_subject_en') == 'Custom subject'
+        assert get_setting(FIXUPS_SETTING) == ','.join(name for name, _ in FIXUPS)
+
+        set_setting('color_navbar', '#0d6efd')
+        assert apply_fixups() == []
+        assert get_setting('color_navbar') == '#0d6efd'
+
+
+def test_seed_icon_bg_reads_existing_icon(app, monkeypatch, tmp_path):
+    with app.app_context():
+        from helpers import get_setting, make_icon_png
+        from startup import _seed_icon_bg
+        (tmp_path / 'static' / 'icons').mkdir(parents=True)
+        (tmp_path / 'static' / 'icons' / 'icon-512.png').write_bytes(make_icon_png(512, (0x12, 0x34, 0x56)))
+        monkeypatch.setattr(app, 'root_path', str(tmp_path))
+
+        _seed_icon_bg()
+        assert get_setting('icon_bg') == '#123456'
+
+
+def test_bot_init_command(app, monkeypatch):
+    import startup
+    calls = []
+    monkeypatch.setattr(startup, 'upgrade_database', lambda: calls.append('upgrade'))
+    monkeypatch.setattr(startup, 'ensure_icons', lambda _app: calls.append('icons'))
+
+    result = app.test_cli_runner().invoke(args=['bot-init'])
+    assert result.exit_code == 0, result.output
+    assert calls == ['upgrade', 'icons']
+    assert 'fix-up(s) applied' in result.output
+
+    result = app.test_cli_runner().invoke(args=['bot-init'])
+    assert 'Init complete: 0 fix-up(s) applied' in result.output
+
+
+# Cold `import app` budget in ms (median of fresh interpreters); raise it via
+# STARTUP_BUDGET_MS on slow CI machines rather than deleting the check.
+STARTUP_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', '1500'))
+_BENCH = os.path.join(os.path.dirname(__file__), '..', 'scripts', 'bench_startup.py')
+
+
+def test_rarely_used_modules_load_lazily():
+    heavy = ['PIL', 'tarfile', 'smtplib', 'email.mime', 'alembic', 'flask_migrate',
+             'backup_service', 'email_service']
+    code = f'import sys, app; print([m for m in {heavy!r} if m in sys.modules])'
+    env = dict(os.environ, FLASK_TESTING='1', SQLALCHEMY_DATABASE_URI='sqlite://')
+    out = subprocess.run([sys.executable, '-c', code], cwd=os.path.join(os.path.dirname(__file__), '..', 'app'),
+                         env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == '[]'
+
+
+def test_cold_import_within_budget():
+    out = subprocess.run([sys.executable, _BENCH, '--runs', '3', '--top', '10',
+                          '--budget-ms', str(STARTUP_BUDGET_MS)], capture_output=True, text=True)
+    assert out.returncode == 0, out.stdout + out.stderr
+
+
+def test_backrefs_exist_before_first_query():
+    # /search filters on Transaction.items, a backref that only exists once mappers are configured.
+    code = 'import app, models; print(hasattr(models.Transaction, "items"))'
+    env = dict(os.environ, FLASK_TESTING='1', SQLALCHEMY_DATABASE_URI='sqlite://')
+    out = subprocess.run([sys.executable, '-c', code], cwd=os.path.join(os.path.dirname(__file__), '..', 'app'),
+                         env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == 'True'
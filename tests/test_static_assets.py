@@ -0,0 +1,76 @@
+import gzip
+import json
+import os
+import shutil
+
+import pytest
+
+
+@pytest.fixture
+def built_static(app, tmp_path, monkeypatch):
+    """Copy the vendor assets into a temp static folder and run the build step there."""
+    import static_assets
+    shutil.copytree(os.path.join(app.static_folder, 'vendor'), tmp_path / 'vendor')
+    manifest = static_assets.build(str(tmp_path))
+    monkeypatch.setattr(app, 'static_folder', str(tmp_path))
+    static_assets.load_manifest.cache_clear()
+    static_assets._fingerprinted.cache_clear()
+    yield tmp_path, manifest
+    static_assets.load_manifest.cache_clear()
+    static_assets._fingerprinted.cache_clear()
+
+
+def test_build_writes_fingerprinted_and_compressed_files(built_static):
+    root, manifest = built_static
+    fingerprinted = manifest['vendor/css/bootstrap.min.css']
+    assert fingerprinted.startswith('dist/vendor/css/bootstrap.min.')
+    original = (root / 'vendor/css/bootstrap.min.css').read_bytes()
+    assert (root / fingerprinted).read_bytes() == original
+    assert gzip.decompress((root / (fingerprinted + '.gz')).read_bytes()) == original
+    assert not (root / (manifest['vendor/fonts/bootstrap-icons.woff2'] + '.gz')).exists()
+    assert json.loads((root / 'dist/manifest.json').read_text()) == manifest
+
+    icons_css = (root / manifest['vendor/css/bootstrap-icons.css']).read_text()
+    font = os.path.basename(manifest['vendor/fonts/bootstrap-icons.woff2'])
+    assert f'url("../fonts/{font}")' in icons_css
+
+
+def test_static_url_falls_back_without_manifest(app):
+    import static_assets
+    static_assets.load_manifest.cache_clear()
+    with app.test_request_context():
+        assert static_assets.static_url('vendor/js/chart.umd.min.js') == '/static/vendor/js/chart.umd.min.js'
+
+
+def test_fingerprinted_assets_served_precompressed_and_immutable(client, app, built_static):
+    root, manifest = built_static
+    with app.test_request_context():
+        from static_assets import static_url
+        url = static_url('vendor/js/bootstrap.bundle.min.js')
+    assert url == '/static/' + manifest['vendor/js/bootstrap.bundle.min.js']
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'text/javascript'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == (root / 'vendor/js/bootstrap.bundle.min.js').read_bytes()
+
+    response = client.get(url)
+    assert 'Content-Encoding' not in response.headers
+    assert 'immutable' in response.headers['Cache-Control']
+
+    plain = client.get('/static/vendor/js/bootstrap.bundle.min.js', headers={'Accept-Encoding': 'gzip'})
+    assert plain.status_code == 200
+    assert 'Content-Encoding' not in plain.headers
+    assert 'immutable' not in plain.headers['Cache-Control']
+
+
+def test_brotli_preferred_when_accepted(client, app, built_static):
+    brotli = pytest.importorskip('brotli')
+    root, manifest = built_static
+    url = '/static/' + manifest['vendor/css/bootstrap.min.css']
+    response = client.get(url, headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.data) == (root / 'vendor/css/bootstrap.min.css').read_bytes()
@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def receipt(app):
+    """Write a 1200x800 PNG receipt into the upload folder and return its relative path."""
+    from PIL import Image
+    rel = '2024/02/03/Alice_photo.png'
+    abs_path = os.path.join(app.config['UPLOAD_FOLDER'], rel)
+    os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+    Image.new('RGB', (1200, 800), (200, 10, 10)).save(abs_path)
+    yield rel
+    thumbs = os.path.join(os.path.dirname(abs_path), '.thumbs')
+    for name in os.listdir(thumbs) if os.path.isdir(thumbs) else []:
+        os.remove(os.path.join(thumbs, name))
+    os.remove(abs_path)
+
+
+def test_thumbnail_generated_and_cached(app, receipt):
+    with app.test_request_context():
+        from PIL import Image
+        from config import THUMBNAIL_SIZE
+        from thumbnail_service import get_thumbnail
+        path = get_thumbnail(receipt)
+        assert path and os.path.isfile(path)
+        assert os.sep + '.thumbs' + os.sep in path
+        with Image.open(path) as img:
+            assert max(img.size) == THUMBNAIL_SIZE
+        mtime = os.path.getmtime(path)
+        assert get_thumbnail(receipt) == path
+        assert os.path.getmtime(path) >= mtime
+
+
+def test_thumbnail_route_cache_headers(client, receipt):
+    response = client.get(f'/receipt-thumb/{receipt}')
+    assert response.status_code == 200
+    assert response.mimetype in ('image/webp', 'image/jpeg')
+    assert 'max-age=' in response.headers['Cache-Control']
+
+
+def test_thumbnail_missing_and_traversal(client):
+    assert client.get('/receipt-thumb/2024/01/01/nope.png').status_code == 404
+    assert client.get('/receipt-thumb/../etc/passwd').status_code == 404
+
+
+def test_pdf_thumbnail_placeholder_without_renderer(app, monkeypatch):
+    import thumbnail_service
+    monkeypatch.setattr(thumbnail_service.shutil, 'which', lambda _: None)
+    rel = '2024/02/04/Bob_doc.pdf'
+    abs_path = os.path.join(app.config['UPLOAD_FOLDER'], rel)
+    os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+    with open(abs_path, 'wb') as f:
+        f.write(b'%PDF-1.4 not really')
+    try:
+        with app.test_request_context():
+            assert thumbnail_service.get_thumbnail(rel) is not None
+    finally:
+        os.remove(abs_path)
+
+
+def test_cache_limit_evicts_least_recently_used(app, receipt):
+    with app.test_request_context():
+        from thumbnail_service import get_thumbnail, enforce_cache_limit
+        path = get_thumbnail(receipt)
+        assert enforce_cache_limit(max_bytes=10 ** 9) == 0
+        assert enforce_cache_limit(max_bytes=1) > 0
+        assert not os.path.exists(path)
+
+
+def test_cache_misses_walk_the_tree_only_when_needed(app, receipt, monkeypatch):
+    import shutil
+    import thumbnail_service
+    monkeypatch.setattr(thumbnail_service, '_cache_size', {})
+    walks = []
+    real_walk = os.walk
+    monkeypatch.setattr(thumbnail_service.os, 'walk', lambda *a, **kw: walks.append(a) or real_walk(*a, **kw))
+    second = receipt.replace('photo', 'second')
+    upload = app.config['UPLOAD_FOLDER']
+    shutil.copy(os.path.join(upload, receipt), os.path.join(upload, second))
+    try:
+        with app.test_request_context():
+            assert thumbnail_service.get_thumbnail(receipt)
+            assert thumbnail_service.get_thumbnail(second)
+            assert len(walks) == 1  # the first miss learns the size, the second adds to it
+
+            monkeypatch.setattr(thumbnail_service, 'THUMBNAIL_CACHE_MAX_BYTES', 1)
+            os.remove(thumbnail_service.thumbnail_path(second))
+            path = thumbnail_service.get_thumbnail(second)
+            assert len(walks) == 2 and not os.path.exists(path)
+    finally:
+        os.remove(os.path.join(upload, second))
+
+
+def test_pregenerate_thumbnails(app, receipt, make_user):
+    with app.app_context():
+        from decimal import Decimal
+        from extensions import db
+        from models import Transaction
+        from thumbnail_service import pregenerate_thumbnails
+        u1, u2 = make_user(), make_user()
+        db.session.add(Transaction(description='Lunch', amount=Decimal('5'), from_user_id=u1.id,
+                                   to_user_id=u2.id, transaction_type='expense', receipt_path=receipt))
+        db.session.commit()
+        assert pregenerate_thumbnails() == (1, 0, 0)
+        assert pregenerate_thumbnails() == (0, 1, 0)